@@ -1,3 +1,12 @@
 from agents.agents import DEFAULT_AGENT, get_agent, get_all_agent_info
+from agents.graph_render import GraphFormat, GraphRenderError, MEDIA_TYPES, render_graph
 
-__all__ = ["DEFAULT_AGENT", "get_agent", "get_all_agent_info"]
\ No newline at end of file
+__all__ = [
+    "DEFAULT_AGENT",
+    "get_agent",
+    "get_all_agent_info",
+    "GraphFormat",
+    "GraphRenderError",
+    "MEDIA_TYPES",
+    "render_graph",
+]
\ No newline at end of file
@@ -0,0 +1,223 @@
+"""
+Context-window budget for the messages sent to the model.
+
+The stage runs in wrap_model's preprocessor, so it only changes what the model
+is sent; the checkpointed thread keeps every tool message in full.
+"""
+from collections.abc import Callable, Sequence
+import hashlib
+import json
+import math
+import re
+from typing import Any
+
+from langchain_core.messages import BaseMessage, HumanMessage, ToolMessage
+
+# Input token budget per model, well below the context windows to bound cost and latency
+DEFAULT_TOKEN_BUDGETS: dict[str, int] = {
+    "gpt-4o-mini": 32_000,
+    "gpt-4o": 32_000,
+    "gemini-1.5-flash": 64_000,
+    "gemini-2.0-flash": 64_000,
+}
+DEFAULT_TOKEN_BUDGET = 32_000
+
+_WORD = re.compile(r"\w+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+
+Ranker = Callable[[str, Sequence[str]], Sequence[float]]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def _message_tokens(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    return estimate_tokens(content) + 4
+
+
+def overlap_ranker(question: str, chunks: Sequence[str]) -> list[float]:
+    """Score chunks by question term overlap, normalized for chunk length."""
+    terms = {w for w in _WORD.findall(question.lower()) if len(w) > 2}
+    if not terms:
+        return [0.0] * len(chunks)
+    scores = []
+    for chunk in chunks:
+        words = _WORD.findall(chunk.lower())
+        hits = sum(1 for w in words if w in terms)
+        scores.append(hits / math.sqrt(len(words) + 1))
+    return scores
+
+
+def _split_chunks(text: str, max_chars: int) -> list[str]:
+    chunks: list[str] = []
+    current = ""
+    for sentence in _SENTENCE_END.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+        while len(current) > max_chars:
+            chunks.append(current[:max_chars])
+            current = current[max_chars:]
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _parse_results(message: ToolMessage) -> list[dict[str, Any]] | None:
+    """Search results in a tool message body, or None if it is not a result list."""
+    if not isinstance(message.content, str):
+        return None
+    try:
+        results = json.loads(message.content)
+    except ValueError:
+        return None
+    if not isinstance(results, list) or not all(isinstance(r, dict) for r in results):
+        return None
+    return results
+
+
+class ContextBudget:
+    """
+    Fits a message list into a token budget.
+
+    - Tool results from earlier user turns are replaced by compact digests
+      (url, title and a short snippet per result).
+    - If the prompt is still over budget, the current turn's search results are
+      split into chunks, exact duplicates dropped, and the chunks most relevant to
+      the latest user question kept until the budget is filled. Other tool output
+      of the current turn (errors, non-search tools) is kept as is, or cut short
+      if it alone does not fit.
+
+    Subclass and override `digest` or pass a different `ranker` to change the policy.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int,
+        ranker: Ranker = overlap_ranker,
+        chunk_chars: int = 800,
+        digest_chars: int = 200,
+    ) -> None:
+        self.max_tokens = max_tokens
+        self.ranker = ranker
+        self.chunk_chars = chunk_chars
+        self.digest_chars = digest_chars
+
+    def digest(self, message: ToolMessage) -> ToolMessage:
+        results = _parse_results(message)
+        if results is None:
+            content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+            digest = content[: self.digest_chars]
+        else:
+            digest = json.dumps(
+                [
+                    {
+                        "url": r.get("url"),
+                        "title": r.get("title"),
+                        "snippet": str(r.get("content", ""))[: self.digest_chars],
+                    }
+                    for r in results
+                ],
+                ensure_ascii=False,
+            )
+        return message.model_copy(update={"content": digest, "artifact": None})
+
+    def _truncate(self, message: ToolMessage, max_tokens: int) -> ToolMessage:
+        content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+        # Inverse of _message_tokens, so the cut message costs at most max_tokens
+        max_chars = max(max_tokens - 5, 0) * 4
+        if len(content) <= max_chars:
+            return message
+        return message.model_copy(update={"content": content[:max_chars], "artifact": None})
+
+    def _fit_tool_results(
+        self, messages: list[BaseMessage], indexes: list[int], question: str, budget: int
+    ) -> None:
+        chunks: list[tuple[int, int, str]] = []  # (message index, result index, text)
+        parsed: dict[int, list[dict[str, Any]]] = {}
+        # Tokens of a result's fields other than its content
+        fields: dict[tuple[int, int], int] = {}
+        seen: set[str] = set()
+        for i in indexes:
+            results = _parse_results(messages[i])
+            if results is None:
+                continue
+            parsed[i] = results
+            # Even with every result dropped the message is sent
+            budget -= _message_tokens(messages[i].model_copy(update={"content": "[]"}))
+            for r_index, result in enumerate(results):
+                fields[(i, r_index)] = estimate_tokens(json.dumps({**result, "content": ""}, ensure_ascii=False))
+                for chunk in _split_chunks(str(result.get("content", "")), self.chunk_chars):
+                    fingerprint = hashlib.sha1(" ".join(chunk.lower().split()).encode()).hexdigest()
+                    if fingerprint not in seen:
+                        seen.add(fingerprint)
+                        chunks.append((i, r_index, chunk))
+
+        scores = self.ranker(question, [c[2] for c in chunks])
+        kept: set[int] = set()
+        opened: set[tuple[int, int]] = set()
+        for c_index in sorted(range(len(chunks)), key=lambda c: scores[c], reverse=True):
+            i, r_index, text = chunks[c_index]
+            cost = estimate_tokens(json.dumps(text, ensure_ascii=False))
+            if (i, r_index) not in opened:
+                # The first chunk kept of a result also brings its other fields
+                cost += fields[(i, r_index)]
+            if cost > budget:
+                continue
+            budget -= cost
+            kept.add(c_index)
+            opened.add((i, r_index))
+
+        selected: dict[tuple[int, int], list[str]] = {}
+        # Keep the original reading order of the surviving chunks
+        for c_index in sorted(kept):
+            i, r_index, text = chunks[c_index]
+            selected.setdefault((i, r_index), []).append(text)
+        for i, results in parsed.items():
+            trimmed = [
+                {**result, "content": " ".join(selected[(i, r_index)])}
+                for r_index, result in enumerate(results)
+                if (i, r_index) in selected
+            ]
+            messages[i] = messages[i].model_copy(
+                update={"content": json.dumps(trimmed, ensure_ascii=False)}
+            )
+
+    def __call__(self, messages: Sequence[BaseMessage]) -> list[BaseMessage]:
+        messages = list(messages)
+        last_human = max(
+            (i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1
+        )
+        for i, message in enumerate(messages[:last_human]):
+            if isinstance(message, ToolMessage):
+                messages[i] = self.digest(message)
+
+        if sum(_message_tokens(m) for m in messages) <= self.max_tokens:
+            return messages
+
+        current: list[int] = []
+        others: list[int] = []
+        for i in range(last_human + 1, len(messages)):
+            if isinstance(messages[i], ToolMessage):
+                (current if _parse_results(messages[i]) is not None else others).append(i)
+        fixed = sum(_message_tokens(m) for i, m in enumerate(messages) if i not in current)
+        # What the result messages cost with every result dropped
+        floor = sum(_message_tokens(messages[i].model_copy(update={"content": "[]"})) for i in current)
+        if fixed + floor > self.max_tokens and others:
+            # Cut the tool output that cannot be ranked to an even share of what is left
+            room = self.max_tokens - fixed - floor + sum(_message_tokens(messages[i]) for i in others)
+            for i in others:
+                messages[i] = self._truncate(messages[i], max(room, 0) // len(others))
+            fixed = sum(_message_tokens(m) for i, m in enumerate(messages) if i not in current)
+        question = messages[last_human].content if last_human >= 0 else ""
+        if not isinstance(question, str):
+            question = json.dumps(question)
+        self._fit_tool_results(messages, current, question, max(self.max_tokens - fixed, 0))
+        return messages
@@ -0,0 +1,96 @@
+import hashlib
+import shutil
+import subprocess
+from typing import Literal
+
+from langchain_core.runnables.graph import Graph
+from langgraph.graph.state import CompiledStateGraph
+
+from core import settings
+
+GraphFormat = Literal["mermaid", "png", "svg"]
+
+MEDIA_TYPES: dict[GraphFormat, str] = {
+    "mermaid": "text/plain; charset=utf-8",
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+# Rendered output per (agent_id, graph hash, format)
+_rendered: dict[tuple[str, str, GraphFormat], bytes] = {}
+
+
+class GraphRenderError(Exception):
+    pass
+
+
+def _quote(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def to_dot(graph: Graph) -> str:
+    """Convert a drawable graph to Graphviz DOT, styled like the Mermaid output."""
+    lines = [
+        "digraph G {",
+        '  node [shape=box, style="rounded,filled", fillcolor="#f2f0ff", fontname="Helvetica"];',
+        '  edge [fontname="Helvetica", fontsize=10];',
+    ]
+    for node in graph.nodes.values():
+        attrs = f"label={_quote(node.name)}"
+        if node.id in ("__start__", "__end__"):
+            attrs += ', shape=oval, fillcolor="#bfb6fc"'
+        lines.append(f"  {_quote(node.id)} [{attrs}];")
+    for edge in graph.edges:
+        attrs = []
+        if edge.conditional:
+            attrs.append("style=dashed")
+        if edge.data is not None:
+            attrs.append(f"label={_quote(str(edge.data))}")
+        suffix = f" [{', '.join(attrs)}]" if attrs else ""
+        lines.append(f"  {_quote(edge.source)} -> {_quote(edge.target)}{suffix};")
+    lines.append("}")
+    return "\n".join(lines)
+
+
+def _render_with_graphviz(graph: Graph, fmt: Literal["png", "svg"]) -> bytes:
+    dot = shutil.which("dot")
+    if dot is None:
+        raise GraphRenderError("Graphviz 'dot' executable not found")
+    try:
+        result = subprocess.run(
+            [dot, f"-T{fmt}"],
+            input=to_dot(graph).encode("utf-8"),
+            capture_output=True,
+            check=True,
+            timeout=30,
+        )
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        raise GraphRenderError(f"Graphviz failed to render the graph: {e}")
+    return result.stdout
+
+
+def _render(graph: Graph, mermaid: str, fmt: GraphFormat) -> bytes:
+    if fmt == "mermaid":
+        return mermaid.encode("utf-8")
+    try:
+        return _render_with_graphviz(graph, fmt)
+    except GraphRenderError:
+        # The Mermaid service is a network call, so it is only a last resort
+        if fmt == "png" and settings.GRAPH_RENDER_REMOTE:
+            return graph.draw_mermaid_png()
+        raise
+
+
+def render_graph(agent_id: str, agent: CompiledStateGraph, fmt: GraphFormat = "mermaid") -> bytes:
+    """
+    Render an agent's graph as Mermaid text, PNG or SVG.
+
+    PNG and SVG are rendered offline with Graphviz. Output is cached per agent by
+    the hash of the graph's Mermaid definition, so a changed graph is re-rendered.
+    """
+    graph = agent.get_graph()
+    mermaid = graph.draw_mermaid()
+    key = (agent_id, hashlib.sha256(mermaid.encode("utf-8")).hexdigest(), fmt)
+    if key not in _rendered:
+        _rendered[key] = _render(graph, mermaid, fmt)
+    return _rendered[key]
@@ -1,18 +1,24 @@
 import datetime
+import time
+from collections.abc import Callable
 from typing import Literal
 from langgraph.graph import MessagesState, StateGraph
-from langgraph.prebuilt import ToolNode
 from langgraph.checkpoint.memory import MemorySaver
 from langchain_core.runnables import RunnableSerializable, RunnableLambda, RunnableConfig
 from langchain_core.prompts import PromptTemplate
-from langchain_core.messages import AIMessage, SystemMessage
+from langchain_core.messages import AIMessage, AIMessageChunk, SystemMessage, message_chunk_to_message
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_community.tools import TavilySearchResults
 
-from core import get_model
+from agents.context import DEFAULT_TOKEN_BUDGET, DEFAULT_TOKEN_BUDGETS, ContextBudget
+from agents.tool_node import ParallelToolNode
+from agents.tools import build_search_tool
+from core import get_model, settings
+from core.hedging import ahedged_stream
+from core.metrics import NODE_DURATION, ModelMetricsCallback
+from core.llm_cache import acached_invoke, build_response_cache, response_cache_key
 
 tools = [
-    TavilySearchResults(
+    build_search_tool(
         max_results=5,
         search_depth="advanced",
         include_answer=True,
@@ -42,27 +48,133 @@ system_template = PromptTemplate.from_template(
     )
 )
 
-def wrap_model(model: BaseChatModel) -> RunnableSerializable[MessagesState, AIMessage]:
+def _today() -> str:
+    return datetime.datetime.now().strftime("%B %d, %Y")
+
+def context_budget(model_name: str) -> ContextBudget | None:
+    """Context budget stage for model_name, or None if budgeting is disabled."""
+    if not settings.CONTEXT_BUDGET_ENABLED:
+        return None
+    budgets = {**DEFAULT_TOKEN_BUDGETS, **settings.CONTEXT_TOKEN_BUDGETS}
+    return ContextBudget(budgets.get(model_name, DEFAULT_TOKEN_BUDGET))
+
+def wrap_model(
+    model: BaseChatModel,
+    date: str | None = None,
+    budget: ContextBudget | None = None,
+    callbacks: list | None = None
+) -> RunnableSerializable[MessagesState, AIMessage]:
     if len(tools)>0:
         model = model.bind_tools(tools)
-    instructions = system_template.invoke({"date": datetime.datetime.now().strftime("%B %d, %Y")}).to_string()
+    if callbacks:
+        model = model.with_config(callbacks=callbacks)
+    instructions = system_template.invoke({"date": date or _today()}).to_string()
+    # The budget only rewrites what is sent to the model, the checkpointed state is unchanged
+    fit = budget or list
     preprocessor = RunnableLambda(
-        lambda state: [SystemMessage(content=instructions)] + state["messages"],
+        lambda state: [SystemMessage(content=instructions)] + fit(state["messages"]),
         name="StateModifier"
     )
     return preprocessor | model
 
+# Bound, prompt-prefixed runnables per model name, keyed by the date rendered into the prompt
+_model_runnables: dict[str, tuple[str, RunnableSerializable[MessagesState, AIMessage]]] = {}
+
+def get_model_runnable(model_name: str) -> RunnableSerializable[MessagesState, AIMessage]:
+    """Return the cached wrap_model runnable for model_name, rebuilding it when the date changes."""
+    date = _today()
+    cached = _model_runnables.get(model_name)
+    if cached is None or cached[0] != date:
+        cached = (
+            date,
+            wrap_model(
+                get_model(model_name),
+                date,
+                context_budget(model_name),
+                callbacks=[ModelMetricsCallback(model_name)]
+            )
+        )
+        _model_runnables[model_name] = cached
+    return cached[1]
+
+def model_attempts(model_name: str, hedge: bool = True) -> list[str]:
+    """Models to try for a call to model_name: itself, then its available fallbacks."""
+    fallbacks = [
+        m for m in settings.MODEL_FALLBACKS.get(model_name, []) if m in settings.AVAILABLE_MODELS
+    ]
+    if hedge and settings.HEDGE_AFTER is not None and not fallbacks:
+        # Hedge with a duplicate request to the same model
+        fallbacks = [model_name]
+    return [model_name, *fallbacks]
+
+def get_call_runnable(
+    model_name: str, hedge: bool = True, on_winner: Callable[[str], None] | None = None
+) -> RunnableSerializable[MessagesState, AIMessage]:
+    """
+    The model runnable for model_name, hedged and failing over when fallbacks apply.
+    on_winner is called with the model that answered a hedged or failed-over call.
+    """
+    attempts = model_attempts(model_name, hedge)
+    if len(attempts) == 1:
+        return get_model_runnable(model_name)
+    runnables = [(m, get_model_runnable(m)) for m in attempts]
+    hedge_after = settings.HEDGE_AFTER if hedge else None
+    
+    async def hedged(state: MessagesState, config: RunnableConfig):
+        async for chunk in ahedged_stream(runnables, state, config, hedge_after, on_winner):
+            yield chunk
+    
+    return RunnableLambda(hedged, name="HedgedModel")
+
+response_cache = build_response_cache()
+
 async def acall_model(state: MessagesState, config: RunnableConfig) -> MessagesState:
-    m = get_model(config["configurable"].get("model", "gpt-4o-mini"))
-    model_runnable = wrap_model(m)
-    response = await model_runnable.ainvoke(state, config)
+    start = time.perf_counter()
+    try:
+        return await _acall_model(state, config)
+    finally:
+        NODE_DURATION.observe(time.perf_counter() - start, "model")
+
+async def _acall_model(state: MessagesState, config: RunnableConfig) -> MessagesState:
+    model_name = config["configurable"].get("model", "gpt-4o-mini")
+    # agent_config={"hedge": False} turns off hedging (but not failover) for a request
+    answered_by: list[str] = []
+    model_runnable = get_call_runnable(
+        model_name, config["configurable"].get("hedge", True), answered_by.append
+    )
+    # agent_config={"llm_cache": False} bypasses the response cache for a request
+    if response_cache is None or not config["configurable"].get("llm_cache", True):
+        response = await model_runnable.ainvoke(state, config)
+    else:
+        prompt_messages = get_model_runnable(model_name).first.invoke(state)
+        key = response_cache_key(model_name, tools, prompt_messages)
+        response = await acached_invoke(
+            response_cache,
+            key,
+            model_runnable,
+            state,
+            config,
+            # An answer from a fallback model must not be replayed as model_name
+            should_store=lambda: all(m == model_name for m in answered_by),
+        )
+    if isinstance(response, AIMessageChunk):
+        response = message_chunk_to_message(response)
     
     return {"messages": [response]}
 
 # Define the graph
 agent = StateGraph(MessagesState)
 agent.add_node("model", acall_model)
-agent.add_node("tools", ToolNode(tools))
+agent.add_node(
+    "tools",
+    ParallelToolNode(
+        tools,
+        timeout=settings.TOOL_TIMEOUT,
+        max_concurrency=settings.TOOL_MAX_CONCURRENCY,
+        timeouts=settings.TOOL_TIMEOUTS,
+        concurrency=settings.TOOL_CONCURRENCY,
+    )
+)
 agent.set_entry_point("model")
 
 agent.add_edge("tools", "model")
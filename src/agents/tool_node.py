@@ -0,0 +1,115 @@
+import asyncio
+import time
+from typing import Any, Literal, Sequence
+
+from langchain_core.messages import ToolCall, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+from langgraph.prebuilt import ToolNode
+from langgraph.store.base import BaseStore
+
+from core.metrics import NODE_DURATION, TOOL_CALLS, TOOL_DURATION
+
+
+class ParallelToolNode(ToolNode):
+    """
+    ToolNode that runs the tool calls of a message concurrently, at most
+    max_concurrency at a time per tool, each bounded by a timeout.
+
+    A timed-out call returns an error ToolMessage instead of failing the step.
+    Every ToolMessage records latency_ms (and queued_ms, the time spent waiting
+    for a concurrency slot) in its response_metadata, and the node reports tool
+    and node timings to core.metrics.
+    """
+
+    def __init__(
+        self,
+        tools: Sequence[BaseTool],
+        *,
+        timeout: float | None = None,
+        max_concurrency: int | None = None,
+        timeouts: dict[str, float] | None = None,
+        concurrency: dict[str, int] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(tools, **kwargs)
+        self.timeouts = {name: (timeouts or {}).get(name, timeout) for name in self.tools_by_name}
+        self.concurrency = {
+            name: (concurrency or {}).get(name, max_concurrency) for name in self.tools_by_name
+        }
+        # Shared by all runs on an event loop, so the limits hold across concurrent requests
+        self._semaphores: dict[str, tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = {}
+
+    def _semaphore(self, name: str) -> asyncio.Semaphore | None:
+        limit = self.concurrency.get(name)
+        if not limit:
+            return None
+        loop = asyncio.get_running_loop()
+        cached = self._semaphores.get(name)
+        if cached is None or cached[0] is not loop:
+            cached = (loop, asyncio.Semaphore(limit))
+            self._semaphores[name] = cached
+        return cached[1]
+
+    @staticmethod
+    def _record(message: Any, latency: float, queued: float = 0.0) -> Any:
+        if isinstance(message, ToolMessage):
+            TOOL_CALLS.inc(message.name, message.status)
+            TOOL_DURATION.observe(latency, message.name)
+            message.response_metadata = {
+                **message.response_metadata,
+                "latency_ms": round(latency * 1000, 1),
+                "queued_ms": round(queued * 1000, 1),
+            }
+        return message
+
+    def _func(self, input: Any, config: RunnableConfig, *, store: BaseStore) -> Any:
+        start = time.perf_counter()
+        try:
+            return super()._func(input, config, store=store)
+        finally:
+            NODE_DURATION.observe(time.perf_counter() - start, self.name)
+
+    async def _afunc(self, input: Any, config: RunnableConfig, *, store: BaseStore) -> Any:
+        start = time.perf_counter()
+        try:
+            return await super()._afunc(input, config, store=store)
+        finally:
+            NODE_DURATION.observe(time.perf_counter() - start, self.name)
+
+    def _run_one(
+        self,
+        call: ToolCall,
+        input_type: Literal["list", "dict"],
+        config: RunnableConfig,
+    ) -> ToolMessage:
+        start = time.perf_counter()
+        message = super()._run_one(call, input_type, config)
+        return self._record(message, time.perf_counter() - start)
+
+    async def _arun_one(
+        self,
+        call: ToolCall,
+        input_type: Literal["list", "dict"],
+        config: RunnableConfig,
+    ) -> ToolMessage:
+        name = call["name"]
+        timeout = self.timeouts.get(name)
+        queued_at = time.perf_counter()
+        semaphore = self._semaphore(name)
+        if semaphore is not None:
+            await semaphore.acquire()
+        start = time.perf_counter()
+        try:
+            message = await asyncio.wait_for(super()._arun_one(call, input_type, config), timeout)
+        except asyncio.TimeoutError:
+            message = ToolMessage(
+                content=f"Error: {name} timed out after {timeout}s, try again or continue without it.",
+                name=name,
+                tool_call_id=call["id"],
+                status="error",
+            )
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+        return self._record(message, time.perf_counter() - start, start - queued_at)
@@ -0,0 +1,116 @@
+import asyncio
+import time
+from typing import Any, Optional
+from pydantic import ConfigDict, Field
+from langchain_core.callbacks import AsyncCallbackManagerForToolRun, CallbackManagerForToolRun
+from langchain_community.tools import TavilySearchResults
+from langchain_community.utilities.tavily_search import TavilySearchAPIWrapper
+
+from core import settings
+from core.cache import TieredCache, build_cache, hash_key
+from core.cassette import Cassette, get_cassette
+
+
+class CachedTavilySearchResults(TavilySearchResults):
+    """
+    TavilySearchResults that caches results keyed on the normalized query and
+    the tool's search settings. Failed searches are never cached.
+    """
+    
+    cache: TieredCache | None = Field(default=None, exclude=True)
+    
+    def _cache_key(self, query: str) -> str:
+        return hash_key(
+            "tavily",
+            " ".join(query.lower().split()),
+            self.max_results,
+            self.search_depth,
+            sorted(self.include_domains),
+            sorted(self.exclude_domains),
+            self.include_answer,
+            self.include_raw_content,
+            self.include_images,
+        )
+    
+    def _run(
+        self,
+        query: str,
+        run_manager: Optional[CallbackManagerForToolRun] = None,
+    ) -> tuple[list[dict[str, str]] | str, dict]:
+        if self.cache is None:
+            return super()._run(query, run_manager)
+        key = self._cache_key(query)
+        if (cached := self.cache.get(key)) is not None:
+            return tuple(cached)
+        content, artifact = super()._run(query, run_manager)
+        if artifact:
+            self.cache.set(key, [content, artifact])
+        return content, artifact
+    
+    async def _arun(
+        self,
+        query: str,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> tuple[list[dict[str, str]] | str, dict]:
+        if self.cache is None:
+            return await super()._arun(query, run_manager)
+        key = self._cache_key(query)
+        if (cached := await self.cache.aget(key)) is not None:
+            return tuple(cached)
+        content, artifact = await super()._arun(query, run_manager)
+        if artifact:
+            await self.cache.aset(key, [content, artifact])
+        return content, artifact
+
+
+class CassetteSearchAPIWrapper(TavilySearchAPIWrapper):
+    """Tavily API wrapper that records raw search responses to a cassette, or replays them."""
+    
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    
+    cassette: Cassette = Field(exclude=True)
+    
+    def _play(self, key: str) -> tuple[dict, float]:
+        entry = self.cassette.play("search", key)
+        return entry["response"], entry["delay"] if self.cassette.paced else 0.0
+    
+    def raw_results(self, query: str, *args: Any) -> dict:
+        key = hash_key("search", query, args)
+        if self.cassette.mode == "replay":
+            response, delay = self._play(key)
+            time.sleep(delay)
+            return response
+        start = time.perf_counter()
+        response = super().raw_results(query, *args)
+        self.cassette.record("search", key, query=query, delay=round(time.perf_counter() - start, 4), response=response)
+        return response
+    
+    async def raw_results_async(self, query: str, *args: Any) -> dict:
+        key = hash_key("search", query, args)
+        if self.cassette.mode == "replay":
+            response, delay = self._play(key)
+            await asyncio.sleep(delay)
+            return response
+        start = time.perf_counter()
+        response = await super().raw_results_async(query, *args)
+        await self.cassette.arecord(
+            "search", key, query=query, delay=round(time.perf_counter() - start, 4), response=response
+        )
+        return response
+
+
+def build_search_tool(**kwargs: Any) -> TavilySearchResults:
+    """Build the Tavily search tool, wrapped in a result cache unless disabled in settings."""
+    if settings.CASSETTE_MODE != "off":
+        kwargs["api_wrapper"] = CassetteSearchAPIWrapper(
+            cassette=get_cassette(settings.CASSETTE_PATH, settings.CASSETTE_MODE, settings.CASSETTE_PACING)
+        )
+    if not settings.TAVILY_CACHE_ENABLED:
+        return TavilySearchResults(**kwargs)
+    cache = build_cache(
+        max_entries=settings.TAVILY_CACHE_MAX_ENTRIES,
+        ttl=settings.TAVILY_CACHE_TTL,
+        db_path=settings.TAVILY_CACHE_DB,
+        table="tavily_cache",
+    )
+    return CachedTavilySearchResults(cache=cache, **kwargs)
@@ -0,0 +1,63 @@
+"""
+Checkpoint write throughput of ShardedSqliteSaver by shard count.
+
+Concurrent writers each put checkpoints to their own thread, like concurrent runs.
+
+    cd src && python -m benchmarks.checkpoint_shards --shards 1 2 4 8 --writers 64
+"""
+import argparse
+import asyncio
+from contextlib import AsyncExitStack
+import tempfile
+import time
+import os
+
+import aiosqlite
+from langgraph.checkpoint.base import create_checkpoint, empty_checkpoint
+
+from core.checkpoint import open_saver
+from core.sharded_checkpoint import ShardedSqliteSaver, shard_path
+
+
+async def bench(shards: int, writers: int, writes: int, payload_kb: int) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        async with AsyncExitStack() as stack:
+            savers = []
+            for i in range(shards):
+                conn = await stack.enter_async_context(
+                    aiosqlite.connect(shard_path(os.path.join(tmp, "checkpoints.db"), i, shards))
+                )
+                savers.append(await open_saver(conn))
+            saver = ShardedSqliteSaver(savers)
+            payload = "x" * (payload_kb * 1024)
+
+            async def writer(w: int) -> None:
+                config = {"configurable": {"thread_id": f"thread-{w}", "checkpoint_ns": ""}}
+                checkpoint = empty_checkpoint()
+                for step in range(writes):
+                    checkpoint = create_checkpoint(checkpoint, None, step)
+                    checkpoint["channel_values"] = {"messages": payload}
+                    config = await saver.aput(config, checkpoint, {"step": step}, {})
+
+            start = time.perf_counter()
+            await asyncio.gather(*(writer(w) for w in range(writers)))
+            return writers * writes / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sharded checkpoint write throughput benchmark")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--writers", type=int, default=64)
+    parser.add_argument("--writes", type=int, default=50, help="Checkpoints per writer")
+    parser.add_argument("--payload-kb", type=int, default=16, help="Checkpoint payload size")
+    args = parser.parse_args()
+
+    baseline = None
+    for shards in args.shards:
+        rate = asyncio.run(bench(shards, args.writers, args.writes, args.payload_kb))
+        baseline = baseline or rate
+        print(f"{shards:3d} shard(s): {rate:9.1f} writes/s   ({rate / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
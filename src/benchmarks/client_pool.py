@@ -0,0 +1,107 @@
+"""
+Requests/sec of one-shot httpx calls vs the pooled AgentClient.
+
+Runs a local stand-in for the agent service, so no agent or LLM is involved.
+
+    cd src && python -m benchmarks.client_pool --requests 2000 --concurrency 32
+"""
+import argparse
+import asyncio
+import socket
+import threading
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+from client import AgentClient
+from schema import AgentInfo, ChatMessage, ServiceMetadata, UserInput
+from schema.models import OpenAIModelName
+
+stand_in = FastAPI()
+
+
+@stand_in.get("/info")
+async def info() -> ServiceMetadata:
+    return ServiceMetadata(
+        agents=[AgentInfo(key="research-agent", description="stand-in")],
+        models=[OpenAIModelName.GPT_4O_MINI],
+        default_agent="research-agent",
+        default_model=OpenAIModelName.GPT_4O_MINI,
+    )
+
+
+@stand_in.post("/{agent_id}/invoke")
+async def invoke(user_input: UserInput, agent_id: str) -> ChatMessage:
+    return ChatMessage(type="ai", content=user_input.message)
+
+
+def start_server() -> str:
+    """Start the stand-in server on a free port in a background thread."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(
+        uvicorn.Config(stand_in, host="127.0.0.1", port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+def bench_sync(base_url: str, n: int) -> tuple[float, float]:
+    body = UserInput(message="ping").model_dump()
+    start = time.perf_counter()
+    for _ in range(n):
+        httpx.post(f"{base_url}/research-agent/invoke", json=body).raise_for_status()
+    one_shot = n / (time.perf_counter() - start)
+    
+    with AgentClient(base_url) as client:
+        start = time.perf_counter()
+        for _ in range(n):
+            client.invoke("ping")
+        pooled = n / (time.perf_counter() - start)
+    return one_shot, pooled
+
+
+async def bench_async(base_url: str, n: int, concurrency: int) -> tuple[float, float]:
+    body = UserInput(message="ping").model_dump()
+    sem = asyncio.Semaphore(concurrency)
+    
+    async def one_shot_call() -> None:
+        async with sem, httpx.AsyncClient() as client:
+            response = await client.post(f"{base_url}/research-agent/invoke", json=body)
+            response.raise_for_status()
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one_shot_call() for _ in range(n)))
+    one_shot = n / (time.perf_counter() - start)
+    
+    async with AgentClient(base_url, max_connections=concurrency) as client:
+        async def pooled_call() -> None:
+            async with sem:
+                await client.ainvoke("ping")
+        
+        start = time.perf_counter()
+        await asyncio.gather(*(pooled_call() for _ in range(n)))
+        pooled = n / (time.perf_counter() - start)
+    return one_shot, pooled
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="AgentClient connection pool benchmark")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    
+    base_url = start_server()
+    one_shot, pooled = bench_sync(base_url, args.requests)
+    print(f"sync   one-shot: {one_shot:8.1f} req/s   pooled: {pooled:8.1f} req/s   ({pooled / one_shot:.2f}x)")
+    one_shot, pooled = asyncio.run(bench_async(base_url, args.requests, args.concurrency))
+    print(f"async  one-shot: {one_shot:8.1f} req/s   pooled: {pooled:8.1f} req/s   ({pooled / one_shot:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Deterministic stand-ins for the chat model and the Tavily search API, so the
+real research agent graph can be benchmarked without network access.
+"""
+import asyncio
+from collections.abc import AsyncIterator, Iterator
+import json
+import os
+import time
+from typing import Any, Optional
+
+# The Tavily tool and Settings validate API keys when imported; nothing is sent to the providers
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("TAVILY_API_KEY", "tvly-benchmark")
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.language_models.chat_models import generate_from_stream
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that runs `searches` search rounds per user turn and then streams
+    an answer of `answer_tokens` tokens, with configurable latency and token rate.
+    """
+
+    searches: int = 1
+    answer_tokens: int = 100
+    first_token_latency: float = 0.0
+    tokens_per_second: float | None = None
+    tool_name: str = "tavily_search_results_json"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "FakeChatModel":
+        return self
+
+    def _searches_done(self, messages: list[BaseMessage]) -> int:
+        done = 0
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                break
+            done += isinstance(message, ToolMessage)
+        return done
+
+    def _chunks(self, messages: list[BaseMessage]) -> Iterator[AIMessageChunk]:
+        done = self._searches_done(messages)
+        if done < self.searches:
+            args = json.dumps({"query": f"search {done} for {messages[-1].content[:40]}"})
+            yield AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {"name": self.tool_name, "args": args, "id": f"call_{len(messages)}", "index": 0}
+                ],
+            )
+            return
+        for i in range(self.answer_tokens):
+            yield AIMessageChunk(content=f"token{i} ")
+
+    @property
+    def _token_delay(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return generate_from_stream(self._stream(messages, stop, run_manager, **kwargs))
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_latency)
+        for chunk in self._chunks(messages):
+            yield ChatGenerationChunk(message=chunk)
+            if self._token_delay:
+                time.sleep(self._token_delay)
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_latency)
+        for chunk in self._chunks(messages):
+            yield ChatGenerationChunk(message=chunk)
+            if self._token_delay:
+                await asyncio.sleep(self._token_delay)
+
+
+def fake_search_results(query: str, results: int = 5, payload_kb: int = 4) -> dict[str, Any]:
+    body = ("lorem ipsum " * (payload_kb * 1024 // 12 + 1))[: payload_kb * 1024]
+    return {
+        "query": query,
+        "answer": f"Answer for {query}",
+        "images": [],
+        "results": [
+            {"url": f"https://example.com/{i}", "title": f"Result {i}", "content": body, "raw_content": body}
+            for i in range(results)
+        ],
+    }
+
+
+def install_fakes(
+    searches: int = 1,
+    answer_tokens: int = 100,
+    first_token_latency: float = 0.0,
+    tokens_per_second: float | None = None,
+    search_latency: float = 0.0,
+    search_payload_kb: int = 4,
+) -> FakeChatModel:
+    """Wire the research agent's graph to a FakeChatModel and a fake search API."""
+    import agents.research_agent as research_agent
+
+    model = FakeChatModel(
+        searches=searches,
+        answer_tokens=answer_tokens,
+        first_token_latency=first_token_latency,
+        tokens_per_second=tokens_per_second,
+    )
+    research_agent.get_model = lambda model_name: model
+    research_agent._model_runnables.clear()
+
+    tool = research_agent.tools[0]
+    if getattr(tool, "cache", None) is not None:
+        # Every search should cost the configured latency
+        tool.cache = None
+
+    def raw_results(query: str, *args: Any, **kwargs: Any) -> dict[str, Any]:
+        time.sleep(search_latency)
+        return fake_search_results(query, payload_kb=search_payload_kb)
+
+    async def raw_results_async(query: str, *args: Any, **kwargs: Any) -> dict[str, Any]:
+        await asyncio.sleep(search_latency)
+        return fake_search_results(query, payload_kb=search_payload_kb)
+
+    # The wrapper is a pydantic model, so bypass its attribute validation
+    object.__setattr__(tool.api_wrapper, "raw_results", raw_results)
+    object.__setattr__(tool.api_wrapper, "raw_results_async", raw_results_async)
+    return model
@@ -0,0 +1,318 @@
+"""
+Offline load test of the real service.
+
+Starts service.app under uvicorn in a subprocess, with the research agent wired
+to the fake chat model and search API from benchmarks.fakes, then drives /invoke,
+/stream and /history through AgentClient at a fixed concurrency. Reports
+throughput, latency percentiles, time to first token and server CPU/RSS, and
+optionally writes them as JSON to compare between commits:
+
+    cd src && python -m benchmarks.load_test --concurrency 16 --requests 200 --out before.json
+
+With several --workers counts the service is run in the pre-fork multi-worker
+mode at each count in turn, giving a throughput scaling curve.
+"""
+import argparse
+import asyncio
+from dataclasses import asdict, dataclass, field
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import psutil
+
+from client import AgentClient, AgentClientError
+
+SCENARIOS = ("invoke", "stream", "history")
+
+
+@dataclass
+class ScenarioResult:
+    scenario: str
+    requests: int
+    errors: int
+    duration_s: float
+    throughput_rps: float
+    latency_ms: dict[str, float]
+    ttft_ms: dict[str, float] | None
+    server_cpu_s: float
+    server_cpu_per_request_ms: float
+    server_rss_peak_mb: float
+    workers: int = 1
+    error_samples: list[str] = field(default_factory=list)
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+    return {
+        "p50": round(rank(50) * 1000, 2),
+        "p95": round(rank(95) * 1000, 2),
+        "p99": round(rank(99) * 1000, 2),
+        "max": round(ordered[-1] * 1000, 2),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 2),
+    }
+
+
+def serve(args: argparse.Namespace) -> None:
+    """Run the service with fakes installed; the --serve side of the benchmark."""
+    import uvicorn
+
+    from benchmarks.fakes import install_fakes
+
+    install_fakes(
+        searches=args.searches,
+        answer_tokens=args.tokens,
+        first_token_latency=args.first_token_latency,
+        tokens_per_second=args.tokens_per_second,
+        search_latency=args.search_latency,
+        search_payload_kb=args.payload_kb,
+    )
+    from service import app
+
+    if args.workers[0] > 1:
+        from service.prefork import serve as serve_workers
+
+        serve_workers(app, "127.0.0.1", args.port, args.workers[0], log_level="warning")
+    else:
+        uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def start_server(args: argparse.Namespace, workdir: str, workers: int) -> subprocess.Popen:
+    command = [
+        sys.executable, "-m", "benchmarks.load_test", "--serve",
+        "--port", str(args.port),
+        "--workers", str(workers),
+        "--searches", str(args.searches),
+        "--tokens", str(args.tokens),
+        "--first-token-latency", str(args.first_token_latency),
+        "--search-latency", str(args.search_latency),
+        "--payload-kb", str(args.payload_kb),
+    ]
+    if args.tokens_per_second:
+        command += ["--tokens-per-second", str(args.tokens_per_second)]
+    env = {
+        **os.environ,
+        "CHECKPOINT_DB_PATH": os.path.join(workdir, "checkpoints.db"),
+        "WORKERS": str(workers),
+    }
+    server = subprocess.Popen(command, cwd=os.getcwd(), env=env)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("Benchmark server exited during startup")
+        try:
+            if httpx.get(f"http://127.0.0.1:{args.port}/health", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("Benchmark server did not start within 60s")
+
+
+def process_tree(process: psutil.Process) -> list[psutil.Process]:
+    """The server process and its workers."""
+    return [process, *process.children(recursive=True)]
+
+
+def tree_cpu(process: psutil.Process) -> float:
+    total = 0.0
+    for p in process_tree(process):
+        try:
+            total += sum(p.cpu_times()[:2])
+        except psutil.NoSuchProcess:
+            pass
+    return total
+
+
+def tree_rss(process: psutil.Process) -> int:
+    # Summed RSS counts the copy-on-write pages workers share with the parent more than once
+    total = 0
+    for p in process_tree(process):
+        try:
+            total += p.memory_info().rss
+        except psutil.NoSuchProcess:
+            pass
+    return total
+
+
+async def sample_rss(process: psutil.Process, peak: list[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        peak[0] = max(peak[0], tree_rss(process))
+        try:
+            await asyncio.wait_for(stop.wait(), 0.1)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_scenario(
+    scenario: str,
+    client: AgentClient,
+    process: psutil.Process,
+    requests: int,
+    concurrency: int,
+    threads: list[str],
+) -> ScenarioResult:
+    latencies: list[float] = []
+    ttfts: list[float] = []
+    errors: list[str] = []
+    counter = iter(range(requests))
+
+    async def one(i: int) -> None:
+        start = time.perf_counter()
+        try:
+            if scenario == "invoke":
+                await client.ainvoke(f"benchmark question {i}")
+            elif scenario == "stream":
+                first = None
+                async for item in client.astream(f"benchmark question {i}"):
+                    if first is None and isinstance(item, str):
+                        first = time.perf_counter() - start
+                if first is not None:
+                    ttfts.append(first)
+            else:
+                await client.aget_history(threads[i % len(threads)], limit=50)
+        except AgentClientError as e:
+            errors.append(str(e))
+            return
+        latencies.append(time.perf_counter() - start)
+
+    async def worker() -> None:
+        for i in counter:
+            await one(i)
+
+    peak = [0.0]
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_rss(process, peak, stop))
+    cpu_before = tree_cpu(process)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - start
+    cpu = tree_cpu(process) - cpu_before
+    stop.set()
+    await sampler
+    return ScenarioResult(
+        scenario=scenario,
+        requests=requests,
+        errors=len(errors),
+        duration_s=round(duration, 3),
+        throughput_rps=round(len(latencies) / duration, 2),
+        latency_ms=percentiles(latencies),
+        ttft_ms=percentiles(ttfts) if scenario == "stream" else None,
+        server_cpu_s=round(cpu, 3),
+        server_cpu_per_request_ms=round(cpu / requests * 1000, 3),
+        server_rss_peak_mb=round(peak[0] / 2**20, 1),
+        error_samples=errors[:5],
+    )
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def drive(args: argparse.Namespace, server: subprocess.Popen, workers: int) -> list[ScenarioResult]:
+    process = psutil.Process(server.pid)
+    client = AgentClient(
+        f"http://127.0.0.1:{args.port}",
+        timeout=args.timeout,
+        max_connections=max(100, args.concurrency),
+        max_keepalive_connections=max(20, args.concurrency),
+    )
+    # Threads with a conversation in them for /history, created outside the measurement
+    threads = []
+    for i in range(min(args.concurrency, 8)):
+        await client.ainvoke("seed", thread_id=f"load-test-{i}")
+        threads.append(f"load-test-{i}")
+    results = []
+    for scenario in args.scenarios:
+        await run_scenario(scenario, client, process, args.concurrency, args.concurrency, threads)
+        result = await run_scenario(scenario, client, process, args.requests, args.concurrency, threads)
+        result.workers = workers
+        results.append(result)
+        ttft = f"  ttft p50 {result.ttft_ms['p50']:8.2f} ms" if result.ttft_ms else ""
+        print(
+            f"{workers:2d}w {scenario:8s} {result.throughput_rps:8.2f} req/s  "
+            f"p50 {result.latency_ms.get('p50', 0):8.2f}  p95 {result.latency_ms.get('p95', 0):8.2f}  "
+            f"p99 {result.latency_ms.get('p99', 0):8.2f} ms{ttft}  "
+            f"server CPU/req {result.server_cpu_per_request_ms:7.2f} ms  "
+            f"RSS {result.server_rss_peak_mb:7.1f} MB  errors {result.errors}"
+        )
+    await client.aclose()
+    return results
+
+
+def print_scaling(results: list[ScenarioResult]) -> None:
+    """Throughput per worker count, relative to the smallest count measured."""
+    for scenario in dict.fromkeys(r.scenario for r in results):
+        curve = [r for r in results if r.scenario == scenario]
+        base = curve[0].throughput_rps or 1.0
+        points = "  ".join(
+            f"{r.workers}w {r.throughput_rps:.2f} req/s ({r.throughput_rps / base:.2f}x)" for r in curve
+        )
+        print(f"scaling {scenario:8s} {points}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline load test of the agent service")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=100, help="Measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1], help="Server worker processes; several for a scaling curve"
+    )
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--searches", type=int, default=1, help="Search rounds per run")
+    parser.add_argument("--tokens", type=int, default=100, help="Answer tokens per run")
+    parser.add_argument("--first-token-latency", type=float, default=0.2, help="Fake model TTFT (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Fake model token rate")
+    parser.add_argument("--search-latency", type=float, default=0.3, help="Fake search latency (s)")
+    parser.add_argument("--payload-kb", type=int, default=4, help="Fake search payload per result")
+    parser.add_argument("--out", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    results = []
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as workdir:
+            server = start_server(args, workdir, workers)
+            try:
+                results += asyncio.run(drive(args, server, workers))
+            finally:
+                server.terminate()
+                server.wait(timeout=60)
+    if len(args.workers) > 1:
+        print_scaling(results)
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("serve", "out")},
+        "results": [asdict(r) for r in results],
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
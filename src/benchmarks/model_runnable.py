@@ -0,0 +1,43 @@
+"""
+Per-step overhead of rebuilding wrap_model vs the cached get_model_runnable.
+
+No model is called; this only measures building the bound, prompt-prefixed runnable.
+
+    cd src && python -m benchmarks.model_runnable --steps 2000
+"""
+import argparse
+import os
+import time
+
+# Settings and the Tavily tool validate API keys at import; nothing is sent to the providers
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("TAVILY_API_KEY", "tvly-benchmark")
+
+from agents.research_agent import get_model_runnable, wrap_model
+from core import get_model
+from schema.models import OpenAIModelName
+
+
+def per_step_us(fn, steps: int) -> float:
+    start = time.perf_counter()
+    for _ in range(steps):
+        fn()
+    return (time.perf_counter() - start) / steps * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="wrap_model per-step overhead benchmark")
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--model", type=OpenAIModelName, default=OpenAIModelName.GPT_4O_MINI)
+    args = parser.parse_args()
+    
+    model = get_model(args.model)
+    get_model_runnable(args.model)  # warm the cache
+    rebuilt = per_step_us(lambda: wrap_model(model), args.steps)
+    cached = per_step_us(lambda: get_model_runnable(args.model), args.steps)
+    print(f"wrap_model per step:         {rebuilt:9.1f} us")
+    print(f"get_model_runnable per step: {cached:9.1f} us   ({rebuilt / cached:.0f}x less)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+SSE frames/sec: json.dumps f-string frames vs the bytes encoder, and the matching decoders.
+
+    cd src && python -m benchmarks.sse_frames --frames 200000
+"""
+import argparse
+import json
+import time
+
+from client import AgentClient
+from schema import ChatMessage
+from service.sse import message_frame, token_frame
+
+
+def rate(fn, items: list) -> float:
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return len(items) / (time.perf_counter() - start)
+
+
+def legacy_parse(line: str) -> ChatMessage | str:
+    parsed = json.loads(line.strip()[6:])
+    if parsed["type"] == "message":
+        return ChatMessage.model_validate(parsed["content"])
+    return parsed["content"]
+
+
+def report(name: str, legacy: float, fast: float) -> None:
+    print(f"{name:16s} legacy: {legacy:11.0f}/s   fast: {fast:11.0f}/s   ({fast / legacy:.2f}x)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SSE frame encode/decode benchmark")
+    parser.add_argument("--frames", type=int, default=100_000)
+    parser.add_argument("--message-kb", type=int, default=8, help="Size of message frame content")
+    args = parser.parse_args()
+    
+    tokens = [f" token{i}" for i in range(args.frames)]
+    message = ChatMessage(
+        type="tool", content="x" * (args.message_kb * 1024), tool_call_id="call_1", run_id="run_1"
+    )
+    messages = [message] * max(args.frames // 10, 1)
+    
+    report(
+        "encode token",
+        rate(lambda t: f"data: {json.dumps({'type': 'token', 'content': t})}\n\n", tokens),
+        rate(token_frame, tokens),
+    )
+    report(
+        "encode message",
+        rate(lambda m: f"data: {json.dumps({'type': 'message', 'content': m.model_dump()})}\n\n", messages),
+        rate(message_frame, messages),
+    )
+    
+    client = AgentClient(get_info=False)
+    token_lines = [token_frame(t).decode() for t in tokens]
+    message_lines = [message_frame(m).decode() for m in messages]
+    report("decode token", rate(legacy_parse, token_lines), rate(client._parse_stream_line, token_lines))
+    report("decode message", rate(legacy_parse, message_lines), rate(client._parse_stream_line, message_lines))
+
+
+if __name__ == "__main__":
+    main()
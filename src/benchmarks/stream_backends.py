@@ -0,0 +1,59 @@
+"""
+Events processed and CPU per /stream request for the astream_events and
+astream(stream_mode=[...]) streaming backends, using the fake model and search.
+
+    cd src && python -m benchmarks.stream_backends --requests 50
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.fakes import install_fakes
+from agents import DEFAULT_AGENT, get_agent
+from core import settings
+from schema import StreamInput
+from service.service import _parse_input, message_generator
+
+
+async def count_raw_events(backend: str) -> int:
+    """Events the backend receives from LangGraph for one request."""
+    agent = get_agent(DEFAULT_AGENT)
+    kwargs, _ = _parse_input(StreamInput(message="benchmark"))
+    if backend == "events":
+        return len([e async for e in agent.astream_events(**kwargs, version="v2")])
+    return len([c async for c in agent.astream(**kwargs, stream_mode=["messages", "updates"])])
+
+
+async def cpu_per_request(backend: str, requests: int) -> tuple[float, int]:
+    settings.STREAM_BACKEND = backend
+    frames = 0
+    start = time.process_time()
+    for _ in range(requests):
+        async for _ in message_generator(StreamInput(message="benchmark")):
+            frames += 1
+    return (time.process_time() - start) / requests, frames // requests
+
+
+async def run(args: argparse.Namespace) -> None:
+    install_fakes(searches=args.searches, answer_tokens=args.tokens)
+    for backend in ("events", "updates"):
+        await cpu_per_request(backend, 2)  # warm up
+        events = await count_raw_events(backend)
+        cpu, frames = await cpu_per_request(backend, args.requests)
+        print(
+            f"{backend:8s} events/request: {events:6d}   frames/request: {frames:5d}   "
+            f"CPU/request: {cpu * 1000:8.2f} ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Streaming backend overhead benchmark")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--searches", type=int, default=2, help="Search rounds per request")
+    parser.add_argument("--tokens", type=int, default=200, help="Answer tokens per request")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
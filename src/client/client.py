@@ -1,10 +1,32 @@
 
 
 from collections.abc import AsyncGenerator, Generator
+import asyncio
 import json
+import time
 from typing import Any
 import httpx
-from schema import ServiceMetadata, ChatMessage, UserInput, ChatHistory, ChatHistoryInput, StreamInput
+from schema import (
+    ServiceMetadata,
+    ChatMessage,
+    UserInput,
+    ChatHistory,
+    ChatHistoryInput,
+    StreamInput,
+    BatchInput,
+    BatchResult,
+    RunStatus,
+    RunTrace,
+)
+
+try:
+    from orjson import loads as json_loads
+except ImportError:  # orjson is an optional speedup
+    json_loads = json.loads
+
+# Compact frame prefixes written by the service, decoded without building a dict
+_TOKEN_PREFIX = 'data: {"type":"token","content":'
+_MESSAGE_PREFIX = 'data: {"type":"message","content":'
 
 class AgentClientError(Exception):
     pass
@@ -18,19 +40,52 @@ class AgentClient:
         agent: str = None,
         timeout: float | None = None,
         get_info: bool = True,
+        max_connections: int | None = 100,
+        max_keepalive_connections: int | None = 20,
+        keepalive_expiry: float | None = 5.0,
+        http2: bool = False,
+        max_reconnects: int = 3,
     ) -> None:
         """
         Initialize the client.
         
+        The client owns a long-lived sync and async connection pool, so repeated
+        requests reuse TCP (and TLS) connections. Use it as a context manager or
+        call close()/aclose() once done to release the pooled connections.
+        
+        The async pool is tied to one event loop. Using the client from another
+        loop replaces the pool, so a client that is shared across loops (e.g. one
+        `asyncio.run` per call) gets no connection reuse between them.
+        
         Args:
             base_url (str): The base URL of the agent service.
             agent (str): The name of the default agent to use.
             timeout (float, optional): The timeout for requests.
             get_info (bool, optional): Wheather to fetch agent information on init.
                 Default: True
+            max_connections (int, optional): Maximum number of concurrent connections
+                per pool. Default: 100
+            max_keepalive_connections (int, optional): Maximum number of idle connections
+                kept alive per pool. Default: 20
+            keepalive_expiry (float, optional): Seconds an idle connection is kept alive.
+                Default: 5.0
+            http2 (bool, optional): Enable HTTP/2, requires the `h2` package
+                (`pip install httpx[http2]`). Default: False
+            max_reconnects (int, optional): Times stream()/astream() resume a run after
+                its connection drops without receiving new events. Default: 3
         """
         self.base_url = base_url
         self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2
+        self.max_reconnects = max_reconnects
+        self._client: httpx.Client | None = None
+        self._aclient: httpx.AsyncClient | None = None
+        self._aclient_loop: asyncio.AbstractEventLoop | None = None
         self.info: ServiceMetadata | None = None
         self.agent: str | None = None
         if get_info:
@@ -43,10 +98,80 @@ class AgentClient:
         headers = {}
         # TODO: Add authentication
         return headers
+    
+    @property
+    def client(self) -> httpx.Client:
+        """Pooled sync HTTP client, created on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.Client(
+                timeout=self.timeout, limits=self.limits, http2=self.http2
+            )
+        return self._client
+    
+    @property
+    def aclient(self) -> httpx.AsyncClient:
+        """
+        Pooled async HTTP client, created on first use.
+        
+        Pooled connections are bound to the event loop that opened them, so the
+        pool is recreated when the client is used from a new loop (e.g. Streamlit
+        runs every script rerun in a fresh `asyncio.run`). The previous pool is
+        closed on its loop if that loop still runs, and otherwise dropped.
+        """
+        loop = asyncio.get_running_loop()
+        if self._aclient is not None and self._aclient_loop is not loop:
+            self._drop_aclient()
+        if self._aclient is None or self._aclient.is_closed:
+            self._aclient = httpx.AsyncClient(
+                timeout=self.timeout, limits=self.limits, http2=self.http2
+            )
+            self._aclient_loop = loop
+        return self._aclient
+    
+    def close(self) -> None:
+        """Close the pooled sync connections."""
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+    
+    def _drop_aclient(self) -> None:
+        """Release the async pool of another event loop, which cannot be awaited from this one."""
+        aclient, loop = self._aclient, self._aclient_loop
+        self._aclient = None
+        self._aclient_loop = None
+        if aclient.is_closed:
+            return
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(aclient.aclose(), loop)
+        # Otherwise the loop is gone (e.g. a finished asyncio.run) and nothing can await
+        # the close; dropping the last reference lets the connections be collected
+    
+    async def aclose(self) -> None:
+        """Close both the pooled async and sync connections."""
+        if self._aclient is not None:
+            if self._aclient_loop is asyncio.get_running_loop():
+                await self._aclient.aclose()
+                self._aclient = None
+                self._aclient_loop = None
+            else:
+                self._drop_aclient()
+        self.close()
+    
+    def __enter__(self) -> "AgentClient":
+        return self
+    
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+    
+    async def __aenter__(self) -> "AgentClient":
+        return self
+    
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
 
     def retrieve_info(self) -> None:
         try:
-            response = httpx.get(
+            response = self.client.get(
                 f"{self.base_url}/info",
                 headers=self._headers,
                 timeout=self.timeout,
@@ -87,7 +212,8 @@ class AgentClient:
             agent_config (dict[str, Any], optional): Additional confituration to pass through the agent
             
         Returns:
-            ChatMessage: The final message from the agent
+            ChatMessage: The final message from the agent. With agent_config={"trace": True},
+                RunTrace.from_message() reads the run's trace from it
         """
         if not self.agent:
             raise AgentClientError("No agent selected, Use update_agent() to select agent.")
@@ -98,17 +224,16 @@ class AgentClient:
             request.model = model
         if agent_config:
             request.agent_config = agent_config
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/{self.agent}/invoke",
-                    json=request.model_dump(),
-                    headers=self._headers,
-                    timeout=self.timeout,
-                )
-                response.raise_for_status()
-            except httpx.HTTPError as e:
-                raise AgentClientError(f"Error: {e}")
+        try:
+            response = await self.aclient.post(
+                f"{self.base_url}/{self.agent}/invoke",
+                json=request.model_dump(),
+                headers=self._headers,
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise AgentClientError(f"Error: {e}")
         
         return ChatMessage.model_validate(response.json())
     
@@ -129,7 +254,8 @@ class AgentClient:
             agent_config (dict[str, Any], optional): Additional confituration to pass through the agent
             
         Returns:
-            ChatMessage: The final message from the agent
+            ChatMessage: The final message from the agent. With agent_config={"trace": True},
+                RunTrace.from_message() reads the run's trace from it
         """
         if not self.agent:
             raise AgentClientError("No agent selected, Use update_agent() to select agent.")
@@ -141,7 +267,7 @@ class AgentClient:
         if agent_config:
             request.agent_config = agent_config
         try:
-            response = httpx.post(
+            response = self.client.post(
                 f"{self.base_url}/{self.agent}/invoke",
                 json=request.model_dump(),
                 headers=self._headers,
@@ -153,14 +279,113 @@ class AgentClient:
     
         return ChatMessage.model_validate(response.json())
     
-    def _parse_stream_line(self, line: str) -> ChatMessage | str | None:
+    def _batch_request(
+        self,
+        inputs: list[str | UserInput],
+        model: str | None,
+        agent_config: dict[str, Any] | None,
+        max_concurrency: int | None,
+    ) -> BatchInput:
+        if not self.agent:
+            raise AgentClientError("No agent selected, Use update_agent() to select agent.")
+        user_inputs = []
+        for item in inputs:
+            if isinstance(item, str):
+                item = UserInput(message=item)
+                if model:
+                    item.model = model
+                if agent_config:
+                    item.agent_config = agent_config
+            user_inputs.append(item)
+        return BatchInput(inputs=user_inputs, max_concurrency=max_concurrency)
+    
+    async def abatch(
+        self,
+        inputs: list[str | UserInput],
+        model: str | None = None,
+        agent_config: dict[str, Any] | None = None,
+        max_concurrency: int | None = None,
+    ) -> BatchResult:
+        """
+        Invoke the agent asynchronously on a batch of independent inputs in a single request.
+        
+        Args:
+            inputs (list[str | UserInput]): Messages (or full UserInputs) to send to the agent.
+                Each message runs in a new thread.
+            model (str, optional): LLM model to use for plain message inputs
+            agent_config (dict[str, Any], optional): Additional configuration for plain message inputs
+            max_concurrency (int, optional): Maximum number of inputs the service runs at once
+        
+        Returns:
+            BatchResult: Per-input final message or error, in input order
+        """
+        request = self._batch_request(inputs, model, agent_config, max_concurrency)
+        try:
+            response = await self.aclient.post(
+                f"{self.base_url}/{self.agent}/invoke/batch",
+                json=request.model_dump(),
+                headers=self._headers,
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise AgentClientError(f"Error: {e}")
+        
+        return BatchResult.model_validate(response.json())
+    
+    def batch(
+        self,
+        inputs: list[str | UserInput],
+        model: str | None = None,
+        agent_config: dict[str, Any] | None = None,
+        max_concurrency: int | None = None,
+    ) -> BatchResult:
+        """
+        Invoke the agent synchronously on a batch of independent inputs in a single request.
+        
+        Args:
+            inputs (list[str | UserInput]): Messages (or full UserInputs) to send to the agent.
+                Each message runs in a new thread.
+            model (str, optional): LLM model to use for plain message inputs
+            agent_config (dict[str, Any], optional): Additional configuration for plain message inputs
+            max_concurrency (int, optional): Maximum number of inputs the service runs at once
+        
+        Returns:
+            BatchResult: Per-input final message or error, in input order
+        """
+        request = self._batch_request(inputs, model, agent_config, max_concurrency)
+        try:
+            response = self.client.post(
+                f"{self.base_url}/{self.agent}/invoke/batch",
+                json=request.model_dump(),
+                headers=self._headers,
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise AgentClientError(f"Error: {e}")
+        
+        return BatchResult.model_validate(response.json())
+    
+    def _parse_stream_line(self, line: str) -> ChatMessage | str | RunTrace | None:
         line = line.strip()
+        # Fast paths: decode only the payload of the frames the service sends most
+        if line.startswith(_TOKEN_PREFIX) and line.endswith("}"):
+            try:
+                return json_loads(line[len(_TOKEN_PREFIX):-1])
+            except Exception as e:
+                raise Exception(f"Error JSON parsing message from server: {e}")
+        if line.startswith(_MESSAGE_PREFIX) and line.endswith("}"):
+            try:
+                return ChatMessage.model_validate_json(line[len(_MESSAGE_PREFIX):-1])
+            except Exception as e:
+                raise Exception(f"Server returned invalid message: {e}")
         if line.startswith("data: "):
             data = line[6: ]
             if data == "[DONE]":
                 return None
             try:
-                parsed = json.loads(data)
+                parsed = json_loads(data)
             except Exception as e:
                 raise Exception(f"Error JSON parsing message from server: {e}")
             match parsed["type"]:
@@ -173,10 +398,25 @@ class AgentClient:
                 case "token":
                     # Yield the str token directly
                     return parsed["content"]
+                case "trace":
+                    try:
+                        return RunTrace.model_validate(parsed["content"])
+                    except Exception as e:
+                        raise Exception(f"Server returned invalid trace: {e}")
                 case "error":
                     raise Exception(parsed["content"])
         return None
     
+    def _resume_request(self, run_id: str, last_event_id: str | None) -> tuple[str, dict[str, str]]:
+        headers = dict(self._headers)
+        if last_event_id:
+            headers["Last-Event-ID"] = last_event_id
+        return f"{self.base_url}/runs/{run_id}/stream", headers
+    
+    @staticmethod
+    def _reconnect_delay(attempt: int) -> float:
+        return min(0.25 * 2 ** (attempt - 1), 5.0)
+    
     def stream(
         self,
         message: str,
@@ -184,7 +424,9 @@ class AgentClient:
         thread_id: str | None = None,
         agent_config: dict[str, Any] | None = None,
         stream_tokens: bool = True,
-    ) -> Generator[ChatMessage | str, None, None]:
+        token_flush_ms: int | None = None,
+        token_flush_bytes: int | None = None,
+    ) -> Generator[ChatMessage | str | RunTrace, None, None]:
         """
         Stream the agent's response synchronously.
         
@@ -192,6 +434,9 @@ class AgentClient:
         If stream_tokens is True (the default value), the response will also yield
         content tokens from streaming models as they are generated.
         
+        If the connection drops mid-run, the stream is resumed from the last event
+        received, up to max_reconnects times without progress.
+        
         Args:
             message (str): The message to send to the agent
             model (str, optional): LLM model to use for the agent
@@ -199,36 +444,66 @@ class AgentClient:
             agent_config (dict[str, Any], optional): Additional configuration to pass through to the agent
             stream_tokens (bool, optional): Stream tokens as they are generated
                 Default: True
+            token_flush_ms (int, optional): Let the service coalesce tokens, flushing
+                at most this many milliseconds after the first buffered token
+            token_flush_bytes (int, optional): Let the service coalesce tokens, flushing
+                once this many bytes are buffered
         
         Returns:
-            Generator[ChatMessage | str, None, None]: The response from the agent
+            Generator[ChatMessage | str | RunTrace, None, None]: The response from the agent,
+                ending with a RunTrace if agent_config has {"trace": True}
         """
         if not self.agent:
             raise AgentClientError("No agent selected, Use update_agent() to select agent.")
-        request = StreamInput(message=message, stream_tokens=stream_tokens)
+        request = StreamInput(
+            message=message,
+            stream_tokens=stream_tokens,
+            token_flush_ms=token_flush_ms,
+            token_flush_bytes=token_flush_bytes,
+        )
         if thread_id:
             request.thread_id = thread_id
         if model:
             request.model = model
         if agent_config:
             request.agent_config = agent_config
-        try:
-            with httpx.stream(
-                "POST",
-                f"{self.base_url}/{self.agent}/stream",
-                json=request.model_dump(),
-                headers=self._headers,
-                timeout=self.timeout,
-            ) as response:
-                response.raise_for_status()
-                for line in response.iter_lines():
-                    if line.strip():
-                        parsed = self._parse_stream_line(line)
-                        if parsed is None:
-                            break
-                        yield parsed
-        except httpx.HTTPError as e:
-            raise AgentClientError(f"Error: {e}")
+        run_id: str | None = None
+        last_event_id: str | None = None
+        attempt = 0
+        while True:
+            try:
+                if run_id is None:
+                    response_stream = self.client.stream(
+                        "POST",
+                        f"{self.base_url}/{self.agent}/stream",
+                        json=request.model_dump(),
+                        headers=self._headers,
+                        timeout=self.timeout,
+                    )
+                else:
+                    url, headers = self._resume_request(run_id, last_event_id)
+                    response_stream = self.client.stream("GET", url, headers=headers, timeout=self.timeout)
+                with response_stream as response:
+                    response.raise_for_status()
+                    run_id = response.headers.get("X-Run-ID", run_id)
+                    for line in response.iter_lines():
+                        if line.startswith("id:"):
+                            last_event_id = line[3:].strip()
+                            attempt = 0
+                        elif line.strip():
+                            parsed = self._parse_stream_line(line)
+                            if parsed is None:
+                                return
+                            yield parsed
+                raise httpx.RemoteProtocolError("Stream ended before the run finished")
+            except httpx.TransportError as e:
+                # Only a run the service has accepted can be resumed
+                if run_id is None or attempt >= self.max_reconnects:
+                    raise AgentClientError(f"Error: {e}")
+                attempt += 1
+                time.sleep(self._reconnect_delay(attempt))
+            except httpx.HTTPError as e:
+                raise AgentClientError(f"Error: {e}")
     
     async def astream(
         self,
@@ -237,7 +512,9 @@ class AgentClient:
         thread_id: str | None = None,
         agent_config: dict[str, Any] | None = None,
         stream_tokens: bool = True,
-    ) -> AsyncGenerator[ChatMessage | str, None]:
+        token_flush_ms: int | None = None,
+        token_flush_bytes: int | None = None,
+    ) -> AsyncGenerator[ChatMessage | str | RunTrace, None]:
         """
         Stream the agent's response asynchronously.
         
@@ -245,6 +522,9 @@ class AgentClient:
         If stream_tokens is True (the default value), the response will also yield
         content tokens from streaming models as they are generated.
         
+        If the connection drops mid-run, the stream is resumed from the last event
+        received, up to max_reconnects times without progress.
+        
         Args:
             message (str): The message to send to the agent
             model (str, optional): LLM model to use for the agent
@@ -252,52 +532,370 @@ class AgentClient:
             agent_config (dict[str, Any], optional): Additional configuration to pass through to the agent
             stream_tokens (bool, optional): Stream tokens as they are generated
                 Default: True
+            token_flush_ms (int, optional): Let the service coalesce tokens, flushing
+                at most this many milliseconds after the first buffered token
+            token_flush_bytes (int, optional): Let the service coalesce tokens, flushing
+                once this many bytes are buffered
         
         Returns:
-            AsyncGenerator[ChatMessage | str, None]: The response from the agent
+            AsyncGenerator[ChatMessage | str | RunTrace, None]: The response from the agent,
+                ending with a RunTrace if agent_config has {"trace": True}
         """
         if not self.agent:
             raise AgentClientError("No agent selected, Use update_agent() to select agent.")
-        request = StreamInput(message=message, stream_tokens=stream_tokens)
+        request = StreamInput(
+            message=message,
+            stream_tokens=stream_tokens,
+            token_flush_ms=token_flush_ms,
+            token_flush_bytes=token_flush_bytes,
+        )
         if thread_id:
             request.thread_id = thread_id
         if model:
             request.model = model
         if agent_config:
             request.agent_config = agent_config
-        async with httpx.AsyncClient() as client:
+        run_id: str | None = None
+        last_event_id: str | None = None
+        attempt = 0
+        while True:
             try:
-                async with client.stream(
-                    "POST",
-                    f"{self.base_url}/{self.agent}/stream",
-                    json=request.model_dump(),
-                    headers=self._headers,
-                    timeout=self.timeout,
-                ) as response:
+                if run_id is None:
+                    response_stream = self.aclient.stream(
+                        "POST",
+                        f"{self.base_url}/{self.agent}/stream",
+                        json=request.model_dump(),
+                        headers=self._headers,
+                        timeout=self.timeout,
+                    )
+                else:
+                    url, headers = self._resume_request(run_id, last_event_id)
+                    response_stream = self.aclient.stream("GET", url, headers=headers, timeout=self.timeout)
+                async with response_stream as response:
                     response.raise_for_status()
+                    run_id = response.headers.get("X-Run-ID", run_id)
                     async for line in response.aiter_lines():
-                        if line.strip():
+                        if line.startswith("id:"):
+                            last_event_id = line[3:].strip()
+                            attempt = 0
+                        elif line.strip():
                             parsed = self._parse_stream_line(line)
                             if parsed is None:
-                                break
+                                return
                             yield parsed
+                raise httpx.RemoteProtocolError("Stream ended before the run finished")
+            except httpx.TransportError as e:
+                # Only a run the service has accepted can be resumed
+                if run_id is None or attempt >= self.max_reconnects:
+                    raise AgentClientError(f"Error: {e}")
+                attempt += 1
+                await asyncio.sleep(self._reconnect_delay(attempt))
             except httpx.HTTPError as e:
                 raise AgentClientError(f"Error: {e}")
     
+    def _run_request(
+        self,
+        message: str,
+        model: str | None,
+        thread_id: str | None,
+        agent_config: dict[str, Any] | None,
+        stream_tokens: bool,
+    ) -> StreamInput:
+        request = StreamInput(message=message, stream_tokens=stream_tokens)
+        if thread_id:
+            request.thread_id = thread_id
+        if model:
+            request.model = model
+        if agent_config:
+            request.agent_config = agent_config
+        return request
+    
+    def submit_run(
+        self,
+        message: str,
+        model: str | None = None,
+        thread_id: str | None = None,
+        agent_config: dict[str, Any] | None = None,
+        stream_tokens: bool = True,
+    ) -> RunStatus:
+        """
+        Queue a background run on the service and return without waiting for it.
+        
+        Args:
+            message (str): The message to send to the agent
+            model (str, optional): LLM model to use for the agent
+            thread_id (str, optional): Thread ID for continuing a conversation
+            agent_config (dict[str, Any], optional): Additional configuration to pass through to the agent
+            stream_tokens (bool, optional): Buffer tokens for GET /runs/{run_id}/events
+                Default: True
+        
+        Returns:
+            RunStatus: The queued run; poll it with get_run() or wait_run()
+        """
+        if not self.agent:
+            raise AgentClientError("No agent selected, Use update_agent() to select agent.")
+        request = self._run_request(message, model, thread_id, agent_config, stream_tokens)
+        try:
+            response = self.client.post(
+                f"{self.base_url}/{self.agent}/runs",
+                json=request.model_dump(),
+                headers=self._headers,
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise AgentClientError(f"Error: {e}")
+        
+        return RunStatus.model_validate(response.json())
+    
+    async def asubmit_run(
+        self,
+        message: str,
+        model: str | None = None,
+        thread_id: str | None = None,
+        agent_config: dict[str, Any] | None = None,
+        stream_tokens: bool = True,
+    ) -> RunStatus:
+        """
+        Queue a background run on the service asynchronously, without waiting for it.
+        
+        Args:
+            message (str): The message to send to the agent
+            model (str, optional): LLM model to use for the agent
+            thread_id (str, optional): Thread ID for continuing a conversation
+            agent_config (dict[str, Any], optional): Additional configuration to pass through to the agent
+            stream_tokens (bool, optional): Buffer tokens for GET /runs/{run_id}/events
+                Default: True
+        
+        Returns:
+            RunStatus: The queued run; poll it with aget_run() or await_run()
+        """
+        if not self.agent:
+            raise AgentClientError("No agent selected, Use update_agent() to select agent.")
+        request = self._run_request(message, model, thread_id, agent_config, stream_tokens)
+        try:
+            response = await self.aclient.post(
+                f"{self.base_url}/{self.agent}/runs",
+                json=request.model_dump(),
+                headers=self._headers,
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise AgentClientError(f"Error: {e}")
+        
+        return RunStatus.model_validate(response.json())
+    
+    def _run_wait_timeout(self, wait: float) -> float | None:
+        # The service holds a long-poll for up to `wait` seconds
+        return self.timeout + wait if self.timeout is not None else None
+    
+    def get_run(self, run_id: str, wait: float = 0.0) -> RunStatus:
+        """
+        Poll the status of a run.
+        
+        Args:
+            run_id (str): Run ID returned by submit_run() or the X-Run-ID of a stream
+            wait (float, optional): Let the service hold the request for up to this
+                many seconds (at most 60) until the run finishes. Default: 0.0
+        
+        Returns:
+            RunStatus: The run's state, with its final message once it succeeded
+        """
+        try:
+            response = self.client.get(
+                f"{self.base_url}/runs/{run_id}",
+                params={"wait": wait},
+                headers=self._headers,
+                timeout=self._run_wait_timeout(wait),
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise AgentClientError(f"Error: {e}")
+        
+        return RunStatus.model_validate(response.json())
+    
+    async def aget_run(self, run_id: str, wait: float = 0.0) -> RunStatus:
+        """
+        Poll the status of a run asynchronously.
+        
+        Args:
+            run_id (str): Run ID returned by submit_run() or the X-Run-ID of a stream
+            wait (float, optional): Let the service hold the request for up to this
+                many seconds (at most 60) until the run finishes. Default: 0.0
+        
+        Returns:
+            RunStatus: The run's state, with its final message once it succeeded
+        """
+        try:
+            response = await self.aclient.get(
+                f"{self.base_url}/runs/{run_id}",
+                params={"wait": wait},
+                headers=self._headers,
+                timeout=self._run_wait_timeout(wait),
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise AgentClientError(f"Error: {e}")
+        
+        return RunStatus.model_validate(response.json())
+    
+    def wait_run(self, run_id: str, timeout: float | None = None, poll_wait: float = 30.0) -> RunStatus:
+        """
+        Wait for a run to finish, long-polling the service.
+        
+        Args:
+            run_id (str): Run ID returned by submit_run()
+            timeout (float, optional): Give up after this many seconds. Default: wait forever
+            poll_wait (float, optional): Seconds each long-poll request is held. Default: 30.0
+        
+        Returns:
+            RunStatus: The finished run
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            remaining = deadline - time.monotonic() if deadline is not None else poll_wait
+            status = self.get_run(run_id, wait=max(0.0, min(poll_wait, remaining)))
+            if status.done:
+                return status
+            if deadline is not None and time.monotonic() >= deadline:
+                raise AgentClientError(f"Timed out waiting for run {run_id}")
+    
+    async def await_run(self, run_id: str, timeout: float | None = None, poll_wait: float = 30.0) -> RunStatus:
+        """
+        Wait asynchronously for a run to finish, long-polling the service.
+        
+        Args:
+            run_id (str): Run ID returned by asubmit_run()
+            timeout (float, optional): Give up after this many seconds. Default: wait forever
+            poll_wait (float, optional): Seconds each long-poll request is held. Default: 30.0
+        
+        Returns:
+            RunStatus: The finished run
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            remaining = deadline - time.monotonic() if deadline is not None else poll_wait
+            status = await self.aget_run(run_id, wait=max(0.0, min(poll_wait, remaining)))
+            if status.done:
+                return status
+            if deadline is not None and time.monotonic() >= deadline:
+                raise AgentClientError(f"Timed out waiting for run {run_id}")
+    
+    def cancel_run(self, run_id: str) -> RunStatus:
+        """
+        Cancel a queued or running run.
+        
+        Args:
+            run_id (str): Run ID returned by submit_run() or the X-Run-ID of a stream
+        
+        Returns:
+            RunStatus: The run, normally with status "cancelled"
+        """
+        try:
+            response = self.client.post(
+                f"{self.base_url}/runs/{run_id}/cancel",
+                headers=self._headers,
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise AgentClientError(f"Error: {e}")
+        
+        return RunStatus.model_validate(response.json())
+    
+    async def acancel_run(self, run_id: str) -> RunStatus:
+        """
+        Cancel a queued or running run asynchronously.
+        
+        Args:
+            run_id (str): Run ID returned by asubmit_run() or the X-Run-ID of a stream
+        
+        Returns:
+            RunStatus: The run, normally with status "cancelled"
+        """
+        try:
+            response = await self.aclient.post(
+                f"{self.base_url}/runs/{run_id}/cancel",
+                headers=self._headers,
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise AgentClientError(f"Error: {e}")
+        
+        return RunStatus.model_validate(response.json())
+    
+    def get_graph(self, format: str = "png") -> bytes:
+        """
+        Get the selected agent's graph.
+        
+        Args:
+            format (str, optional): One of "mermaid", "png" or "svg". Default: "png"
+        
+        Returns:
+            bytes: The rendered graph (UTF-8 text for "mermaid")
+        """
+        if not self.agent:
+            raise AgentClientError("No agent selected, Use update_agent() to select agent.")
+        try:
+            response = self.client.get(
+                f"{self.base_url}/{self.agent}/graph",
+                params={"format": format},
+                headers=self._headers,
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise AgentClientError(f"Error: {e}")
+        
+        return response.content
+    
+    @property
+    def _history_url(self) -> str:
+        if self.agent:
+            return f"{self.base_url}/{self.agent}/history"
+        return f"{self.base_url}/history"
+    
+    def _history_request(
+        self,
+        thread_id: str,
+        limit: int | None,
+        before: int | None,
+        after: int | None,
+        tool_content: str,
+    ) -> ChatHistoryInput:
+        return ChatHistoryInput(
+            thread_id=thread_id,
+            limit=limit,
+            before=before,
+            after=after,
+            tool_content=tool_content,
+        )
+    
     def get_history(
         self,
         thread_id: str,
+        limit: int | None = None,
+        before: int | None = None,
+        after: int | None = None,
+        tool_content: str = "full",
     ) -> ChatHistory:
         """
         Get chat history.
         
         Args:
             thread_id (str): Thread ID for identifying a conversation
+            limit (int, optional): Maximum number of messages to return. Default: all
+            before (int, optional): Return the latest messages before this message index
+            after (int, optional): Return the earliest messages after this message index
+            tool_content (str, optional): "full", "truncate" or "none" for tool message bodies.
+                Default: "full"
         """
-        request = ChatHistoryInput(thread_id=thread_id)
+        request = self._history_request(thread_id, limit, before, after, tool_content)
         try:
-            response = httpx.post(
-                f"{self.base_url}/history",
+            response = self.client.post(
+                self._history_url,
                 json=request.model_dump(),
                 headers=self._headers,
                 timeout=self.timeout,
@@ -307,4 +905,84 @@ class AgentClient:
             raise AgentClientError(f"Error: {e}")
         
         return ChatHistory.model_validate(response.json())
-                
\ No newline at end of file
+    
+    async def aget_history(
+        self,
+        thread_id: str,
+        limit: int | None = None,
+        before: int | None = None,
+        after: int | None = None,
+        tool_content: str = "full",
+    ) -> ChatHistory:
+        """
+        Get chat history asynchronously.
+        
+        Args:
+            thread_id (str): Thread ID for identifying a conversation
+            limit (int, optional): Maximum number of messages to return. Default: all
+            before (int, optional): Return the latest messages before this message index
+            after (int, optional): Return the earliest messages after this message index
+            tool_content (str, optional): "full", "truncate" or "none" for tool message bodies.
+                Default: "full"
+        """
+        request = self._history_request(thread_id, limit, before, after, tool_content)
+        try:
+            response = await self.aclient.post(
+                self._history_url,
+                json=request.model_dump(),
+                headers=self._headers,
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise AgentClientError(f"Error: {e}")
+        
+        return ChatHistory.model_validate(response.json())
+    
+    def iter_history(
+        self,
+        thread_id: str,
+        page_size: int = 50,
+        tool_content: str = "full",
+    ) -> Generator[ChatHistory, None, None]:
+        """
+        Iterate over a thread's history one page at a time, most recent page first.
+        
+        Args:
+            thread_id (str): Thread ID for identifying a conversation
+            page_size (int, optional): Messages per page. Default: 50
+            tool_content (str, optional): "full", "truncate" or "none" for tool message bodies.
+                Default: "full"
+        """
+        before = None
+        while True:
+            page = self.get_history(thread_id, limit=page_size, before=before, tool_content=tool_content)
+            yield page
+            if not page.has_more_before:
+                break
+            before = page.start
+    
+    async def aiter_history(
+        self,
+        thread_id: str,
+        page_size: int = 50,
+        tool_content: str = "full",
+    ) -> AsyncGenerator[ChatHistory, None]:
+        """
+        Iterate over a thread's history asynchronously one page at a time, most recent page first.
+        
+        Args:
+            thread_id (str): Thread ID for identifying a conversation
+            page_size (int, optional): Messages per page. Default: 50
+            tool_content (str, optional): "full", "truncate" or "none" for tool message bodies.
+                Default: "full"
+        """
+        before = None
+        while True:
+            page = await self.aget_history(
+                thread_id, limit=page_size, before=before, tool_content=tool_content
+            )
+            yield page
+            if not page.has_more_before:
+                break
+            before = page.start
@@ -0,0 +1,234 @@
+import asyncio
+from collections import OrderedDict
+import copy
+from dataclasses import asdict, dataclass
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any
+
+from core.sqlite import ForkSafeConnection
+
+
+def hash_key(*parts: Any) -> str:
+    """Stable sha256 key for a tuple of JSON serializable parts."""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+
+class TTLCache:
+    """Thread-safe in-memory LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float | None = None) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl else float("inf")
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SqliteCache:
+    """
+    On-disk cache tier backed by a single SQLite table.
+
+    Values are stored as JSON text. Expired entries are skipped on read and the
+    least recently used entries are evicted once max_entries is exceeded.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        table: str = "cache",
+        max_entries: int = 100_000,
+        ttl: float | None = None,
+    ) -> None:
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = ForkSafeConnection(self._connect)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_accessed_at ON {self.table}(accessed_at)")
+        return conn
+
+    def get(self, key: str) -> Any | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at < now:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+            (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN "
+                    f"(SELECT key FROM {self.table} ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+                self.evictions += count - self.max_entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class TieredCache:
+    """
+    In-memory LRU tier in front of an optional on-disk SQLite tier.
+
+    Values must be JSON serializable when a disk tier is configured. The memory
+    tier keeps its own copy of each value and hands out copies, so callers may
+    modify what they get back. The async methods run disk access in a worker
+    thread to keep the event loop free.
+    """
+
+    def __init__(self, memory: TTLCache, disk: SqliteCache | None = None) -> None:
+        self.memory = memory
+        self.disk = disk
+        self._stats = CacheStats()
+
+    def _lookup_memory(self, key: str) -> Any | None:
+        value = self.memory.get(key)
+        if value is None:
+            return None
+        self._stats.memory_hits += 1
+        return copy.deepcopy(value)
+
+    def _record_disk(self, key: str, value: Any | None) -> Any | None:
+        if value is None:
+            self._stats.misses += 1
+            return None
+        self._stats.disk_hits += 1
+        self.memory.set(key, value)
+        return copy.deepcopy(value)
+
+    def get(self, key: str) -> Any | None:
+        value = self._lookup_memory(key)
+        if value is not None:
+            return value
+        return self._record_disk(key, self.disk.get(key) if self.disk else None)
+
+    async def aget(self, key: str) -> Any | None:
+        value = self._lookup_memory(key)
+        if value is not None:
+            return value
+        disk_value = await asyncio.to_thread(self.disk.get, key) if self.disk else None
+        return self._record_disk(key, disk_value)
+
+    def set(self, key: str, value: Any) -> None:
+        self.memory.set(key, copy.deepcopy(value))
+        if self.disk:
+            self.disk.set(key, value)
+
+    async def aset(self, key: str, value: Any) -> None:
+        self.memory.set(key, copy.deepcopy(value))
+        if self.disk:
+            await asyncio.to_thread(self.disk.set, key, value)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk:
+            self.disk.clear()
+
+    def stats(self) -> dict[str, int]:
+        """Hit/miss/eviction counters and current in-memory size."""
+        stats = asdict(self._stats)
+        stats["hits"] = self._stats.hits
+        stats["evictions"] = self.memory.evictions + (self.disk.evictions if self.disk else 0)
+        stats["memory_entries"] = len(self.memory)
+        return stats
+
+
+# Caches built by build_cache, by table name, for metrics
+_caches: dict[str, TieredCache] = {}
+
+
+def cache_stats() -> dict[str, dict[str, int]]:
+    """stats() of every cache built by build_cache, by table name."""
+    return {name: cache.stats() for name, cache in list(_caches.items())}
+
+
+def build_cache(
+    max_entries: int,
+    ttl: float | None,
+    db_path: str | None = None,
+    table: str = "cache",
+    db_max_entries: int | None = None,
+) -> TieredCache:
+    """Build a TieredCache, adding the SQLite tier only when db_path is set."""
+    disk = None
+    if db_path:
+        disk = SqliteCache(db_path, table=table, max_entries=db_max_entries or max_entries * 10, ttl=ttl)
+    cache = TieredCache(TTLCache(max_entries=max_entries, ttl=ttl), disk)
+    _caches[table] = cache
+    return cache
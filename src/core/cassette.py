@@ -0,0 +1,223 @@
+"""
+Record/replay cassettes for chat model and search calls.
+
+In record mode every completed model stream and search response is appended to
+a JSONL cassette together with its request fingerprint and original timing. In
+replay mode the same requests are served from the cassette without network
+access, either at the recorded pacing or as fast as possible, which leaves only
+the service's own overhead to measure.
+"""
+import asyncio
+from collections.abc import AsyncIterator, Iterator, Sequence
+import json
+import os
+import threading
+import time
+from typing import Any, Literal, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.base import LangSmithParams
+from langchain_core.language_models.chat_models import (
+    BaseChatModel,
+    agenerate_from_stream,
+    generate_from_stream,
+)
+from langchain_core.messages import BaseMessage, SystemMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+from pydantic import ConfigDict, Field
+
+from core.cache import hash_key
+
+CassetteMode = Literal["off", "record", "replay"]
+CassettePacing = Literal["original", "fast"]
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode for a request that is not on the cassette."""
+
+
+class Cassette:
+    """
+    A JSONL file of recorded responses keyed by request fingerprint.
+
+    A fingerprint recorded several times is replayed in recording order and
+    starts over once exhausted, so a workload that repeats requests replays the
+    same way every time.
+    """
+
+    def __init__(self, path: str, mode: CassetteMode, pacing: CassettePacing = "original") -> None:
+        self.path = path
+        self.mode = mode
+        self.pacing = pacing
+        self._entries: dict[str, list[dict[str, Any]]] = {}
+        self._cursors: dict[str, int] = {}
+        self._lock = threading.Lock()
+        if mode == "replay":
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries.setdefault(entry["key"], []).append(entry)
+        elif mode == "record" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    @property
+    def paced(self) -> bool:
+        return self.pacing == "original"
+
+    def record(self, kind: str, key: str, **payload: Any) -> None:
+        line = json.dumps({"kind": kind, "key": key, "recorded_at": time.time(), **payload})
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    async def arecord(self, kind: str, key: str, **payload: Any) -> None:
+        """record() from a worker thread, keeping the file write off the event loop."""
+        await asyncio.to_thread(self.record, kind, key, **payload)
+
+    def play(self, kind: str, key: str) -> dict[str, Any]:
+        """Next recorded entry for key."""
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMiss(f"No recorded {kind} response on {self.path} for key {key}")
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            return entries[cursor % len(entries)]
+
+
+def _message_fingerprint(message: BaseMessage) -> dict[str, Any]:
+    # System prompts carry today's date, so only their type is part of the key
+    if isinstance(message, SystemMessage):
+        return {"type": message.type}
+    fields = {"type": message.type, "content": message.content}
+    if tool_calls := getattr(message, "tool_calls", None):
+        fields["tool_calls"] = [{"name": c["name"], "args": c["args"]} for c in tool_calls]
+    if name := getattr(message, "name", None):
+        fields["name"] = name
+    return fields
+
+
+def chat_key(model_name: str, messages: Sequence[BaseMessage], kwargs: dict[str, Any]) -> str:
+    """Fingerprint of a chat model request: model, call kwargs (e.g. tools) and messages."""
+    return hash_key("chat", model_name, kwargs, [_message_fingerprint(m) for m in messages])
+
+
+class CassetteChatModel(BaseChatModel):
+    """
+    Chat model that records the streamed responses of `model` to a cassette, or
+    replays them from it. Both modes go through the streaming API so replayed
+    calls emit the same token callbacks as live ones.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    model: BaseChatModel
+    model_name: str
+    cassette: Cassette = Field(exclude=True)
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cassette-{self.model._llm_type}"
+
+    def _get_ls_params(self, stop: Optional[list[str]] = None, **kwargs: Any) -> LangSmithParams:
+        return self.model._get_ls_params(stop=stop, **kwargs)
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> Runnable:
+        # Let the wrapped model format the tools, then pass them back to it on each call
+        bound = self.model.bind_tools(tools, **kwargs)
+        return self.bind(**getattr(bound, "kwargs", {}))
+
+    def _entry(self, chunks: list[tuple[float, ChatGenerationChunk]]) -> dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "chunks": [
+                {"delay": round(delay, 4), "message": message_to_dict(c.message.model_copy(update={"id": None}))}
+                for delay, c in chunks
+            ],
+        }
+
+    def _replay(self, key: str) -> Iterator[tuple[float, ChatGenerationChunk]]:
+        entry = self.cassette.play("chat", key)
+        for chunk in entry["chunks"]:
+            message = messages_from_dict([chunk["message"]])[0]
+            delay = chunk["delay"] if self.cassette.paced else 0.0
+            yield delay, ChatGenerationChunk(message=message)
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return generate_from_stream(self._stream(messages, stop, run_manager, **kwargs))
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return await agenerate_from_stream(self._astream(messages, stop, run_manager, **kwargs))
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        key = chat_key(self.model_name, messages, kwargs)
+        if self.cassette.mode == "replay":
+            for delay, chunk in self._replay(key):
+                if delay:
+                    time.sleep(delay)
+                yield chunk
+            return
+        chunks = []
+        last = time.perf_counter()
+        for chunk in self.model._stream(messages, stop=stop, **kwargs):
+            now = time.perf_counter()
+            chunks.append((now - last, chunk))
+            last = now
+            yield chunk
+        # Only complete responses are recorded, not failed or cancelled (e.g. hedged) calls
+        self.cassette.record("chat", key, **self._entry(chunks))
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        key = chat_key(self.model_name, messages, kwargs)
+        if self.cassette.mode == "replay":
+            for delay, chunk in self._replay(key):
+                if delay:
+                    await asyncio.sleep(delay)
+                yield chunk
+            return
+        chunks = []
+        last = time.perf_counter()
+        async for chunk in self.model._astream(messages, stop=stop, **kwargs):
+            now = time.perf_counter()
+            chunks.append((now - last, chunk))
+            last = now
+            yield chunk
+        await self.cassette.arecord("chat", key, **self._entry(chunks))
+
+
+_cassettes: dict[tuple[str, str, str], Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(path: str, mode: CassetteMode, pacing: CassettePacing = "original") -> Cassette:
+    """Cassette shared by every model and tool using the same file and mode."""
+    with _cassettes_lock:
+        cassette = _cassettes.get((path, mode, pacing))
+        if cassette is None:
+            cassette = _cassettes[(path, mode, pacing)] = Cassette(path, mode, pacing)
+        return cassette
@@ -0,0 +1,211 @@
+import asyncio
+from collections.abc import AsyncIterator, Sequence
+from contextlib import AsyncExitStack, asynccontextmanager
+import logging
+import time
+from typing import IO
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+import aiosqlite
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.base.id import UUID
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from core.settings import settings
+from core.sharded_checkpoint import ShardedSqliteSaver, shard_path
+
+logger = logging.getLogger(__name__)
+
+
+async def configure_connection(conn: aiosqlite.Connection) -> None:
+    """Apply the checkpoint storage PRAGMAs from settings to a connection."""
+    await conn.execute(f"PRAGMA journal_mode={settings.CHECKPOINT_JOURNAL_MODE}")
+    await conn.execute(f"PRAGMA synchronous={settings.CHECKPOINT_SYNCHRONOUS}")
+    await conn.execute(f"PRAGMA busy_timeout={int(settings.CHECKPOINT_BUSY_TIMEOUT_MS)}")
+    # A negative cache_size is in KiB rather than pages
+    await conn.execute(f"PRAGMA cache_size={-int(settings.CHECKPOINT_CACHE_SIZE_KB)}")
+    await conn.commit()
+
+
+async def open_saver(conn: aiosqlite.Connection) -> AsyncSqliteSaver:
+    """Create the saver tables on conn and tune the connection."""
+    saver = AsyncSqliteSaver(conn)
+    # setup() forces WAL, so the configured PRAGMAs are applied after it
+    await saver.setup()
+    await configure_connection(conn)
+    return saver
+
+
+def _checkpoint_id_at(timestamp: float) -> str:
+    """
+    Smallest checkpoint id that could have been created at timestamp.
+
+    Checkpoint ids are UUIDv6, whose leading bits are the creation time, so ids
+    compare in creation order as strings.
+    """
+    ts = int(timestamp * 10_000_000) + 0x01B21DD213814000
+    uuid_int = ((ts >> 12) & 0xFFFFFFFFFFFF) << 80 | (ts & 0x0FFF) << 64
+    return str(UUID(int=uuid_int, version=6))
+
+
+async def prune_checkpoints(
+    saver: AsyncSqliteSaver,
+    keep_last: int | None = None,
+    thread_ttl: float | None = None,
+) -> int:
+    """
+    Apply the checkpoint retention policy and return the number of checkpoints deleted.
+
+    Args:
+        saver: The saver to prune.
+        keep_last: Keep only the latest N checkpoints of each thread and namespace.
+        thread_ttl: Delete threads whose latest checkpoint is older than this many seconds.
+    """
+    deleted = 0
+    async with saver.lock:
+        if thread_ttl is not None:
+            cursor = await saver.conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id IN ("
+                "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(checkpoint_id) < ?)",
+                (_checkpoint_id_at(time.time() - thread_ttl),),
+            )
+            deleted += cursor.rowcount
+        if keep_last is not None:
+            cursor = await saver.conn.execute(
+                "DELETE FROM checkpoints WHERE rowid IN ("
+                "SELECT rowid FROM ("
+                "SELECT rowid, ROW_NUMBER() OVER ("
+                "PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS rn "
+                "FROM checkpoints) WHERE rn > ?)",
+                (keep_last,),
+            )
+            deleted += cursor.rowcount
+        if deleted:
+            await saver.conn.execute(
+                "DELETE FROM writes WHERE NOT EXISTS ("
+                "SELECT 1 FROM checkpoints c WHERE c.thread_id = writes.thread_id "
+                "AND c.checkpoint_ns = writes.checkpoint_ns AND c.checkpoint_id = writes.checkpoint_id)"
+            )
+        await saver.conn.commit()
+    return deleted
+
+
+async def compact(saver: AsyncSqliteSaver, vacuum: bool = False) -> None:
+    """
+    Fold the WAL back into the database file and optionally VACUUM it to release free pages.
+
+    VACUUM rewrites the whole database and holds SQLite's write lock until it is
+    done, so checkpoint writes stall for its duration; another connection would
+    not avoid that, even in WAL mode. Without it, pruned pages are reused by new
+    checkpoints but the file does not shrink.
+    """
+    async with saver.lock:
+        if vacuum:
+            await saver.conn.execute("VACUUM")
+        await saver.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+async def run_maintenance(saver: AsyncSqliteSaver) -> None:
+    """Prune and compact the checkpoint store according to settings."""
+    start = time.perf_counter()
+    deleted = await prune_checkpoints(
+        saver,
+        keep_last=settings.CHECKPOINT_KEEP_LAST,
+        thread_ttl=settings.CHECKPOINT_THREAD_TTL,
+    )
+    await compact(saver, vacuum=settings.CHECKPOINT_VACUUM and deleted > 0)
+    logger.info(
+        f"Checkpoint maintenance deleted {deleted} checkpoints in {time.perf_counter() - start:.2f}s"
+    )
+
+
+def _try_lock(path: str) -> IO | None:
+    """Take an exclusive lock on path without waiting; the open lock file, or None if it is held."""
+    f = open(path, "a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return None
+    return f
+
+
+async def _maintenance_loop(
+    savers: Sequence[AsyncSqliteSaver], interval: float, lock_path: str | None
+) -> None:
+    lock = None
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            # Of several worker processes sharing the store, only the lock holder maintains it
+            if lock_path and lock is None and (lock := _try_lock(lock_path)) is None:
+                continue
+            await _maintain(savers)
+    finally:
+        if lock is not None:
+            lock.close()
+
+
+async def _maintain(savers: Sequence[AsyncSqliteSaver]) -> None:
+    for saver in savers:
+        try:
+            await run_maintenance(saver)
+        except Exception as e:
+            logger.error(f"Checkpoint maintenance failed: {e}")
+
+
+@asynccontextmanager
+async def maintenance_task(
+    savers: Sequence[AsyncSqliteSaver], lock_path: str | None = None
+) -> AsyncIterator[None]:
+    """
+    Run checkpoint maintenance on savers in the background while the context is open.
+
+    With lock_path set, maintenance only runs in the process holding a lock on
+    that file, so worker processes sharing the store do not all prune and VACUUM it.
+    """
+    interval = settings.CHECKPOINT_MAINTENANCE_INTERVAL
+    if not interval:
+        yield
+        return
+    task = asyncio.create_task(_maintenance_loop(savers, interval, lock_path))
+    try:
+        yield
+    finally:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+@asynccontextmanager
+async def open_checkpointer() -> AsyncIterator[BaseCheckpointSaver]:
+    """
+    Open the tuned SQLite checkpointer configured by the CHECKPOINT_* settings.
+
+    With CHECKPOINT_SHARDS > 1 threads are spread over that many database files
+    by a ShardedSqliteSaver. Retention and compaction run in the background every
+    CHECKPOINT_MAINTENANCE_INTERVAL seconds for as long as the context is open.
+
+    Several processes can open the same store: SQLite's WAL mode and busy
+    timeout serialize their writes, and maintenance runs in one of them only.
+    """
+    shards = settings.CHECKPOINT_SHARDS
+    async with AsyncExitStack() as stack:
+        savers = []
+        for i in range(shards):
+            conn = await stack.enter_async_context(
+                aiosqlite.connect(
+                    shard_path(settings.CHECKPOINT_DB_PATH, i, shards),
+                    timeout=settings.CHECKPOINT_BUSY_TIMEOUT_MS / 1000,
+                )
+            )
+            savers.append(await open_saver(conn))
+        async with maintenance_task(savers, f"{settings.CHECKPOINT_DB_PATH}.lock"):
+            yield savers[0] if shards == 1 else ShardedSqliteSaver(savers)
@@ -0,0 +1,216 @@
+"""
+Hedged model calls with failover along a fallback chain.
+
+A call streams from the first model of its chain. If no token has arrived after
+hedge_after seconds, the next model in the chain (or a duplicate of the same
+model) is started as well; the first attempt to produce a token wins and the
+others are cancelled. An attempt that fails before its first token fails over
+to the next model in the chain.
+
+Every attempt's token callbacks are held back until it wins, so the tokens of an
+attempt that loses the race never reach streaming callbacks such as
+astream_events or LangGraph's "messages" stream mode.
+"""
+import asyncio
+from collections.abc import AsyncIterator, Callable, Sequence
+from dataclasses import dataclass, field
+import inspect
+import logging
+import time
+from typing import Any
+
+from langchain_core.callbacks import AsyncCallbackHandler, BaseCallbackHandler, BaseCallbackManager
+from langchain_core.messages import AIMessageChunk
+from langchain_core.runnables import Runnable, RunnableConfig
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HedgeStats:
+    calls: int = 0
+    # Calls that started at least one hedge, and the hedges started in total
+    hedged_calls: int = 0
+    hedges: int = 0
+    # Calls won by an attempt other than the first one
+    hedge_wins: int = 0
+    failovers: int = 0
+    wins: dict[str, int] = field(default_factory=dict)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "hedged_calls": self.hedged_calls,
+            "hedges": self.hedges,
+            "hedge_rate": round(self.hedged_calls / self.calls, 4) if self.calls else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "wins": dict(self.wins),
+        }
+
+
+hedge_stats = HedgeStats()
+
+
+class _TokenGate:
+    """Holds the on_llm_new_token callbacks of one attempt until release()."""
+
+    def __init__(self) -> None:
+        self.open = False
+        self._held: list[tuple[Callable[..., Any], tuple, dict[str, Any]]] = []
+
+    def _hold(self, method: Callable[..., Any]) -> Callable[..., Any]:
+        if inspect.iscoroutinefunction(method):
+            async def held(*args: Any, **kwargs: Any) -> Any:
+                if self.open:
+                    return await method(*args, **kwargs)
+                self._held.append((method, args, kwargs))
+        else:
+            def held(*args: Any, **kwargs: Any) -> Any:
+                if self.open:
+                    return method(*args, **kwargs)
+                self._held.append((method, args, kwargs))
+        return held
+
+    def _wrap(self, handler: BaseCallbackHandler) -> BaseCallbackHandler:
+        if type(handler).on_llm_new_token in (
+            BaseCallbackHandler.on_llm_new_token, AsyncCallbackHandler.on_llm_new_token
+        ):
+            return handler
+        # A shallow copy keeps the handler's type for isinstance checks and shares its
+        # state. Built by hand, as tracers define __copy__ to return themselves.
+        gated = object.__new__(type(handler))
+        gated.__dict__.update(handler.__dict__)
+        gated.on_llm_new_token = self._hold(handler.on_llm_new_token)
+        return gated
+
+    def config(self, config: RunnableConfig) -> RunnableConfig:
+        """config with its callback handlers gated."""
+        callbacks = config.get("callbacks")
+        if not callbacks:
+            return config
+        if not isinstance(callbacks, BaseCallbackManager):
+            return {**config, "callbacks": [self._wrap(h) for h in callbacks]}
+        # Handlers are matched by identity between the two lists, so wrap each only once
+        wrapped: dict[int, BaseCallbackHandler] = {}
+
+        def wrap(handler: BaseCallbackHandler) -> BaseCallbackHandler:
+            if id(handler) not in wrapped:
+                wrapped[id(handler)] = self._wrap(handler)
+            return wrapped[id(handler)]
+
+        manager = callbacks.copy()
+        manager.handlers = [wrap(h) for h in callbacks.handlers]
+        manager.inheritable_handlers = [wrap(h) for h in callbacks.inheritable_handlers]
+        return {**config, "callbacks": manager}
+
+    async def release(self) -> None:
+        """Deliver the held tokens in order and let later ones through."""
+        while self._held:
+            method, args, kwargs = self._held.pop(0)
+            result = method(*args, **kwargs)
+            if inspect.isawaitable(result):
+                await result
+        self.open = True
+
+
+async def ahedged_stream(
+    attempts: Sequence[tuple[str, Runnable[Any, AIMessageChunk]]],
+    input: Any,
+    config: RunnableConfig,
+    hedge_after: float | None = None,
+    on_winner: Callable[[str], None] | None = None,
+) -> AsyncIterator[AIMessageChunk]:
+    """
+    Stream the chunks of whichever attempt produces a token first.
+
+    Args:
+        attempts: (model name, runnable) pairs in fallback order. The same model
+            can appear more than once to hedge with a duplicate request.
+        input: Input passed to every attempt.
+        config: Config passed to every attempt.
+        hedge_after: Seconds without a first token before the next attempt is
+            started alongside the running ones. None only fails over on errors.
+        on_winner: Called with the model name of the attempt that wins.
+    """
+    queue: asyncio.Queue[tuple[int, str, Any]] = asyncio.Queue()
+    tasks: dict[int, asyncio.Task] = {}
+    gates: dict[int, _TokenGate] = {}
+    next_attempt = 0
+    started_at = 0.0
+    winner: int | None = None
+
+    async def run(index: int) -> None:
+        try:
+            async for chunk in attempts[index][1].astream(input, gates[index].config(config)):
+                await queue.put((index, "chunk", chunk))
+            await queue.put((index, "end", None))
+        except Exception as e:
+            await queue.put((index, "error", e))
+
+    def start() -> None:
+        nonlocal next_attempt, started_at
+        gates[next_attempt] = _TokenGate()
+        tasks[next_attempt] = asyncio.create_task(run(next_attempt))
+        next_attempt += 1
+        started_at = time.monotonic()
+
+    async def choose(index: int) -> None:
+        nonlocal winner
+        winner = index
+        losers = [task for other, task in tasks.items() if other != index]
+        for task in losers:
+            task.cancel()
+        # Let the losers unwind (and report their errors to callbacks) before going on
+        await asyncio.gather(*losers, return_exceptions=True)
+        for other in [other for other in tasks if other != index]:
+            del tasks[other]
+        await gates[index].release()
+        name = str(attempts[index][0])
+        if on_winner is not None:
+            on_winner(name)
+        hedge_stats.wins[name] = hedge_stats.wins.get(name, 0) + 1
+        if index > 0:
+            hedge_stats.hedge_wins += 1
+
+    hedge_stats.calls += 1
+    start()
+    try:
+        while True:
+            timeout = None
+            if winner is None and hedge_after is not None and next_attempt < len(attempts):
+                timeout = max(0.0, started_at + hedge_after - time.monotonic())
+            try:
+                index, kind, payload = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                if next_attempt == 1:
+                    hedge_stats.hedged_calls += 1
+                hedge_stats.hedges += 1
+                start()
+                continue
+            if winner is not None and index != winner:
+                # Output of an attempt that lost the race
+                continue
+            if kind == "chunk":
+                if winner is None:
+                    await choose(index)
+                yield payload
+            elif kind == "end":
+                if winner is None:
+                    await choose(index)
+                return
+            else:
+                tasks.pop(index)
+                logger.warning(f"Model {attempts[index][0]} failed: {payload}")
+                # Part of the answer was already streamed, so it cannot be retried elsewhere
+                if winner == index:
+                    raise payload
+                if not tasks:
+                    if next_attempt >= len(attempts):
+                        raise payload
+                    hedge_stats.failovers += 1
+                    start()
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
@@ -1,6 +1,7 @@
 from functools import cache
 import os
 from typing import TypeAlias
+from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_openai import ChatOpenAI
 from langchain_google_genai import ChatGoogleGenerativeAI
 
@@ -17,7 +18,8 @@ from schema.models import (
     DeepseekModelName,
     GoogleModelName,
     OpenAIModelName,
-    LLAMAModelName
+    LLAMAModelName,
+    Provider
 )
 
 _MODEL_TABLE = {
@@ -34,15 +36,48 @@ _MODEL_TABLE = {
 
 ModelT: TypeAlias = ChatOpenAI      # TODO: Add other chat models
 
+def _rate_limit_callbacks(provider: Provider, model_name: AllModelEnum) -> list:
+    # Imported here because core.settings imports this module
+    from core.rate_limit import rate_limit_callbacks, worker_count
+    from core.settings import settings
+    
+    # Only the workers actually forked split the limits, not settings.WORKERS (dev mode
+    # and `uvicorn service:app` serve from a single process)
+    return rate_limit_callbacks(
+        provider, model_name, settings.RATE_LIMITS, settings.RATE_LIMIT_BURST_SECONDS, worker_count()
+    )
+
+def _with_cassette(model: ModelT, model_name: AllModelEnum) -> BaseChatModel:
+    from core.cassette import CassetteChatModel, get_cassette
+    from core.settings import settings
+    
+    if settings.CASSETTE_MODE == "off":
+        return model
+    cassette = get_cassette(settings.CASSETTE_PATH, settings.CASSETTE_MODE, settings.CASSETTE_PACING)
+    # Recorded calls still pass the rate limiter, replayed ones never reach the provider
+    callbacks = model.callbacks if settings.CASSETTE_MODE == "record" else None
+    return CassetteChatModel(model=model, model_name=model_name, cassette=cassette, callbacks=callbacks)
+
 @cache
-def get_model(model_name: AllModelEnum) -> ModelT:
+def get_model(model_name: AllModelEnum) -> BaseChatModel:
+    return _with_cassette(_build_model(model_name), model_name)
+
+def _build_model(model_name: AllModelEnum) -> ModelT:
     api_model_name = _MODEL_TABLE.get(model_name)
     if not api_model_name:
         raise ValueError(f"Unsupported model: {model_name}")
     if model_name in OpenAIModelName:
-        return ChatOpenAI(model=api_model_name, temperature=0, seed=1, streaming=True)
+        return ChatOpenAI(
+            model=api_model_name, temperature=0, seed=1, streaming=True,
+            # Report token usage while streaming so the rate limiter sees actual usage
+            stream_usage=True,
+            callbacks=_rate_limit_callbacks(Provider.OPENAI, model_name)
+        )
     elif model_name in GoogleModelName:
-        return ChatGoogleGenerativeAI(model=api_model_name, temperature=0, streaming=True)
+        return ChatGoogleGenerativeAI(
+            model=api_model_name, temperature=0, streaming=True,
+            callbacks=_rate_limit_callbacks(Provider.GOOGLE, model_name)
+        )
     elif model_name in LLAMAModelName:
         raise NotImplementedError(f"Model {model_name} is not supported yet")
     else:
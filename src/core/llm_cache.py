@@ -0,0 +1,136 @@
+from collections.abc import AsyncIterator, Callable, Iterator, Sequence
+from functools import reduce
+import operator
+from typing import Any, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    message_chunk_to_message,
+    message_to_dict,
+    messages_from_dict,
+)
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from core.cache import TieredCache, build_cache, hash_key
+from core.settings import settings
+
+
+class ReplayChatModel(BaseChatModel):
+    """Chat model that replays a cached response, chunk by chunk when streamed."""
+
+    chunks: list[AIMessageChunk]
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _result(self) -> ChatResult:
+        if not self.chunks:
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=""))])
+        message = message_chunk_to_message(reduce(operator.add, self.chunks))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return self._result()
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return self._result()
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        for chunk in self.chunks:
+            yield ChatGenerationChunk(message=chunk.model_copy())
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        for chunk in self.chunks:
+            yield ChatGenerationChunk(message=chunk.model_copy())
+
+
+# Run-scoped fields that do not change what the model is asked
+_UNKEYED_MESSAGE_FIELDS = {"id", "response_metadata", "usage_metadata"}
+
+def response_cache_key(model_name: str, tools: Sequence[Any], messages: Sequence[BaseMessage]) -> str:
+    """Key a model call on the model name, the bound tool schemas and the full message list."""
+    return hash_key(
+        "llm",
+        model_name,
+        [convert_to_openai_tool(t) for t in tools],
+        [m.model_dump(exclude=_UNKEYED_MESSAGE_FIELDS) for m in messages],
+    )
+
+
+async def acached_invoke(
+    cache: TieredCache,
+    key: str,
+    runnable: Runnable[Any, BaseMessage],
+    input: Any,
+    config: RunnableConfig,
+    should_store: Callable[[], bool] | None = None,
+) -> AIMessage:
+    """
+    Invoke runnable through the response cache.
+
+    On a miss the response is streamed so its chunks can be stored; on a hit the
+    chunks are replayed through a ReplayChatModel so callers streaming tokens
+    (e.g. astream_events) see the same token events as a live call. A response
+    is only stored if should_store(), checked once it is complete, allows it.
+    """
+    cached = await cache.aget(key)
+    # An empty entry has nothing to replay and is treated as a miss
+    if cached:
+        replay = ReplayChatModel(chunks=messages_from_dict(cached))
+        return await replay.ainvoke([], config)
+
+    chunks: list[AIMessageChunk] = []
+    async for chunk in runnable.astream(input, config):
+        chunks.append(chunk)
+    if not chunks:
+        # Nothing to store or combine, so get the response without streaming
+        return await runnable.ainvoke(input, config)
+    response = message_chunk_to_message(reduce(operator.add, chunks))
+    if should_store is not None and not should_store():
+        return response
+    # Drop run-scoped ids, a replayed message must not overwrite the original in the thread
+    await cache.aset(key, [message_to_dict(c.model_copy(update={"id": None})) for c in chunks])
+    return response
+
+
+def build_response_cache() -> TieredCache | None:
+    """Build the LLM response cache, or None when it is disabled in settings."""
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    return build_cache(
+        max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+        ttl=settings.LLM_CACHE_TTL,
+        db_path=settings.LLM_CACHE_DB,
+        table="llm_cache",
+    )
@@ -0,0 +1,213 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Recording is a dict update, so hooks can sit on hot paths. Values that other
+components already track (admission queue, caches, rate limits) are read by
+collectors when the metrics are rendered.
+"""
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+import time
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+RATE_BUCKETS = (5, 10, 20, 40, 80, 160, 320)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[Any, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help, labels)
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *labels: Any, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in list(self.values.items()):
+            yield f"{self.name}{_format_labels(self.labels, labels)} {value}"
+
+
+class Gauge(Counter):
+    """A value set from outside, e.g. by a collector. kind="counter" for totals kept elsewhere."""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), kind: str = "gauge") -> None:
+        super().__init__(name, help, labels)
+        self.type = kind
+
+    def set(self, value: float, *labels: Any) -> None:
+        self.values[labels] = float(value)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (last is +Inf), sum]
+        self.values: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels: Any) -> None:
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self) -> Iterable[str]:
+        for labels, (counts, total) in list(self.values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric] = {}
+        self.collectors: list[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Register a function that updates gauges right before rendering."""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            collector()
+        return "\n".join(m.render() for m in self.metrics.values() if m.values) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter(
+    "agent_requests_total", "Agent requests by endpoint and outcome", ("agent", "endpoint", "status")
+))
+REQUEST_DURATION = registry.register(Histogram(
+    "agent_request_duration_seconds", "Agent request latency", ("agent", "endpoint")
+))
+SSE_FRAMES = registry.register(Counter(
+    "sse_frames_total", "Server-sent event frames sent", ("agent", "type")
+))
+NODE_DURATION = registry.register(Histogram(
+    "graph_node_duration_seconds", "Graph node execution time", ("node",)
+))
+MODEL_CALLS = registry.register(Counter(
+    "model_calls_total", "Chat model calls by outcome", ("model", "status")
+))
+MODEL_TTFT = registry.register(Histogram(
+    "model_time_to_first_token_seconds", "Chat model time to first streamed token", ("model",)
+))
+MODEL_TOKENS_PER_SECOND = registry.register(Histogram(
+    "model_tokens_per_second", "Chat model output tokens per second after the first token",
+    ("model",), buckets=RATE_BUCKETS
+))
+TOOL_CALLS = registry.register(Counter(
+    "tool_calls_total", "Tool calls by outcome", ("tool", "status")
+))
+TOOL_DURATION = registry.register(Histogram(
+    "tool_duration_seconds", "Tool call latency, excluding time queued for a slot", ("tool",)
+))
+RUNS_CANCELLED = registry.register(Counter(
+    "runs_cancelled_total", "Runs cancelled, by reason (request, disconnect, shutdown)", ("reason",)
+))
+RUNS_TOKENS_SAVED = registry.register(Counter(
+    "runs_cancelled_tokens_saved_total",
+    "Estimated model tokens not spent because runs were cancelled",
+    ("agent",)
+))
+
+
+class ModelMetricsCallback(BaseCallbackHandler):
+    """Records calls, time to first token and tokens/sec of a chat model."""
+
+    # Called inline from async runs, no executor hop per token
+    run_inline = True
+    ignore_chain = True
+    ignore_agent = True
+    ignore_retriever = True
+    ignore_custom_event = True
+
+    def __init__(self, model_name: str) -> None:
+        self.model_name = str(model_name)
+        # run_id -> [start, first token time, streamed chunks]
+        self._runs: dict[UUID, list] = {}
+
+    def on_chat_model_start(self, serialized: dict[str, Any], messages: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._runs[run_id] = [time.perf_counter(), None, 0]
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.get(run_id)
+        if run is not None:
+            if run[1] is None:
+                run[1] = time.perf_counter()
+            run[2] += 1
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        MODEL_CALLS.inc(self.model_name, "ok")
+        if run is None or run[1] is None:
+            return
+        start, first_token, chunks = run
+        MODEL_TTFT.observe(first_token - start, self.model_name)
+        tokens = chunks
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage and usage.get("output_tokens"):
+                    tokens = usage["output_tokens"]
+        elapsed = time.perf_counter() - first_token
+        if elapsed > 0 and tokens > 1:
+            MODEL_TOKENS_PER_SECOND.observe(tokens / elapsed, self.model_name)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._runs.pop(run_id, None)
+        # Hedged attempts that lose the race are cancelled
+        status = "cancelled" if error.__class__.__name__ == "CancelledError" else "error"
+        MODEL_CALLS.inc(self.model_name, status)
@@ -0,0 +1,204 @@
+"""
+Provider and model rate limits (requests and tokens per minute) for chat models.
+
+Limits are token buckets. A call reserves one request and its estimated prompt
+tokens from every bucket that applies to it before it starts, waiting (without
+blocking the event loop) until the reservation is covered. When the call ends
+the token reservation is corrected with the usage the provider reported.
+"""
+from collections.abc import Sequence
+import asyncio
+import json
+import threading
+import time
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at limit per minute, holding at most burst_seconds of refill.
+
+    Reservations are taken immediately and may drive the level negative; the caller
+    then waits until the refill has paid back the debt. This serves callers in
+    reservation order and works from any thread or event loop.
+    """
+
+    def __init__(self, name: str, limit: float, burst_seconds: float = 10.0) -> None:
+        self.name = name
+        self.rate = limit / 60
+        self.capacity = max(self.rate * burst_seconds, 1.0)
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take amount from the bucket and return the seconds to wait before using it."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level -= amount
+            return max(0.0, -self._level / self.rate)
+
+    def adjust(self, amount: float) -> None:
+        """Take (or with a negative amount, return) tokens without waiting."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level = min(self.capacity, self._level - amount)
+
+    def record_wait(self, seconds: float) -> None:
+        if seconds > 0:
+            self.waits += 1
+            self.wait_seconds += seconds
+
+
+_buckets: dict[tuple[str, str], TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+# Processes serving the app and sharing the limits, set in each forked worker
+_worker_count = 1
+
+
+def set_worker_count(workers: int) -> None:
+    """Record how many processes split the limits; call before any model is built."""
+    global _worker_count
+    _worker_count = workers
+
+
+def worker_count() -> int:
+    """Number of processes the limits are split between."""
+    return _worker_count
+
+
+def get_bucket(scope: str, kind: str, limit: float, burst_seconds: float) -> TokenBucket:
+    """Shared bucket for a provider or model scope and a kind ("rpm" or "tpm")."""
+    with _buckets_lock:
+        bucket = _buckets.get((scope, kind))
+        if bucket is None:
+            bucket = TokenBucket(f"{scope}:{kind}", limit, burst_seconds)
+            _buckets[(scope, kind)] = bucket
+        return bucket
+
+
+# Seconds each in-progress model run waited for capacity, for run traces
+_run_waits: dict[UUID, float] = {}
+
+
+def rate_limit_wait(run_id: UUID) -> float:
+    """Seconds the model run run_id waited for rate limit capacity."""
+    return _run_waits.get(run_id, 0.0)
+
+
+def rate_limit_stats() -> dict[str, dict[str, float]]:
+    """Waits and total wait time per bucket."""
+    return {
+        b.name: {"waits": b.waits, "wait_seconds": round(b.wait_seconds, 3)}
+        for b in list(_buckets.values())
+    }
+
+
+def estimate_prompt_tokens(messages: Sequence[BaseMessage]) -> int:
+    """Cheap prompt size estimate (~4 characters per token) used before a call."""
+    chars = 0
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+        chars += len(content) + 16
+        if tool_calls := getattr(message, "tool_calls", None):
+            chars += len(json.dumps(tool_calls, default=str))
+    return chars // 4 + 1
+
+
+def _usage_tokens(response: LLMResult) -> int | None:
+    """Total tokens reported by the provider, if any."""
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            if message is None:
+                continue
+            if usage := getattr(message, "usage_metadata", None):
+                return usage["total_tokens"]
+            metadata = message.response_metadata
+            if usage := metadata.get("token_usage") or metadata.get("usage_metadata"):
+                return usage.get("total_tokens") or usage.get("total_token_count")
+    if response.llm_output and (usage := response.llm_output.get("token_usage")):
+        return usage.get("total_tokens")
+    return None
+
+
+class RateLimitCallback(AsyncCallbackHandler):
+    """
+    Chat model callback that waits for rate limit capacity when a call starts and
+    settles the token buckets with the reported usage when it ends.
+    """
+
+    def __init__(self, request_buckets: list[TokenBucket], token_buckets: list[TokenBucket]) -> None:
+        self.request_buckets = request_buckets
+        self.token_buckets = token_buckets
+        self._estimates: dict[UUID, int] = {}
+
+    async def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list[list[BaseMessage]],
+        *,
+        run_id: UUID,
+        **kwargs: Any,
+    ) -> None:
+        estimate = sum(estimate_prompt_tokens(m) for m in messages)
+        self._estimates[run_id] = estimate
+        waits = [(b, b.reserve(1)) for b in self.request_buckets]
+        waits += [(b, b.reserve(estimate)) for b in self.token_buckets]
+        delay = max((w for _, w in waits), default=0.0)
+        if delay > 0:
+            for bucket, wait in waits:
+                bucket.record_wait(wait)
+            _run_waits[run_id] = delay
+            await asyncio.sleep(delay)
+
+    async def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        estimate = self._estimates.pop(run_id, 0)
+        _run_waits.pop(run_id, None)
+        actual = _usage_tokens(response)
+        if actual is not None:
+            for bucket in self.token_buckets:
+                bucket.adjust(actual - estimate)
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._estimates.pop(run_id, None)
+        _run_waits.pop(run_id, None)
+
+
+def rate_limit_callbacks(
+    provider: str,
+    model_name: str,
+    limits: dict[str, dict[str, int]],
+    burst_seconds: float = 10.0,
+    workers: int = 1,
+) -> list[RateLimitCallback]:
+    """
+    Callbacks enforcing the limits configured for a provider and model.
+
+    limits maps a provider ("openai") or model name ("gpt-4o-mini") to its
+    {"rpm": ..., "tpm": ...}; buckets are shared by every model in the scope.
+    With several worker processes each one enforces its 1/workers share.
+    """
+    request_buckets: list[TokenBucket] = []
+    token_buckets: list[TokenBucket] = []
+    for scope in (provider, model_name):
+        scope_limits = limits.get(scope) or {}
+        if rpm := scope_limits.get("rpm"):
+            request_buckets.append(get_bucket(scope, "rpm", rpm / workers, burst_seconds))
+        if tpm := scope_limits.get("tpm"):
+            token_buckets.append(get_bucket(scope, "tpm", tpm / workers, burst_seconds))
+    if not request_buckets and not token_buckets:
+        return []
+    return [RateLimitCallback(request_buckets, token_buckets)]
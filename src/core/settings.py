@@ -1,9 +1,9 @@
 
 
 
-from typing import Any
+from typing import Any, Literal
 from dotenv import find_dotenv
-from pydantic import SecretStr, computed_field
+from pydantic import Field, SecretStr, computed_field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from schema.models import OpenAIModelName, Provider, GoogleModelName
@@ -22,6 +22,12 @@ class Settings(BaseSettings):
     
     HOST: str = "0.0.0.0"
     PORT: int = 8000
+    # Worker processes forked by run_service.py after importing the service once. Runs are
+    # owned by one worker, which the others forward requests for them to; admission and
+    # run worker limits apply per worker, RATE_LIMITS are split evenly between forked workers.
+    WORKERS: int = Field(1, ge=1)
+    # On SIGTERM open requests, then background runs, get this many seconds each to finish
+    SHUTDOWN_TIMEOUT: float | None = 30.0
     
     AUTH_SECRET: SecretStr | None = None
     
@@ -33,6 +39,108 @@ class Settings(BaseSettings):
     DEFAULT_MODEL: AllModelEnum | None = None
     AVAILABLE_MODELS: set[AllModelEnum] = set()
     
+    # Upper bounds for /invoke/batch
+    BATCH_MAX_SIZE: int = 500
+    BATCH_MAX_CONCURRENCY: int = 8
+    
+    # Tavily search result cache. Set TAVILY_CACHE_DB to add an on-disk SQLite tier.
+    TAVILY_CACHE_ENABLED: bool = True
+    TAVILY_CACHE_TTL: float | None = 3600
+    TAVILY_CACHE_MAX_ENTRIES: int = 512
+    TAVILY_CACHE_DB: str | None = None
+    
+    # Exact-match LLM response cache (opt-in). Set LLM_CACHE_DB to add an on-disk SQLite tier.
+    LLM_CACHE_ENABLED: bool = False
+    LLM_CACHE_TTL: float | None = 86400
+    LLM_CACHE_MAX_ENTRIES: int = 256
+    LLM_CACHE_DB: str | None = None
+    
+    # Allow /{agent_id}/graph to fall back to the Mermaid web service for PNG
+    # when Graphviz is not installed. Off by default so rendering stays offline.
+    GRAPH_RENDER_REMOTE: bool = False
+    
+    # SQLite checkpoint storage
+    CHECKPOINT_DB_PATH: str = "checkpoints.db"
+    # Spread threads over N database files (<root>.<i><ext>) to parallelize writes
+    CHECKPOINT_SHARDS: int = Field(default=1, ge=1)
+    CHECKPOINT_JOURNAL_MODE: Literal["WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY"] = "WAL"
+    CHECKPOINT_SYNCHRONOUS: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL"
+    CHECKPOINT_BUSY_TIMEOUT_MS: int = 5000
+    CHECKPOINT_CACHE_SIZE_KB: int = 65536
+    # Retention: keep the latest N checkpoints per thread and drop threads idle
+    # for longer than CHECKPOINT_THREAD_TTL seconds. None keeps everything.
+    CHECKPOINT_KEEP_LAST: int | None = Field(default=None, ge=1)
+    CHECKPOINT_THREAD_TTL: float | None = None
+    # Seconds between background retention/compaction runs. None disables them.
+    CHECKPOINT_MAINTENANCE_INTERVAL: float | None = 3600
+    # VACUUM after pruning to return free pages to the OS. It rewrites the whole file while
+    # holding the write lock, so every checkpoint write (and every run) stalls until it ends.
+    CHECKPOINT_VACUUM: bool = False
+    
+    # /stream backend: "events" uses astream_events (callback events from every
+    # runnable), "updates" uses astream(stream_mode=["messages", "updates"]).
+    STREAM_BACKEND: Literal["events", "updates"] = "events"
+    
+    # Token budget for model input; per-model overrides of agents.context.DEFAULT_TOKEN_BUDGETS
+    CONTEXT_BUDGET_ENABLED: bool = True
+    CONTEXT_TOKEN_BUDGETS: dict[str, int] = {}
+    
+    # Tool calls of one model step run concurrently; per-tool overrides are keyed by tool name
+    TOOL_TIMEOUT: float | None = 30.0
+    TOOL_MAX_CONCURRENCY: int | None = 4
+    TOOL_TIMEOUTS: dict[str, float] = {}
+    TOOL_CONCURRENCY: dict[str, int] = {}
+    
+    # Admission control for /invoke and /stream runs; weights are keyed by client key
+    # ("token:<sha256 prefix of the Authorization header>" or "ip:<address>")
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_IN_FLIGHT: int = Field(32, ge=1)
+    ADMISSION_MAX_QUEUE: int = Field(128, ge=0)
+    ADMISSION_MAX_QUEUE_PER_CLIENT: int | None = Field(32, ge=1)
+    ADMISSION_QUEUE_TIMEOUT: float | None = 30.0
+    ADMISSION_CLIENT_WEIGHTS: dict[str, float] = {}
+    # Addresses of reverse proxies whose X-Forwarded-For is trusted for the "ip:" key;
+    # the header is ignored from anyone else, as any caller can set it
+    ADMISSION_TRUSTED_PROXIES: list[str] = []
+    
+    # Requests/tokens per minute by provider ("openai", "google") or model name, e.g.
+    # RATE_LIMITS='{"openai": {"rpm": 500, "tpm": 200000}, "gpt-4o": {"tpm": 30000}}'.
+    # Calls over the limit wait for capacity; bursts are capped at RATE_LIMIT_BURST_SECONDS of quota.
+    RATE_LIMITS: dict[str, dict[str, int]] = {}
+    RATE_LIMIT_BURST_SECONDS: float = 10.0
+    
+    # Fallback chains, e.g. MODEL_FALLBACKS='{"gpt-4o-mini": ["gemini-2.0-flash"]}'. A call that
+    # fails before its first token moves on to the next available model. With HEDGE_AFTER set,
+    # a call without a first token after that many seconds is hedged with the next model in
+    # the chain (or a duplicate request when there is no chain) and the first to answer wins.
+    MODEL_FALLBACKS: dict[AllModelEnum, list[AllModelEnum]] = {}
+    HEDGE_AFTER: float | None = None
+    
+    # Record/replay of chat model and Tavily calls. "record" appends every response with its
+    # timing to CASSETTE_PATH; "replay" serves requests from it without network access, at the
+    # recorded pacing or, with CASSETTE_PACING="fast", as fast as possible.
+    CASSETTE_MODE: Literal["off", "record", "replay"] = "off"
+    CASSETTE_PATH: str = "cassettes/research.jsonl"
+    CASSETTE_PACING: Literal["original", "fast"] = "original"
+    
+    # Resumable streams: the last RUN_BUFFER_SIZE frames of each run are kept for
+    # GET /runs/{run_id}/stream, older frames spill to RUN_BUFFER_DB when it is set.
+    # Finished runs stay resumable for RUN_RETENTION seconds.
+    RUN_BUFFER_SIZE: int = Field(2048, ge=2)
+    RUN_BUFFER_DB: str | None = None
+    RUN_RETENTION: float = 300.0
+    
+    # Background runs (POST /runs) are executed by RUN_WORKERS worker tasks per process, in
+    # fair order across client keys weighted by ADMISSION_CLIENT_WEIGHTS. Submissions beyond
+    # RUN_MAX_QUEUED waiting runs are rejected with 503, beyond a client's
+    # RUN_MAX_QUEUED_PER_CLIENT with 429.
+    RUN_WORKERS: int = Field(8, ge=1)
+    RUN_MAX_QUEUED: int = Field(1000, ge=1)
+    RUN_MAX_QUEUED_PER_CLIENT: int | None = Field(250, ge=1)
+    # A streamed run with no connected reader for this many seconds is cancelled,
+    # which leaves that long to resume it. None lets abandoned runs finish.
+    RUN_DETACH_GRACE: float | None = 15.0
+    
     def model_post_init(self, __context: Any) -> None:
         # Default Model will be chosen based on the order of the providers. 
         api_keys = {
@@ -0,0 +1,205 @@
+"""
+Checkpointer that partitions threads across several SQLite files.
+
+Reshard existing data (e.g. a single checkpoints.db into 4 shards) with:
+
+    cd src && python -m core.sharded_checkpoint checkpoints.db --shards 4 --out checkpoints.db
+"""
+import argparse
+from collections.abc import AsyncIterator, Iterator, Sequence
+from contextlib import closing
+import os
+import sqlite3
+from typing import Any, Optional
+import zlib
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+
+def shard_index(thread_id: str, shards: int) -> int:
+    """Stable shard for a thread; must not change across processes or restarts."""
+    return zlib.crc32(thread_id.encode("utf-8")) % shards
+
+
+def shard_path(path: str, index: int, shards: int) -> str:
+    """Database file of shard index, e.g. checkpoints.db -> checkpoints.2.db."""
+    if shards == 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{index}{ext}"
+
+
+class ShardedSqliteSaver(BaseCheckpointSaver[str]):
+    """
+    Routes each thread to one of several AsyncSqliteSaver shards by hashing its
+    thread_id, so writes from different threads do not queue behind one SQLite
+    writer lock. Listing without a thread_id merges all shards.
+    """
+
+    def __init__(self, shards: Sequence[AsyncSqliteSaver]) -> None:
+        if not shards:
+            raise ValueError("ShardedSqliteSaver needs at least one shard")
+        super().__init__(serde=shards[0].serde)
+        self.shards = list(shards)
+
+    @property
+    def config_specs(self) -> list:
+        return self.shards[0].config_specs
+
+    def _shard(self, config: RunnableConfig) -> AsyncSqliteSaver:
+        thread_id = str(config["configurable"]["thread_id"])
+        return self.shards[shard_index(thread_id, len(self.shards))]
+
+    @staticmethod
+    def _merge(tuples: list[CheckpointTuple], limit: Optional[int]) -> list[CheckpointTuple]:
+        # Checkpoint ids sort by creation time, newest first like a single saver
+        tuples.sort(key=lambda t: t.config["configurable"]["checkpoint_id"], reverse=True)
+        return tuples[:limit] if limit is not None else tuples
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self._shard(config).get_tuple(config)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        if config and "thread_id" in config.get("configurable", {}):
+            yield from self._shard(config).list(config, filter=filter, before=before, limit=limit)
+            return
+        tuples = [
+            t
+            for shard in self.shards
+            for t in shard.list(config, filter=filter, before=before, limit=limit)
+        ]
+        yield from self._merge(tuples, limit)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self._shard(config).put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        # AsyncSqliteSaver does not take task_path
+        return self._shard(config).put_writes(config, writes, task_id)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await self._shard(config).aget_tuple(config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        if config and "thread_id" in config.get("configurable", {}):
+            async for t in self._shard(config).alist(config, filter=filter, before=before, limit=limit):
+                yield t
+            return
+        tuples = []
+        for shard in self.shards:
+            async for t in shard.alist(config, filter=filter, before=before, limit=limit):
+                tuples.append(t)
+        for t in self._merge(tuples, limit):
+            yield t
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await self._shard(config).aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return await self._shard(config).aput_writes(config, writes, task_id)
+
+    def get_next_version(self, current: Optional[str], channel: Any) -> str:
+        return self.shards[0].get_next_version(current, channel)
+
+
+def reshard(sources: Sequence[str], out_path: str, shards: int) -> dict[str, int]:
+    """
+    Copy every checkpoint and write in sources into shards new database files.
+
+    Sources can be a single database or all shards of a previous layout. Output
+    files must not exist yet. Returns the number of checkpoints per output file.
+    """
+    outputs = [shard_path(out_path, i, shards) for i in range(shards)]
+    if existing := [p for p in outputs if os.path.exists(p)]:
+        raise FileExistsError(f"Output databases already exist: {', '.join(existing)}")
+
+    with closing(sqlite3.connect(sources[0])) as conn:
+        schema = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name IN ('checkpoints', 'writes')"
+        ).fetchall()
+    targets = [sqlite3.connect(p) for p in outputs]
+    for target in targets:
+        target.execute("PRAGMA journal_mode=WAL")
+        for (sql,) in schema:
+            target.execute(sql)
+
+    counts = dict.fromkeys(outputs, 0)
+    for source in sources:
+        conn = sqlite3.connect(source)
+        for table in ("checkpoints", "writes"):
+            cursor = conn.execute(f"SELECT * FROM {table}")
+            placeholders = ", ".join("?" * len(cursor.description))
+            for row in cursor:
+                # thread_id is the first column of both tables
+                index = shard_index(row[0], shards)
+                targets[index].execute(f"INSERT OR REPLACE INTO {table} VALUES ({placeholders})", row)
+                if table == "checkpoints":
+                    counts[outputs[index]] += 1
+        conn.close()
+
+    for target in targets:
+        target.commit()
+        target.close()
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Reshard SQLite checkpoint databases")
+    parser.add_argument("sources", nargs="+", help="Existing checkpoint database files")
+    parser.add_argument("--shards", type=int, required=True, help="Number of output shards")
+    parser.add_argument(
+        "--out", required=True, help="Output path, shard i is written to <root>.<i><ext>"
+    )
+    args = parser.parse_args()
+    for path, count in reshard(args.sources, args.out, args.shards).items():
+        print(f"{path}: {count} checkpoints")
+
+
+if __name__ == "__main__":
+    main()
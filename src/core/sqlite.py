@@ -0,0 +1,34 @@
+from collections.abc import Callable, Iterable
+import os
+import sqlite3
+from typing import Any
+
+
+class ForkSafeConnection:
+    """
+    SQLite connection opened by connect() in the process that uses it.
+
+    A connection must not be used across fork, so a forked worker opens its own
+    on first use instead of sharing the one inherited from the parent.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection]) -> None:
+        self._connect = connect
+        self._pid = os.getpid()
+        self._connection = connect()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._connection = self._connect()
+        return self._connection
+
+    def execute(self, sql: str, parameters: Any = ()) -> sqlite3.Cursor:
+        return self.connection.execute(sql, parameters)
+
+    def executemany(self, sql: str, parameters: Iterable[Any]) -> sqlite3.Cursor:
+        return self.connection.executemany(sql, parameters)
+
+    def close(self) -> None:
+        self.connection.close()
@@ -1,3 +1,5 @@
+import os
+
 import uvicorn
 from dotenv import load_dotenv
 
@@ -6,4 +8,18 @@ from core import settings
 load_dotenv()
 
 if __name__ == "__main__":
-    uvicorn.run("service:app", host=settings.HOST, port=settings.PORT, reload=settings.is_dev())
\ No newline at end of file
+    if settings.WORKERS > 1 and not settings.is_dev() and hasattr(os, "fork"):
+        # Import the service once here; the forked workers inherit it
+        from service import app
+        from service.prefork import serve
+
+        serve(app, settings.HOST, settings.PORT, settings.WORKERS, settings.SHUTDOWN_TIMEOUT)
+    else:
+        uvicorn.run(
+            "service:app",
+            host=settings.HOST,
+            port=settings.PORT,
+            reload=settings.is_dev(),
+            workers=None if settings.is_dev() else settings.WORKERS,
+            timeout_graceful_shutdown=settings.SHUTDOWN_TIMEOUT,
+        )
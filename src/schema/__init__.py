@@ -1,5 +1,21 @@
 from schema.log_format import RequestFormatter
 from schema.models import AllModelEnum
-from schema.schema import AgentInfo, ServiceMetadata, UserInput, StreamInput, ChatMessage, ChatHistoryInput, ChatHistory
+from schema.schema import (
+    AgentInfo,
+    ServiceMetadata,
+    UserInput,
+    StreamInput,
+    ChatMessage,
+    ChatHistoryInput,
+    ChatHistory,
+    BatchInput,
+    BatchItemResult,
+    BatchResult,
+    RunStatus,
+    RunTrace,
+    TraceStep,
+    TraceModelCall,
+    TraceToolCall,
+)
 
-__all__ = [RequestFormatter, ChatMessage, AllModelEnum, AgentInfo, ServiceMetadata, UserInput, StreamInput, ChatHistoryInput, ChatHistory]
\ No newline at end of file
+__all__ = [RequestFormatter, ChatMessage, AllModelEnum, AgentInfo, ServiceMetadata, UserInput, StreamInput, ChatHistoryInput, ChatHistory, BatchInput, BatchItemResult, BatchResult, RunStatus, RunTrace, TraceStep, TraceModelCall, TraceToolCall]
\ No newline at end of file
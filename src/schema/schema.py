@@ -127,7 +127,52 @@ class StreamInput(UserInput):
         description="Whether to stream LLM tokens to the client.",
         default=True
     )
+    token_flush_ms: int | None = Field(
+        description="Coalesce streamed tokens and flush them at most this many milliseconds "
+        "after the first buffered token. Tokens are sent one per frame if neither flush option is set.",
+        default=None,
+        ge=1,
+        examples=[50],
+    )
+    token_flush_bytes: int | None = Field(
+        description="Coalesce streamed tokens and flush them once this many bytes are buffered.",
+        default=None,
+        ge=1,
+        examples=[256],
+    )
+    
+class BatchInput(BaseModel):
+    """Batch of independent user inputs to run concurrently."""
+    
+    inputs: list[UserInput] = Field(
+        description="User inputs to run. Each input runs in its own thread unless thread_id is set.",
+        min_length=1,
+    )
+    max_concurrency: int | None = Field(
+        description="Maximum number of inputs to run at once. Capped by the service limit.",
+        default=None,
+        ge=1,
+        examples=[4],
+    )
+
+class BatchItemResult(BaseModel):
+    """Result of a single input in a batch."""
+    
+    output: ChatMessage | None = Field(
+        description="Final message from the agent, if the run succeeded.",
+        default=None,
+    )
+    error: str | None = Field(
+        description="Error message, if the run failed.",
+        default=None,
+        examples=["Unexpected Error"],
+    )
+
+class BatchResult(BaseModel):
+    """Results of a batch, in the same order as the inputs."""
     
+    results: list[BatchItemResult]
+
 class ChatHistoryInput(BaseModel):
     """Input for retrieving chat history."""
     
@@ -135,7 +180,130 @@ class ChatHistoryInput(BaseModel):
         description="Thread ID to persist and continue a multi-tern conversation.",
         examples=["25435-q59t957-q9tq3t8q9-5t47q5yy"]
     )
+    limit: int | None = Field(
+        description="Maximum number of messages to return. All messages if not set.",
+        default=None,
+        ge=1,
+        examples=[50],
+    )
+    before: int | None = Field(
+        description="Return the latest messages with an index lower than this cursor.",
+        default=None,
+        ge=0,
+        examples=[120],
+    )
+    after: int | None = Field(
+        description="Return the earliest messages with an index higher than this cursor.",
+        default=None,
+        ge=-1,
+        examples=[119],
+    )
+    tool_content: Literal["full", "truncate", "none"] = Field(
+        description="Return tool message bodies in full, truncated to tool_content_max_chars, or not at all.",
+        default="full",
+    )
+    tool_content_max_chars: int = Field(
+        description="Maximum characters of a tool message body when tool_content is 'truncate'.",
+        default=1000,
+        ge=0,
+    )
 
 class ChatHistory(BaseModel):
+    """
+    A page of a thread's messages, in chronological order.
+    
+    Messages are indexed from 0 in thread order; use `start` as the `before`
+    cursor for the previous page and `start + len(messages) - 1` as the `after`
+    cursor for the next one.
+    """
+    
+    messages: list[ChatMessage]
+    start: int = Field(
+        description="Index of the first returned message in the thread.",
+        default=0,
+    )
+    total: int | None = Field(
+        description="Total number of messages in the thread.",
+        default=None,
+    )
+    
+    @property
+    def has_more_before(self) -> bool:
+        return self.start > 0
+    
+    @property
+    def has_more_after(self) -> bool:
+        return self.total is not None and self.start + len(self.messages) < self.total
+
+
+class TraceStep(BaseModel):
+    """A graph node executed in one super-step of a run."""
+    
+    step: int = Field(description="LangGraph super-step number.")
+    node: str = Field(description="Graph node name.", examples=["model"])
+    start_ms: float = Field(description="Start, in milliseconds since the run started.")
+    duration_ms: float | None = Field(description="Execution time of the node.", default=None)
+
+class TraceModelCall(BaseModel):
+    """A chat model call made during a run."""
+    
+    model: str = Field(description="Model name.", examples=["gpt-4o-mini"])
+    step: int | None = Field(description="Super-step the call was made in.", default=None)
+    start_ms: float = Field(description="Start, in milliseconds since the run started.")
+    queue_ms: float = Field(description="Time spent waiting for rate limit capacity.", default=0.0)
+    ttft_ms: float | None = Field(description="Time to the first streamed token.", default=None)
+    duration_ms: float | None = Field(description="Total duration of the call.", default=None)
+    prompt_tokens: int | None = Field(description="Prompt tokens reported by the provider.", default=None)
+    completion_tokens: int | None = Field(description="Completion tokens reported by the provider.", default=None)
+    status: Literal["running", "ok", "error"] = Field(default="running")
+
+class TraceToolCall(BaseModel):
+    """A tool call made during a run."""
+    
+    name: str = Field(description="Tool name.", examples=["tavily_search_results_json"])
+    step: int | None = Field(description="Super-step the call was made in.", default=None)
+    start_ms: float = Field(description="Start, in milliseconds since the run started.")
+    duration_ms: float | None = Field(description="Duration of the call.", default=None)
+    status: Literal["running", "ok", "error"] = Field(default="running")
+
+class RunTrace(BaseModel):
+    """
+    Timeline of a run, returned when the run is made with agent_config={"trace": True}.
+    
+    For /invoke it is in the final message's custom_data["trace"]; /stream sends
+    it as a final "trace" event.
+    """
+    
+    run_id: str | None = Field(description="Run id.", default=None)
+    queue_ms: float = Field(description="Time the request waited for admission.", default=0.0)
+    duration_ms: float | None = Field(description="Duration of the run.", default=None)
+    steps: list[TraceStep] = Field(default=[])
+    model_calls: list[TraceModelCall] = Field(default=[])
+    tool_calls: list[TraceToolCall] = Field(default=[])
+    
+    @classmethod
+    def from_message(cls, message: ChatMessage) -> "RunTrace | None":
+        """The trace attached to a message returned by /invoke, if any."""
+        trace = message.custom_data.get("trace")
+        return cls.model_validate(trace) if trace is not None else None
+
+class RunStatus(BaseModel):
+    """State of a run started with /runs or /stream, as returned by GET /runs/{run_id}."""
+    
+    run_id: str = Field(description="Run id.")
+    agent_id: str = Field(description="Agent executing the run.", examples=["research-agent"])
+    thread_id: str | None = Field(description="Thread the run writes to.", default=None)
+    status: Literal["queued", "running", "success", "error", "cancelled"] = Field(
+        description="Run state.", default="queued"
+    )
+    created_at: float = Field(description="Unix time the run was submitted.")
+    started_at: float | None = Field(description="Unix time the run started executing.", default=None)
+    finished_at: float | None = Field(description="Unix time the run finished.", default=None)
+    output: ChatMessage | None = Field(
+        description="Final message from the agent, once the run succeeded.", default=None
+    )
+    error: str | None = Field(description="Error message, if the run failed.", default=None)
     
-    messages: list[ChatMessage]
\ No newline at end of file
+    @property
+    def done(self) -> bool:
+        return self.status not in ("queued", "running")
@@ -0,0 +1,229 @@
+"""
+Admission control for agent runs.
+
+At most max_in_flight runs execute at once. Further requests wait in a bounded
+queue and are admitted in weighted fair order across clients, so one busy client
+cannot starve the others. Requests that cannot be queued are rejected with a
+Retry-After hint instead of adding to everyone's tail latency.
+"""
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+import hashlib
+import math
+import time
+from typing import Any
+
+from fastapi import Request
+
+from core import settings
+
+
+def _client_ip(request: Request) -> str:
+    """
+    The peer address, or the address a trusted proxy forwarded the request for:
+    the rightmost X-Forwarded-For entry that is not itself a trusted proxy.
+    """
+    ip = request.client.host if request.client else "unknown"
+    if ip not in settings.ADMISSION_TRUSTED_PROXIES:
+        return ip
+    for hop in reversed(request.headers.get("X-Forwarded-For", "").split(",")):
+        hop = hop.strip()
+        if not hop:
+            continue
+        ip = hop
+        if ip not in settings.ADMISSION_TRUSTED_PROXIES:
+            break
+    return ip
+
+
+def client_key(request: Request) -> str:
+    """Fair-share key of a request: a hash of its bearer token, else its client IP."""
+    auth = request.headers.get("Authorization")
+    if auth:
+        return "token:" + hashlib.sha256(auth.encode("utf-8")).hexdigest()[:16]
+    return "ip:" + _client_ip(request)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted or queued."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Waiter:
+    key: str
+    future: asyncio.Future = field(repr=False)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class AdmissionSlot:
+    """A granted run slot; release it once the run is done. Releasing twice is a no-op."""
+
+    def __init__(self, controller: "AdmissionController", waited: float = 0.0) -> None:
+        self._controller = controller
+        self.waited = waited
+        self._started_at = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(time.monotonic() - self._started_at)
+
+    async def __aenter__(self) -> "AdmissionSlot":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        self.release()
+
+
+class AdmissionController:
+    """
+    Run slots with a bounded, weighted fair wait queue.
+
+    Each client has its own FIFO queue. When a slot frees up, the client with
+    the lowest virtual time is served next and its virtual time advances by
+    1 / weight, so clients with waiting requests share slots in proportion to
+    their weights regardless of how many requests each has queued.
+
+    Rejections use 429 when the client exceeds its own queue share and 503 when
+    the whole queue is full or a request waited longer than queue_timeout.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int | None,
+        max_queue: int = 0,
+        max_queue_per_client: int | None = None,
+        queue_timeout: float | None = None,
+        weights: dict[str, float] | None = None,
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_queue_per_client = max_queue_per_client
+        self.queue_timeout = queue_timeout
+        self.weights = weights or {}
+        self.in_flight = 0
+        self.queued = 0
+        self._queues: dict[str, deque[_Waiter]] = {}
+        self._vtime: dict[str, float] = {}
+        self._clock = 0.0
+        # Moving average of how long a run holds its slot, for Retry-After
+        self._avg_run_time = 1.0
+        self.admitted = 0
+        self.rejected: dict[int, int] = {429: 0, 503: 0}
+        self.timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _has_capacity(self) -> bool:
+        return self.max_in_flight is None or self.in_flight < self.max_in_flight
+
+    def retry_after(self) -> int:
+        """Seconds until a new request would likely be admitted."""
+        slots = self.max_in_flight or 1
+        return max(1, math.ceil(self._avg_run_time * (self.queued + 1) / slots))
+
+    def _reject(self, status_code: int, detail: str) -> AdmissionRejected:
+        self.rejected[status_code] += 1
+        return AdmissionRejected(status_code, detail, self.retry_after())
+
+    def _grant(self, key: str, waited: float) -> AdmissionSlot:
+        start = max(self._vtime.get(key, 0.0), self._clock)
+        self._clock = start
+        self._vtime[key] = start + 1 / self.weights.get(key, 1.0)
+        self.in_flight += 1
+        self.admitted += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        return AdmissionSlot(self, waited)
+
+    def _dispatch(self) -> None:
+        while self._has_capacity() and self._queues:
+            key = min(
+                self._queues,
+                key=lambda k: (self._vtime.get(k, 0.0), self._queues[k][0].enqueued_at),
+            )
+            queue = self._queues[key]
+            waiter = queue.popleft()
+            if not queue:
+                del self._queues[key]
+            self.queued -= 1
+            if waiter.future.done():
+                continue
+            waiter.future.set_result(self._grant(key, time.monotonic() - waiter.enqueued_at))
+        # Clients that are idle and behind the clock need no fairness state
+        for key in [k for k, v in self._vtime.items() if v <= self._clock and k not in self._queues]:
+            del self._vtime[key]
+
+    def _release(self, run_time: float) -> None:
+        self.in_flight -= 1
+        self._avg_run_time = 0.9 * self._avg_run_time + 0.1 * run_time
+        self._dispatch()
+
+    def _remove(self, waiter: _Waiter) -> None:
+        queue = self._queues.get(waiter.key)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            self.queued -= 1
+            if not queue:
+                del self._queues[waiter.key]
+
+    async def acquire(self, key: str) -> AdmissionSlot:
+        """Wait for a run slot for client key, or raise AdmissionRejected."""
+        if self._has_capacity() and not self.queued:
+            return self._grant(key, 0.0)
+        if self.queued >= self.max_queue:
+            raise self._reject(503, "Service is at capacity, retry later")
+        queue = self._queues.setdefault(key, deque())
+        if self.max_queue_per_client is not None and len(queue) >= self.max_queue_per_client:
+            raise self._reject(429, "Too many queued requests for this client")
+        waiter = _Waiter(key, asyncio.get_running_loop().create_future())
+        queue.append(waiter)
+        self.queued += 1
+        try:
+            return await asyncio.wait_for(waiter.future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._remove(waiter)
+            self.timeouts += 1
+            raise self._reject(503, "Timed out waiting for capacity, retry later")
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # The slot was granted as the request went away
+                waiter.future.result().release()
+            self._remove(waiter)
+            raise
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "queued_clients": len(self._queues),
+            "admitted": self.admitted,
+            "rejected": {str(code): count for code, count in self.rejected.items()},
+            "queue_timeouts": self.timeouts,
+            "avg_wait_ms": round(self._wait_total / self.admitted * 1000, 1) if self.admitted else 0.0,
+            "max_wait_ms": round(self._wait_max * 1000, 1),
+            "avg_run_ms": round(self._avg_run_time * 1000, 1),
+        }
+
+
+def build_admission_controller() -> AdmissionController:
+    """Admission controller configured by the ADMISSION_* settings."""
+    if not settings.ADMISSION_ENABLED:
+        return AdmissionController(max_in_flight=None)
+    return AdmissionController(
+        max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+        max_queue=settings.ADMISSION_MAX_QUEUE,
+        max_queue_per_client=settings.ADMISSION_MAX_QUEUE_PER_CLIENT,
+        queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+        weights=settings.ADMISSION_CLIENT_WEIGHTS,
+    )
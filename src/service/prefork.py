@@ -0,0 +1,204 @@
+"""
+Pre-fork multi-worker serving.
+
+The parent process imports the service once, binds the listening socket and
+forks the worker processes, which inherit both: workers start without repeating
+the imports and share one port, with the kernel spreading connections over them.
+
+Runs live in the worker that started them, so every worker also listens on its
+own Unix socket and a request for a run it does not have is forwarded to its
+siblings (see forward_to_owner). SIGTERM or SIGINT to the parent is passed on to
+the workers, which stop accepting connections and drain before they exit. A
+worker that dies otherwise is replaced.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+from typing import Any
+
+import httpx
+import uvicorn
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+from core.rate_limit import set_worker_count
+
+logger = logging.getLogger(__name__)
+
+# Marks requests forwarded between workers so they are not forwarded again
+FORWARDED_HEADER = "x-worker-forwarded"
+# Headers of the owner's response that do not carry over to the forwarded one
+_HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "content-length"}
+
+# Clients for the Unix sockets of the other workers of this process's server
+_peers: list[httpx.AsyncClient] = []
+
+
+async def _ask_peer(peer: httpx.AsyncClient, request: httpx.Request) -> httpx.Response | None:
+    """The peer's response to request, or None if it does not have the run."""
+    try:
+        response = await peer.send(request, stream=True)
+    except httpx.TransportError as e:
+        # A sibling that is restarting cannot own a live run
+        logger.error(f"An exception occurred: {e}")
+        return None
+    if response.status_code == 404:
+        await response.aclose()
+        return None
+    return response
+
+
+async def forward_to_owner(request: Request) -> Response | None:
+    """
+    Send a request for a run to the sibling workers and return the response of
+    the one that owns the run, or None when no sibling has it.
+
+    The siblings are asked concurrently, so finding the owner takes one round
+    trip whatever the number of workers.
+    """
+    if not _peers or FORWARDED_HEADER in request.headers:
+        return None
+    body = await request.body()
+    headers = [(k, v) for k, v in request.headers.raw if k != b"host"]
+    headers.append((FORWARDED_HEADER.encode(), b"1"))
+    url = request.url.path + (f"?{request.url.query}" if request.url.query else "")
+    tasks = [
+        asyncio.create_task(
+            _ask_peer(peer, peer.build_request(request.method, url, headers=headers, content=body))
+        )
+        for peer in _peers
+    ]
+    response = None
+    try:
+        for answer in asyncio.as_completed(tasks):
+            if (response := await answer) is not None:
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, httpx.Response) and result is not response:
+                await result.aclose()
+    if response is None:
+        return None
+    return StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        headers={k: v for k, v in response.headers.items() if k not in _HOP_HEADERS},
+        background=BackgroundTask(response.aclose),
+    )
+
+
+def _run_worker(config: uvicorn.Config, sock: socket.socket, index: int, paths: list[str]) -> None:
+    # Let uvicorn install its own handlers instead of the supervisor's
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # Each worker enforces its share of the provider rate limits
+    set_worker_count(len(paths))
+    _peers[:] = [
+        httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(uds=path),
+            base_url="http://worker",
+            # Streams and long-polls are forwarded too, so reads have no timeout
+            timeout=httpx.Timeout(10.0, read=None),
+        )
+        for i, path in enumerate(paths)
+        if i != index
+    ]
+    if os.path.exists(paths[index]):
+        os.unlink(paths[index])
+    unix = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    unix.bind(paths[index])
+    uvicorn.Server(config).run(sockets=[sock, unix])
+
+
+def serve(
+    app: Any,
+    host: str,
+    port: int,
+    workers: int,
+    shutdown_timeout: float | None = None,
+    **kwargs: Any,
+) -> None:
+    """
+    Serve an already imported app from `workers` forked processes until SIGTERM/SIGINT.
+
+    On shutdown each worker waits up to shutdown_timeout seconds for open requests
+    and then, in the app's lifespan, for its background runs. Workers still
+    running after twice that are killed; a second signal kills them right away.
+
+    Args:
+        app: The ASGI app, imported before forking.
+        host: Address to listen on.
+        port: Port to listen on.
+        workers: Number of worker processes.
+        shutdown_timeout: Seconds to drain on shutdown; None waits indefinitely.
+        **kwargs: Further uvicorn.Config options.
+    """
+    config = uvicorn.Config(app, host=host, port=port, timeout_graceful_shutdown=shutdown_timeout, **kwargs)
+    sock = config.bind_socket()
+    socket_dir = tempfile.mkdtemp(prefix="agent-service-")
+    paths = [os.path.join(socket_dir, f"worker-{i}.sock") for i in range(workers)]
+    children: dict[int, int] = {}
+    stopping = False
+
+    def spawn(index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                _run_worker(config, sock, index, paths)
+                code = 0
+            except BaseException as e:
+                logger.error(f"An exception occurred: {e}")
+            finally:
+                os._exit(code)
+        children[pid] = index
+
+    def kill(signum: int, frame: Any) -> None:
+        for pid in list(children):
+            os.kill(pid, signal.SIGKILL)
+
+    def stop(signum: int, frame: Any) -> None:
+        nonlocal stopping
+        if stopping:
+            kill(signum, frame)
+            return
+        stopping = True
+        for pid in list(children):
+            os.kill(pid, signal.SIGTERM)
+        if shutdown_timeout is not None:
+            signal.signal(signal.SIGALRM, kill)
+            signal.alarm(int(2 * shutdown_timeout) + 5)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for i in range(workers):
+        spawn(i)
+    logger.info(f"Serving on {host}:{port} with {workers} workers")
+    try:
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            index = children.pop(pid, None)
+            if index is None or stopping:
+                continue
+            logger.error(
+                f"Worker {index} (pid {pid}) exited with code {os.waitstatus_to_exitcode(status)}, restarting"
+            )
+            # Avoid a tight loop if workers die at startup
+            time.sleep(1)
+            if not stopping:
+                spawn(index)
+    finally:
+        signal.alarm(0)
+        sock.close()
+        shutil.rmtree(socket_dir, ignore_errors=True)
@@ -0,0 +1,532 @@
+"""
+Runs decoupled from the HTTP connection that started them.
+
+A run writes its SSE frames into a RunEvents buffer, numbered from 1, instead of
+straight into an HTTP response. The run keeps going when the client drops, and
+readers can follow the buffer again from the last event id they saw. The most
+recent frames are kept in memory; older ones are dropped, or spilled to SQLite
+when a spill database is configured.
+
+Streamed runs start right away. Background runs are queued and executed by a
+fixed pool of worker tasks, so their concurrency does not depend on how many
+clients are connected.
+
+Runs can be cancelled explicitly, and a streamed run is cancelled once it has
+had no connected reader for a grace period, so abandoned runs stop spending
+model and search calls while a dropped connection can still resume.
+"""
+import asyncio
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+from itertools import islice
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from core import settings
+from core.metrics import RUNS_CANCELLED, RUNS_TOKENS_SAVED
+from core.sqlite import ForkSafeConnection
+from schema import ChatMessage, RunStatus
+from service.sse import DONE_FRAME, ERROR_PREFIX, FRAME_SUFFIX, MESSAGE_PREFIX, error_frame
+from service.trace import TokenCounter
+
+logger = logging.getLogger(__name__)
+
+
+class EventsGone(Exception):
+    """Raised when the events after a requested id are no longer buffered."""
+
+
+class RunQueueFull(Exception):
+    """Raised when the background run queue is at capacity."""
+
+
+class ClientRunQueueFull(RunQueueFull):
+    """Raised when a client already has its share of the background run queue."""
+
+
+class EventSpill:
+    """SQLite table of frames evicted from in-memory run buffers."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = ForkSafeConnection(self._connect)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS run_events ("
+            "run_id TEXT NOT NULL, seq INTEGER NOT NULL, frame BLOB NOT NULL, "
+            "PRIMARY KEY (run_id, seq)) WITHOUT ROWID"
+        )
+        return conn
+
+    def write(self, run_id: str, frames: list[tuple[int, bytes]]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO run_events (run_id, seq, frame) VALUES (?, ?, ?)",
+                [(run_id, seq, frame) for seq, frame in frames],
+            )
+
+    def read(self, run_id: str, after: int, before: int) -> list[tuple[int, bytes]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT seq, frame FROM run_events WHERE run_id = ? AND seq > ? AND seq < ? ORDER BY seq",
+                (run_id, after, before),
+            ).fetchall()
+
+    def delete(self, run_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM run_events WHERE run_id = ?", (run_id,))
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class RunEvents:
+    """
+    Bounded, numbered buffer of one run's SSE frames, and the run's state.
+
+    Once more than max_frames are held, the oldest half is evicted in one batch
+    (a single spill write rather than one per frame). Spill writes run on a
+    thread; evicted frames stay readable in memory until their write has landed.
+    """
+
+    def __init__(
+        self,
+        run_id: str,
+        max_frames: int,
+        spill: EventSpill | None = None,
+        agent_id: str = "",
+        thread_id: str | None = None,
+        detach_grace: float | None = None,
+        on_abandoned: Callable[["RunEvents"], None] | None = None,
+    ) -> None:
+        self.run_id = run_id
+        self.max_frames = max_frames
+        self.spill = spill
+        self.agent_id = agent_id
+        self.thread_id = thread_id
+        # Pass as a callback to the run to count the tokens it uses
+        self.tokens = TokenCounter()
+        self.detach_grace = detach_grace
+        self._on_abandoned = on_abandoned
+        self.readers = 0
+        self._abandon_timer: asyncio.TimerHandle | None = None
+        self.cancel_reason: str | None = None
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.last_id = 0
+        self.done = False
+        self._frames: deque[tuple[int, bytes]] = deque()
+        # Evicted frames whose spill write has not landed yet, oldest first
+        self._pending: list[tuple[int, bytes]] = []
+        self._writer: asyncio.Task | None = None
+        # Oldest id that can still be read, from memory or the spill
+        self._first_id = 1
+        self._changed = asyncio.Event()
+        self._finished = asyncio.Event()
+        self._last_message: bytes | None = None
+        self._error: bytes | None = None
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def append(self, frame: bytes) -> int:
+        if frame.startswith(MESSAGE_PREFIX):
+            self._last_message = frame
+        elif frame.startswith(ERROR_PREFIX):
+            self._error = frame
+        self.last_id += 1
+        self._frames.append((self.last_id, frame))
+        if len(self._frames) > self.max_frames:
+            evicted = [self._frames.popleft() for _ in range(len(self._frames) - self.max_frames // 2)]
+            if self.spill is not None:
+                self._pending.extend(evicted)
+                if self._writer is None:
+                    self._writer = asyncio.create_task(self._write_pending())
+            else:
+                self._first_id = self._frames[0][0]
+        self._notify()
+        return self.last_id
+
+    async def _write_pending(self) -> None:
+        try:
+            while self._pending:
+                batch = list(self._pending)
+                await asyncio.to_thread(self.spill.write, self.run_id, batch)
+                # Frames evicted during the write were appended after the batch
+                del self._pending[:len(batch)]
+        except Exception as e:
+            logger.error(f"An exception occurred: {e}")
+            self._pending.clear()
+            self._first_id = self._frames[0][0]
+        finally:
+            self._writer = None
+
+    def start(self) -> None:
+        self.status = "running"
+        self.started_at = time.time()
+
+    def close(self, status: str | None = None) -> None:
+        self.status = status or ("error" if self._error is not None else "success")
+        self.finished_at = time.time()
+        self.done = True
+        self._finished.set()
+        self._notify()
+
+    async def wait(self, timeout: float | None = None) -> bool:
+        """Wait up to timeout seconds for the run to finish; True if it has."""
+        try:
+            await asyncio.wait_for(self._finished.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.done
+
+    def run_status(self) -> RunStatus:
+        """The run's state; the final message is decoded only when asked for."""
+        output = error = None
+        if self.done and self._last_message is not None and self._error is None:
+            output = ChatMessage.model_validate_json(
+                self._last_message[len(MESSAGE_PREFIX):-len(FRAME_SUFFIX)]
+            )
+        if self._error is not None:
+            error = json.loads(self._error[len(ERROR_PREFIX):-len(FRAME_SUFFIX)])
+        return RunStatus(
+            run_id=self.run_id,
+            agent_id=self.agent_id,
+            thread_id=self.thread_id,
+            status=self.status,
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            output=output,
+            error=error,
+        )
+
+    def check(self, after: int) -> None:
+        """Raise EventsGone if events after id `after` were dropped."""
+        if after + 1 < self._first_id:
+            raise EventsGone(f"Events after {after} of run {self.run_id} are no longer buffered")
+
+    async def follow(self, after: int = 0) -> AsyncIterator[tuple[int, bytes]]:
+        """Yield (id, frame) for every frame after id `after`, until the run is done."""
+        self.check(after)
+        self._attach()
+        try:
+            async for item in self._follow(after):
+                yield item
+        finally:
+            self._detach()
+
+    def _attach(self) -> None:
+        self.readers += 1
+        if self._abandon_timer is not None:
+            self._abandon_timer.cancel()
+            self._abandon_timer = None
+
+    def _detach(self) -> None:
+        self.readers -= 1
+        if not self.readers:
+            self.watch_readers()
+
+    def watch_readers(self) -> None:
+        """Abandon the run if it has no reader detach_grace seconds from now."""
+        if not self.done and self.detach_grace is not None and self._abandon_timer is None:
+            self._abandon_timer = asyncio.get_running_loop().call_later(self.detach_grace, self._abandon)
+
+    def _abandon(self) -> None:
+        self._abandon_timer = None
+        if not self.readers and not self.done and self._on_abandoned is not None:
+            self._on_abandoned(self)
+
+    async def _follow(self, after: int) -> AsyncIterator[tuple[int, bytes]]:
+        while True:
+            changed = self._changed
+            if self._frames and after + 1 < self._frames[0][0]:
+                # The reader fell behind the in-memory window
+                if self._pending and after + 1 >= self._pending[0][0]:
+                    older = self._pending[after + 1 - self._pending[0][0]:]
+                else:
+                    before = self._pending[0][0] if self._pending else self._frames[0][0]
+                    older = []
+                    if self.spill is not None:
+                        older = await asyncio.to_thread(self.spill.read, self.run_id, after, before)
+                if not older:
+                    raise EventsGone(f"Events after {after} of run {self.run_id} are no longer buffered")
+                for seq, frame in older:
+                    yield seq, frame
+                    after = seq
+                continue
+            start = after + 1 - self._frames[0][0] if self._frames else 0
+            # Copied, as appends can happen while the frames are being sent
+            for seq, frame in list(islice(self._frames, max(start, 0), None)):
+                yield seq, frame
+                after = seq
+            if after >= self.last_id:
+                if self.done:
+                    return
+                await changed.wait()
+
+
+class RunRegistry:
+    """
+    Runs of this process, kept for `retention` seconds after they end.
+
+    Background runs wait in a queue of at most max_queued runs, and at most
+    max_queued_per_client per client, and are executed by `workers` worker tasks
+    started with start_workers(). Like admission control, workers take the next
+    run in weighted fair order across clients rather than FIFO, so a client with
+    thousands of queued runs does not starve the others. Streamed runs are
+    cancelled after detach_grace seconds without a reader (None disables this).
+    """
+
+    def __init__(
+        self,
+        max_frames: int,
+        retention: float,
+        spill_path: str | None = None,
+        workers: int = 8,
+        max_queued: int = 1000,
+        detach_grace: float | None = None,
+        max_queued_per_client: int | None = None,
+        weights: dict[str, float] | None = None,
+    ) -> None:
+        self.max_frames = max_frames
+        self.retention = retention
+        self.spill = EventSpill(spill_path) if spill_path else None
+        self.workers = workers
+        self.max_queued = max_queued
+        self.detach_grace = detach_grace
+        self.max_queued_per_client = max_queued_per_client
+        self.weights = weights or {}
+        # Moving average of the tokens a finished run uses, per agent
+        self._avg_tokens: dict[str, float] = {}
+        self._runs: dict[str, RunEvents] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        # Queued background runs per client key, and the client of each queued run
+        self._queues: dict[str, deque[tuple[RunEvents, Callable[[], AsyncIterator[bytes]]]]] = {}
+        self._clients: dict[str, str] = {}
+        # Fair-share virtual time per client, as in AdmissionController
+        self._vtime: dict[str, float] = {}
+        self._clock = 0.0
+        self._queued = asyncio.Semaphore(0)
+        self._workers: list[asyncio.Task] = []
+        self._deletes: set[asyncio.Task] = set()
+        self.draining = False
+
+    def get(self, run_id: str) -> RunEvents | None:
+        return self._runs.get(run_id)
+
+    def _create(
+        self, run_id: str, agent_id: str, thread_id: str | None, detach_grace: float | None = None
+    ) -> RunEvents:
+        events = RunEvents(
+            run_id,
+            self.max_frames,
+            self.spill,
+            agent_id,
+            thread_id,
+            detach_grace,
+            lambda e: self.cancel(e.run_id, "disconnect"),
+        )
+        self._runs[run_id] = events
+        return events
+
+    def start(
+        self,
+        run_id: str,
+        frames: AsyncIterator[bytes],
+        agent_id: str = "",
+        thread_id: str | None = None,
+        on_done: Callable[[], None] | None = None,
+    ) -> RunEvents:
+        """
+        Buffer the frames of a streamed run from a background task. The run goes on
+        if its reader disconnects, until no reader has been connected for detach_grace.
+        on_done is called once the task ends, even if it is cancelled before it starts.
+        """
+        events = self._create(run_id, agent_id, thread_id, self.detach_grace)
+        # Also covers a client that leaves before it starts reading
+        events.watch_readers()
+        task = asyncio.create_task(self._pump(events, frames))
+        if on_done is not None:
+            task.add_done_callback(lambda _: on_done())
+        self._tasks[run_id] = task
+        return events
+
+    def submit(
+        self,
+        run_id: str,
+        frames: Callable[[], AsyncIterator[bytes]],
+        agent_id: str = "",
+        thread_id: str | None = None,
+        client: str = "",
+    ) -> RunEvents:
+        """
+        Queue a run of client for the worker pool; frames() is called when a worker
+        picks it up. Raises ClientRunQueueFull when the client has its share of the
+        queue and RunQueueFull when the whole queue is full.
+        """
+        if self.draining:
+            raise RunQueueFull("The service is shutting down")
+        if len(self._clients) >= self.max_queued:
+            raise RunQueueFull(f"{len(self._clients)} runs are already queued")
+        queue = self._queues.get(client)
+        if self.max_queued_per_client is not None and queue and len(queue) >= self.max_queued_per_client:
+            raise ClientRunQueueFull(f"{len(queue)} runs of this client are already queued")
+        events = self._create(run_id, agent_id, thread_id)
+        self._queues.setdefault(client, deque()).append((events, frames))
+        self._clients[run_id] = client
+        self._queued.release()
+        return events
+
+    def _next_queued(self) -> tuple[RunEvents, Callable[[], AsyncIterator[bytes]]] | None:
+        """Dequeue the run of the client with the lowest virtual time."""
+        if not self._queues:
+            return None
+        client = min(
+            self._queues,
+            key=lambda k: (self._vtime.get(k, 0.0), self._queues[k][0][0].created_at),
+        )
+        queue = self._queues[client]
+        events, frames = queue.popleft()
+        if not queue:
+            del self._queues[client]
+        del self._clients[events.run_id]
+        start = max(self._vtime.get(client, 0.0), self._clock)
+        self._clock = start
+        self._vtime[client] = start + 1 / self.weights.get(client, 1.0)
+        # Clients that are idle and behind the clock need no fairness state
+        for key in [k for k, v in self._vtime.items() if v <= self._clock and k not in self._queues]:
+            del self._vtime[key]
+        return events, frames
+
+    def _unqueue(self, events: RunEvents) -> None:
+        client = self._clients.pop(events.run_id)
+        queue = self._queues[client]
+        queue.remove(next(item for item in queue if item[0] is events))
+        if not queue:
+            del self._queues[client]
+
+    def start_workers(self) -> None:
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _worker(self) -> None:
+        while True:
+            await self._queued.acquire()
+            # Runs cancelled while queued leave the semaphore ahead of the queues
+            if (item := self._next_queued()) is None:
+                continue
+            events, frames = item
+            task = asyncio.create_task(self._pump(events, frames()))
+            self._tasks[events.run_id] = task
+            try:
+                await task
+            except asyncio.CancelledError:
+                # Only stop if the worker itself is being cancelled, not just its run
+                if asyncio.current_task().cancelling():
+                    raise
+
+    def cancel(self, run_id: str, reason: str = "request") -> bool:
+        """Cancel a queued or running run; False if it already finished."""
+        events = self._runs.get(run_id)
+        if events is None or events.done:
+            return False
+        events.cancel_reason = reason
+        task = self._tasks.get(run_id)
+        if task is not None:
+            # The pump records the cancellation once the run has unwound
+            task.cancel()
+        else:
+            self._unqueue(events)
+            self._cancelled(events)
+            events.close("cancelled")
+            self._expire(run_id)
+        return True
+
+    def _cancelled(self, events: RunEvents) -> None:
+        reason = events.cancel_reason or "shutdown"
+        events.append(error_frame("Run cancelled"))
+        events.append(DONE_FRAME)
+        RUNS_CANCELLED.inc(reason)
+        # Estimate what the run would still have spent from runs of the same agent
+        if (average := self._avg_tokens.get(events.agent_id)) is not None:
+            RUNS_TOKENS_SAVED.inc(events.agent_id, amount=max(0.0, average - events.tokens.tokens))
+
+    def _finished(self, events: RunEvents) -> None:
+        used = events.tokens.tokens
+        average = self._avg_tokens.get(events.agent_id)
+        self._avg_tokens[events.agent_id] = used if average is None else 0.9 * average + 0.1 * used
+
+    async def drain(self, timeout: float | None = None) -> None:
+        """Stop taking background runs and wait up to timeout seconds for the runs in progress."""
+        self.draining = True
+        pending = [events for events in self._runs.values() if not events.done]
+        if pending:
+            logger.info(f"Waiting for {len(pending)} runs to finish")
+            await asyncio.gather(*(events.wait(timeout) for events in pending))
+
+    async def shutdown(self) -> None:
+        """Stop the workers and cancel the runs still in progress."""
+        tasks = [*self._workers, *self._tasks.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+
+    async def _pump(self, events: RunEvents, frames: AsyncIterator[bytes]) -> None:
+        events.start()
+        status = None
+        try:
+            async for frame in frames:
+                events.append(frame)
+        except asyncio.CancelledError:
+            self._cancelled(events)
+            status = "cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"An exception occurred: {e}")
+            events.append(error_frame("Unexpected Error"))
+            events.append(DONE_FRAME)
+        else:
+            self._finished(events)
+        finally:
+            events.close(status)
+            self._tasks.pop(events.run_id, None)
+            self._expire(events.run_id)
+
+    def _expire(self, run_id: str) -> None:
+        asyncio.get_running_loop().call_later(self.retention, self._drop, run_id)
+
+    def _drop(self, run_id: str) -> None:
+        self._runs.pop(run_id, None)
+        if self.spill is not None:
+            # Off the event loop, like every other spill access
+            task = asyncio.create_task(asyncio.to_thread(self.spill.delete, run_id))
+            self._deletes.add(task)
+            task.add_done_callback(self._deletes.discard)
+
+    def stats(self) -> dict[str, int]:
+        return {"running": len(self._tasks), "queued": len(self._clients), "buffered": len(self._runs)}
+
+
+def build_run_registry() -> RunRegistry:
+    """Run registry configured by the RUN_* settings."""
+    return RunRegistry(
+        max_frames=settings.RUN_BUFFER_SIZE,
+        retention=settings.RUN_RETENTION,
+        spill_path=settings.RUN_BUFFER_DB,
+        workers=settings.RUN_WORKERS,
+        max_queued=settings.RUN_MAX_QUEUED,
+        detach_grace=settings.RUN_DETACH_GRACE,
+        max_queued_per_client=settings.RUN_MAX_QUEUED_PER_CLIENT,
+        weights=settings.ADMISSION_CLIENT_WEIGHTS,
+    )
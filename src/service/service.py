@@ -1,32 +1,65 @@
+import asyncio
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
-import json
 from typing import Any
 from uuid import UUID, uuid4
 import logging
+import time
 
-from fastapi.responses import StreamingResponse
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from langgraph.graph.state import CompiledStateGraph
 from langchain_core.messages import HumanMessage, AnyMessage
-from langgraph.types import Command
 from langchain_core.runnables import RunnableConfig
-from fastapi import APIRouter, FastAPI, HTTPException, status
+from fastapi import APIRouter, FastAPI, Header, HTTPException, Request, status
 
-from agents import get_all_agent_info, get_agent, DEFAULT_AGENT
+from agents import (
+    get_all_agent_info,
+    get_agent,
+    DEFAULT_AGENT,
+    GraphFormat,
+    GraphRenderError,
+    MEDIA_TYPES,
+    render_graph,
+)
 from core import settings
+from core.cache import cache_stats
+from core.checkpoint import open_checkpointer
+from core.hedging import hedge_stats
+from core.metrics import REQUEST_DURATION, REQUESTS, Gauge, registry
+from core.rate_limit import rate_limit_stats
 from schema import (
     ServiceMetadata,
     UserInput,
     ChatMessage,
     StreamInput,
     ChatHistoryInput,
-    ChatHistory
+    ChatHistory,
+    BatchInput,
+    BatchItemResult,
+    BatchResult,
+    RunStatus,
+)
+from service.admission import AdmissionRejected, AdmissionSlot, build_admission_controller, client_key
+from service.prefork import forward_to_owner
+from service.runs import ClientRunQueueFull, EventsGone, RunEvents, RunQueueFull, build_run_registry
+from service.streaming import STREAM_BACKENDS
+from service.sse import (
+    DONE_FRAME,
+    TokenCoalescer,
+    error_frame,
+    message_frame,
+    metered,
+    token_frame,
+    trace_frame,
 )
+from service.trace import RunTracer
 from service.utils import (
     langchain_to_chat_message,
     remove_tool_calls,
-    convert_message_content_to_string
+    convert_message_content_to_string,
+    history_page,
+    shorten_tool_content,
+    aiter_with_deadline,
 )
 
 logger = logging.getLogger(__name__)
@@ -35,15 +68,33 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     # Construct agent with Sqlite checkpointer
     
-    async with AsyncSqliteSaver.from_conn_string("checkpoints.db") as saver:
+    async with open_checkpointer() as saver:
         agents = get_all_agent_info()
         for a in agents:
             agent = get_agent(a.key)
             agent.checkpointer = saver
+        runs.start_workers()
         yield
+        # uvicorn has drained open requests; give background runs the same time, then
+        # stop the rest before the checkpointer closes
+        await runs.drain(settings.SHUTDOWN_TIMEOUT)
+        await runs.shutdown()
         
 app = FastAPI(lifespan=lifespan)
 router = APIRouter()
+admission = build_admission_controller()
+runs = build_run_registry()
+
+async def _admit(key: str) -> AdmissionSlot:
+    """Wait for a run slot, turning a rejection into a 429/503 with Retry-After."""
+    try:
+        return await admission.acquire(key)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers={"Retry-After": str(e.retry_after)}
+        )
 
 
 @router.get("/info")
@@ -57,8 +108,8 @@ async def info() -> ServiceMetadata:
         default_model=settings.DEFAULT_MODEL
     )
     
-def _parse_input(user_input: UserInput) -> tuple[dict[str, Any], UUID]:
-    run_id = uuid4()
+def _parse_input(user_input: UserInput, run_id: UUID | None = None) -> tuple[dict[str, Any], UUID]:
+    run_id = run_id or uuid4()
     thread_id = user_input.thread_id or str(uuid4())
     
     configurable = {"thread_id": thread_id, "model": user_input.model}
@@ -79,85 +130,178 @@ def _parse_input(user_input: UserInput) -> tuple[dict[str, Any], UUID]:
     }
     return kwargs, run_id
 
+def _start_trace(
+    kwargs: dict[str, Any], run_id: UUID, user_input: UserInput, queue_wait: float = 0.0
+) -> RunTracer | None:
+    """Attach a RunTracer to the run if agent_config asks for a trace."""
+    if not user_input.agent_config.get("trace"):
+        return None
+    tracer = RunTracer(run_id, queue_wait)
+    kwargs["config"].setdefault("callbacks", []).append(tracer)
+    return tracer
+
 @router.post("/{agent_id}/invoke")
 @router.post("/invoke")
-async def invoke(user_input: UserInput, agent_id: str = DEFAULT_AGENT) -> ChatMessage:
+async def invoke(
+    user_input: UserInput, request: Request, agent_id: str = DEFAULT_AGENT
+) -> ChatMessage:
     """
     Invoke an agent with user_input to retrieve a final response.
     
     If agent_id is not provided, the default agent will be used.
     Use thread_id to persist and continue a multi-turn conversation. run_id kwarg
     is also attached to messages for recording feedback.
+    
+    Set `agent_config={"trace": true}` to get a timeline of the run's steps, model
+    calls and tool calls in the response's `custom_data["trace"]`.
+    
+    Runs are subject to admission control: a busy service answers 429 or 503 with
+    a Retry-After header.
     """
     agent: CompiledStateGraph = get_agent(agent_id)
-    kwargs, run_id = _parse_input(user_input)
+    start = time.perf_counter()
+    status = "ok"
     try:
-        response = await agent.ainvoke(**kwargs)
-        output = langchain_to_chat_message(response["messages"][-1])
-        output.run_id = str(run_id)
-        return output
+        async with await _admit(client_key(request)) as slot:
+            return await _ainvoke_agent(agent, user_input, slot.waited)
+    except HTTPException as e:
+        status = str(e.status_code)
+        raise
     except Exception as e:
+        status = "500"
         logger.error(f"An exception occurred: {e}")
         raise HTTPException(status_code=500, detail="Unexpected Error")
+    finally:
+        REQUESTS.inc(agent_id, "invoke", status)
+        REQUEST_DURATION.observe(time.perf_counter() - start, agent_id, "invoke")
+
+async def _ainvoke_agent(
+    agent: CompiledStateGraph, user_input: UserInput, queue_wait: float = 0.0
+) -> ChatMessage:
+    kwargs, run_id = _parse_input(user_input)
+    tracer = _start_trace(kwargs, run_id, user_input, queue_wait)
+    response = await agent.ainvoke(**kwargs)
+    output = langchain_to_chat_message(response["messages"][-1])
+    output.run_id = str(run_id)
+    if tracer:
+        output.custom_data["trace"] = tracer.finish().model_dump()
+    return output
+
+@router.post("/{agent_id}/invoke/batch")
+@router.post("/invoke/batch")
+async def invoke_batch(
+    batch_input: BatchInput, request: Request, agent_id: str = DEFAULT_AGENT
+) -> BatchResult:
+    """
+    Invoke an agent with a batch of independent user inputs.
+    
+    Inputs run concurrently, at most `max_concurrency` at a time (capped by the
+    service's BATCH_MAX_CONCURRENCY). Results are returned in input order; a failed
+    input reports its error without failing the rest of the batch. Each input is
+    admitted separately, so inputs turned away by admission control report that
+    as their error.
+    """
+    if len(batch_input.inputs) > settings.BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Batch size {len(batch_input.inputs)} exceeds the limit of {settings.BATCH_MAX_SIZE}"
+        )
+    agent: CompiledStateGraph = get_agent(agent_id)
+    concurrency = min(
+        batch_input.max_concurrency or settings.BATCH_MAX_CONCURRENCY,
+        settings.BATCH_MAX_CONCURRENCY
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    key = client_key(request)
+    
+    async def run_one(user_input: UserInput) -> BatchItemResult:
+        async with semaphore:
+            try:
+                async with await _admit(key) as slot:
+                    output = await _ainvoke_agent(agent, user_input, slot.waited)
+                    return BatchItemResult(output=output)
+            except HTTPException as e:
+                return BatchItemResult(error=str(e.detail))
+            except Exception as e:
+                logger.error(f"An exception occurred: {e}")
+                return BatchItemResult(error="Unexpected Error")
+    
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_one(i) for i in batch_input.inputs))
+    REQUESTS.inc(agent_id, "invoke_batch", "ok")
+    REQUEST_DURATION.observe(time.perf_counter() - start, agent_id, "invoke_batch")
+    return BatchResult(results=results)
 
 async def message_generator(
-    user_input: StreamInput, agent_id: str = DEFAULT_AGENT
-) -> AsyncGenerator[str, None]:
+    user_input: StreamInput,
+    agent_id: str = DEFAULT_AGENT,
+    queue_wait: float = 0.0,
+    run_id: UUID | None = None,
+    callbacks: list | None = None,
+) -> AsyncGenerator[bytes, None]:
     """
     Generate a stream of messages from the agent.
     
     This is the workhouse method for the /stream endpoint.
     """
     agent: CompiledStateGraph = get_agent(agent_id)
-    kwargs, run_id = _parse_input(user_input)
+    kwargs, run_id = _parse_input(user_input, run_id)
+    if callbacks:
+        kwargs["config"]["callbacks"] = list(callbacks)
+    tracer = _start_trace(kwargs, run_id, user_input, queue_wait)
+    events = STREAM_BACKENDS[settings.STREAM_BACKEND](agent, kwargs)
+    coalescer = None
+    if user_input.token_flush_ms or user_input.token_flush_bytes:
+        coalescer = TokenCoalescer(user_input.token_flush_ms, user_input.token_flush_bytes)
+        # Wake up at the flush deadline even if the agent emits no events
+        events = aiter_with_deadline(events, coalescer.deadline)
     
-    async for event in agent.astream_events(**kwargs, version="v2"):
-        if not event:
+    async for item in events:
+        if not item:
+            if coalescer and (frame := coalescer.flush()):
+                yield frame
             continue
-        
-        new_messages = []
-        # Yield messages written to the graph state after node execution finishes
-        if (
-            event["event"] == "on_chain_end"
-            # 'on_chain_end' gets called a bunch of times in a graph execution
-            # Thif filters out everything except for "graph node finished"
-            and any(t.startswith("graph:step:") for t in event.get("tags", []))
-        ):
-            if isinstance(event["data"]["output"], Command):
-                new_messages = event["data"]["output"].update.get("messages", [])
-            elif "messages" in event["data"]["output"]:
-                new_messages = event["data"]["output"]["messages"]
+        kind, data = item
         
         # TODO: Yield custom event dispatch [https://github.com/JoshuaC215/agent-service-toolkit/blob/3aec9d7034fcadd333f556765cb0b0b5b7a90322/src/service/service.py#L159]
         
-        for message in new_messages:
-            try:
-                chat_message = langchain_to_chat_message(message)
-                chat_message.run_id = str(run_id)
-            except Exception as e:
-                logger.error(f"Error parsing message: {e}")
-                yield f"data: {json.dumps({'type': 'error', 'content': 'Unexpected Error'})}\n\n"
-                continue
-            # LangGraph re-sends the input message. So drip it.
-            if chat_message.type == "human" and chat_message.content == user_input.message:
-                continue
-            yield f"data: {json.dumps({'type': 'message', 'content': chat_message.model_dump()})}\n\n"
+        # Yield messages written to the graph state after node execution finishes
+        if kind == "messages":
+            # Buffered tokens go out before the message that completes them
+            if coalescer and (frame := coalescer.flush()):
+                yield frame
             
+            for message in data:
+                try:
+                    chat_message = langchain_to_chat_message(message)
+                    chat_message.run_id = str(run_id)
+                except Exception as e:
+                    logger.error(f"Error parsing message: {e}")
+                    yield error_frame("Unexpected Error")
+                    continue
+                # LangGraph re-sends the input message. So drip it.
+                if chat_message.type == "human" and chat_message.content == user_input.message:
+                    continue
+                yield message_frame(chat_message)
         
         # Yield tokens streamed from LLMs
-        if (
-            event["event"] == "on_chat_model_stream"
-            and user_input.stream_tokens
-        ):
-            content = remove_tool_calls(event["data"]["chunk"].content)
+        elif kind == "token" and user_input.stream_tokens:
+            content = remove_tool_calls(data)
             if content:
                 # Empty content in the context of OpenAI usually means
                 # that the model is asking a tool to be invoked
                 # So we only print non-empty content.
-                yield f"data: {json.dumps({'type': 'token', 'content': convert_message_content_to_string(content)})}\n\n"
-            continue
+                token = convert_message_content_to_string(content)
+                if coalescer is None:
+                    yield token_frame(token)
+                elif frame := coalescer.add(token):
+                    yield frame
     
-    yield "data: [DONE]\n\n"
+    if coalescer and (frame := coalescer.flush()):
+        yield frame
+    if tracer:
+        yield trace_frame(tracer.finish())
+    yield DONE_FRAME
     
 def _sse_response_example() -> dict[int, Any]:
     return {
@@ -165,7 +309,7 @@ def _sse_response_example() -> dict[int, Any]:
             "description": "Server Sent Event Response",
             "content": {
                 "text/event-stream": {
-                    "example": "data: {'type': 'token', 'content': 'Hello'}\n\ndata: {'type': 'token', 'content': ' World'}\n\ndata: [DONE]\n\n",
+                    "example": 'id: 1\ndata: {"type":"token","content":"Hello"}\n\nid: 2\ndata: {"type":"token","content":" World"}\n\nid: 3\ndata: [DONE]\n\n',
                     "schema": {"type": "string"},
                 }
             }
@@ -176,7 +320,9 @@ def _sse_response_example() -> dict[int, Any]:
     "/{agent_id}/stream", response_class=StreamingResponse, responses=_sse_response_example()
 )
 @router.post("/stream", response_class=StreamingResponse, responses=_sse_response_example())
-async def stream(user_input: StreamInput, agent_id: str = DEFAULT_AGENT) -> StreamingResponse:
+async def stream(
+    user_input: StreamInput, request: Request, agent_id: str = DEFAULT_AGENT
+) -> StreamingResponse:
     """
     Stream an agent's response to a user input, including intermediate messages and tokens.
     
@@ -185,35 +331,300 @@ async def stream(user_input: StreamInput, agent_id: str = DEFAULT_AGENT) -> Stre
     is also attached to all messages for recording feedback.
     
     Set `stream-tokens=false` to return intermediate messages but not token-by-token. 
+    Set `token_flush_ms` and/or `token_flush_bytes` to coalesce tokens into fewer frames.
+    Set `agent_config={"trace": true}` to receive a final `trace` event with a
+    timeline of the run's steps, model calls and tool calls.
+    
+    Runs are subject to admission control: a busy service answers 429 or 503 with
+    a Retry-After header before the stream starts.
+    
+    Every frame has an SSE `id`, and the run's id is returned in the `X-Run-ID`
+    header. The run continues if the connection drops; resume it with
+    `GET /runs/{run_id}/stream` and a `Last-Event-ID` header. A run nobody has
+    been reading for RUN_DETACH_GRACE seconds is cancelled.
     """
+    slot = await _admit(client_key(request))
+    run_id = uuid4()
+    # Fixed up front so GET /runs/{run_id} can report it
+    user_input.thread_id = user_input.thread_id or str(uuid4())
+    
+    async def frames() -> AsyncGenerator[bytes, None]:
+        body = message_generator(user_input, agent_id, slot.waited, run_id, [events.tokens])
+        async for frame in metered(body, agent_id, cancel_reason=lambda: events.cancel_reason):
+            yield frame
+    
+    # Released when the run's task ends, also if it is cancelled before frames() starts
+    events = runs.start(str(run_id), frames(), agent_id, user_input.thread_id, slot.release)
     return StreamingResponse(
-        message_generator(user_input, agent_id),
-        media_type="text/event-stream"
+        _event_stream(events),
+        media_type="text/event-stream",
+        headers={"X-Run-ID": str(run_id)}
     )
+
+async def _event_stream(events: RunEvents, after: int = 0) -> AsyncGenerator[bytes, None]:
+    async for seq, frame in events.follow(after):
+        yield b"id: %d\n" % seq + frame
+
+@router.post("/{agent_id}/runs", status_code=status.HTTP_202_ACCEPTED)
+@router.post("/runs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_run(
+    user_input: StreamInput, request: Request, agent_id: str = DEFAULT_AGENT
+) -> RunStatus:
+    """
+    Queue a background run and return its run_id right away.
+    
+    The run is executed by the service's worker pool, independent of any HTTP
+    connection. Poll `GET /runs/{run_id}` for its status and final message, or
+    follow `GET /runs/{run_id}/events` for the same events as `/stream`.
+    Queued runs are started in fair order across clients. A client that already
+    has RUN_MAX_QUEUED_PER_CLIENT runs queued gets a 429, a full queue a 503,
+    both with a Retry-After header.
+    """
+    try:
+        get_agent(agent_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Agent {agent_id} not found")
+    run_id = uuid4()
+    user_input.thread_id = user_input.thread_id or str(uuid4())
+    # Reject invalid input (e.g. reserved agent_config keys) now rather than in the worker
+    _parse_input(user_input, run_id)
+    
+    def frames() -> AsyncGenerator[bytes, None]:
+        queue_wait = time.time() - events.created_at
+        body = message_generator(user_input, agent_id, queue_wait, run_id, [events.tokens])
+        return metered(body, agent_id, "runs", lambda: events.cancel_reason)
     
+    try:
+        events = runs.submit(str(run_id), frames, agent_id, user_input.thread_id, client_key(request))
+    except ClientRunQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    except RunQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return events.run_status()
+
+async def _owner_response(request: Request, run_id: str) -> Response:
+    """Response for a run this worker does not have: the owning worker's, or a 404."""
+    if (response := await forward_to_owner(request)) is not None:
+        return response
+    raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+
+@router.get("/runs/{run_id}")
+async def get_run(run_id: str, request: Request, wait: float = 0.0) -> RunStatus:
+    """
+    Get the status of a run, with its final message once it succeeded.
+    
+    Set `wait` to long-poll: the response is held for up to that many seconds
+    (at most 60) until the run finishes.
+    """
+    events = runs.get(run_id)
+    if events is None:
+        return await _owner_response(request, run_id)
+    if wait > 0 and not events.done:
+        await events.wait(min(wait, 60.0))
+    return events.run_status()
+
+@router.post("/runs/{run_id}/cancel")
+async def cancel_run(run_id: str, request: Request) -> RunStatus:
+    """
+    Cancel a queued or running run, stopping its in-flight model and tool calls.
+    
+    Readers of the run's events receive an error event and the end of the stream.
+    A run that already finished answers 409.
+    """
+    events = runs.get(run_id)
+    if events is None:
+        return await _owner_response(request, run_id)
+    if not runs.cancel(run_id, "request"):
+        raise HTTPException(status_code=409, detail=f"Run {run_id} already finished")
+    # Give the run a moment to unwind so the returned status is final
+    await events.wait(5.0)
+    return events.run_status()
+
+@router.get(
+    "/runs/{run_id}/events", response_class=StreamingResponse, responses=_sse_response_example()
+)
+@router.get(
+    "/runs/{run_id}/stream", response_class=StreamingResponse, responses=_sse_response_example()
+)
+async def resume_stream(
+    run_id: str, request: Request, last_event_id: str | None = Header(default=None)
+) -> StreamingResponse:
+    """
+    Follow the event stream of a run started with `/runs` or `/stream`.
+    
+    Frames after the `Last-Event-ID` header are sent, followed by the rest of the
+    run as it happens; without the header the stream is replayed from the start.
+    Runs stay available for RUN_RETENTION seconds after they finish. A 410 means
+    the requested frames are no longer buffered.
+    """
+    events = runs.get(run_id)
+    if events is None:
+        return await _owner_response(request, run_id)
+    try:
+        after = int(last_event_id or 0)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Last-Event-ID must be an event id")
+    try:
+        events.check(after)
+    except EventsGone as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    return StreamingResponse(
+        _event_stream(events, after),
+        media_type="text/event-stream",
+        headers={"X-Run-ID": run_id}
+    )
+    
+@router.get("/{agent_id}/graph", response_class=Response)
+async def graph(agent_id: str, format: GraphFormat = "mermaid") -> Response:
+    """
+    Get an agent's graph as Mermaid text, PNG or SVG.
+    
+    Rendering happens on first request and is cached until the graph changes.
+    PNG and SVG need the Graphviz `dot` executable on the server.
+    """
+    try:
+        agent: CompiledStateGraph = get_agent(agent_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Agent {agent_id} not found")
+    try:
+        content = await asyncio.to_thread(render_graph, agent_id, agent, format)
+    except GraphRenderError as e:
+        logger.error(f"An exception occurred: {e}")
+        raise HTTPException(status_code=501, detail=str(e))
+    return Response(content=content, media_type=MEDIA_TYPES[format])
+    
+@router.post("/{agent_id}/history")
 @router.post("/history")
-def history(input: ChatHistoryInput) -> ChatHistory:
+async def history(input: ChatHistoryInput, agent_id: str = DEFAULT_AGENT) -> ChatHistory:
     """
     Get chat history.
+    
+    Returns a page of the thread's messages selected by the `limit`, `before` and
+    `after` cursors (the whole thread by default). Tool message bodies can be
+    truncated or left out with `tool_content`.
     """
-    agent: CompiledStateGraph = get_agent(DEFAULT_AGENT)
     try:
-        state_snapshot = agent.get_state(
+        agent: CompiledStateGraph = get_agent(agent_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Agent {agent_id} not found")
+    try:
+        state_snapshot = await agent.aget_state(
             config=RunnableConfig(
                 configurable={
                     "thread_id": input.thread_id
                 }
             )
         )
-        messages: list[AnyMessage] = state_snapshot.values["messages"]
-        chat_messages: list[ChatMessage] = [langchain_to_chat_message(m) for m in messages]
+    except Exception as e:
+        logger.error(f"An exception occurred: {e}")
+        raise HTTPException(status_code=500, detail="Unexpected Error")
+    messages: list[AnyMessage] | None = state_snapshot.values.get("messages")
+    if messages is None:
+        raise HTTPException(status_code=404, detail=f"Thread {input.thread_id} not found")
+    try:
+        start, end = history_page(messages, input.limit, input.before, input.after)
+        chat_messages: list[ChatMessage] = [
+            shorten_tool_content(
+                langchain_to_chat_message(m), input.tool_content, input.tool_content_max_chars
+            )
+            for m in messages[start:end]
+        ]
         return ChatHistory(
-            messages=chat_messages
+            messages=chat_messages,
+            start=start,
+            total=len(messages)
         )
     except Exception as e:
         logger.error(f"An exception occurred: {e}")
         raise HTTPException(status_code=500, detail="Unexpected Error")
     
+@app.get("/admission")
+async def admission_stats() -> dict[str, Any]:
+    """Admission control state: runs in flight, queue depth, wait times and rejections."""
+    return admission.stats()
+
+ADMISSION_GAUGES = {
+    key: registry.register(Gauge(f"admission_{key}", help))
+    for key, help in [
+        ("in_flight", "Runs holding an admission slot"),
+        ("queued", "Requests waiting for an admission slot"),
+        ("avg_wait_ms", "Average admission queue wait"),
+        ("max_wait_ms", "Longest admission queue wait"),
+    ]
+}
+ADMISSION_REJECTED = registry.register(Gauge(
+    "admission_rejected_total", "Requests rejected by admission control", ("status",), kind="counter"
+))
+HEDGE_COUNTERS = {
+    key: registry.register(Gauge(name, help, kind="counter"))
+    for key, name, help in [
+        ("calls", "model_fallback_chain_calls_total", "Model calls made through a fallback chain"),
+        ("hedged_calls", "model_hedged_calls_total", "Model calls that started at least one hedge"),
+        ("hedges", "model_hedges_total", "Hedge requests started"),
+        ("hedge_wins", "model_hedge_wins_total", "Model calls won by a hedge or fallback"),
+        ("failovers", "model_failovers_total", "Model calls failed over to the next model"),
+    ]
+}
+MODEL_WINS = registry.register(Gauge(
+    "model_wins_total", "Hedged or failed-over calls won per model", ("model",), kind="counter"
+))
+RATE_LIMIT_WAITS = registry.register(Gauge(
+    "rate_limit_waits_total", "Model calls delayed by a rate limit bucket", ("bucket",), kind="counter"
+))
+RATE_LIMIT_WAIT_SECONDS = registry.register(Gauge(
+    "rate_limit_wait_seconds_total", "Time model calls waited for a rate limit bucket", ("bucket",), kind="counter"
+))
+CACHE_HITS = registry.register(Gauge(
+    "cache_hits_total", "Cache hits per cache and tier", ("cache", "tier"), kind="counter"
+))
+CACHE_MISSES = registry.register(Gauge(
+    "cache_misses_total", "Cache lookups that found nothing", ("cache",), kind="counter"
+))
+CACHE_ENTRIES = registry.register(Gauge(
+    "cache_memory_entries", "Entries in the in-memory cache tier", ("cache",)
+))
+RUN_GAUGES = {
+    key: registry.register(Gauge(f"runs_{key}", help))
+    for key, help in [
+        ("running", "Runs executing in this process"),
+        ("queued", "Background runs waiting for a worker"),
+        ("buffered", "Runs whose events are buffered for resuming"),
+    ]
+}
+
+def _collect_metrics() -> None:
+    stats = admission.stats()
+    for key, gauge in ADMISSION_GAUGES.items():
+        gauge.set(stats[key])
+    for code, count in stats["rejected"].items():
+        ADMISSION_REJECTED.set(count, code)
+    hedges = hedge_stats.as_dict()
+    for key, counter in HEDGE_COUNTERS.items():
+        counter.set(hedges[key])
+    for model, wins in hedges["wins"].items():
+        MODEL_WINS.set(wins, model)
+    for key, value in runs.stats().items():
+        RUN_GAUGES[key].set(value)
+    for bucket, waits in rate_limit_stats().items():
+        RATE_LIMIT_WAITS.set(waits["waits"], bucket)
+        RATE_LIMIT_WAIT_SECONDS.set(waits["wait_seconds"], bucket)
+    for name, cache in cache_stats().items():
+        CACHE_HITS.set(cache["memory_hits"], name, "memory")
+        CACHE_HITS.set(cache["disk_hits"], name, "disk")
+        CACHE_MISSES.set(cache["misses"], name)
+        CACHE_ENTRIES.set(cache["memory_entries"], name)
+
+registry.add_collector(_collect_metrics)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """
+    Service metrics in the Prometheus text format: requests and latency per agent
+    and endpoint, model time to first token and tokens/sec, graph node and tool
+    timings, SSE frames, admission control, hedging, rate limiting and caches.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
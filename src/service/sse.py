@@ -0,0 +1,130 @@
+"""
+Server-Sent Event frames for the /stream endpoint.
+
+Frames are built as bytes: the static parts are pre-encoded and only the payload
+is serialized, with orjson when it is installed and the stdlib otherwise.
+"""
+import asyncio
+from collections.abc import AsyncIterator, Callable
+import json
+import time
+
+from pydantic_core import to_json
+
+from core.metrics import REQUEST_DURATION, REQUESTS, SSE_FRAMES
+from schema import ChatMessage, RunTrace
+
+try:
+    import orjson
+
+    def dumps(obj: object) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:  # pragma: no cover - orjson is an optional speedup
+    def dumps(obj: object) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+TOKEN_PREFIX = b'data: {"type":"token","content":'
+MESSAGE_PREFIX = b'data: {"type":"message","content":'
+ERROR_PREFIX = b'data: {"type":"error","content":'
+TRACE_PREFIX = b'data: {"type":"trace","content":'
+FRAME_SUFFIX = b"}\n\n"
+DONE_FRAME = b"data: [DONE]\n\n"
+
+
+def token_frame(content: str) -> bytes:
+    return TOKEN_PREFIX + dumps(content) + FRAME_SUFFIX
+
+
+def message_frame(message: ChatMessage) -> bytes:
+    return MESSAGE_PREFIX + to_json(message) + FRAME_SUFFIX
+
+
+def error_frame(content: str) -> bytes:
+    return ERROR_PREFIX + dumps(content) + FRAME_SUFFIX
+
+
+def trace_frame(trace: RunTrace) -> bytes:
+    return TRACE_PREFIX + to_json(trace) + FRAME_SUFFIX
+
+
+class TokenCoalescer:
+    """
+    Buffers streamed tokens into a single token frame, flushed once the oldest
+    buffered token is flush_ms old or the buffer reaches flush_bytes.
+    """
+
+    def __init__(self, flush_ms: int | None = None, flush_bytes: int | None = None) -> None:
+        self.flush_after = flush_ms / 1000 if flush_ms else None
+        self.flush_bytes = flush_bytes
+        self._parts: list[str] = []
+        self._size = 0
+        self._first_at: float | None = None
+
+    def add(self, token: str) -> bytes | None:
+        """Buffer a token, returning a frame if the buffer is full or due."""
+        if not self._parts:
+            self._first_at = time.monotonic()
+        self._parts.append(token)
+        self._size += len(token.encode("utf-8"))
+        if self.flush_bytes and self._size >= self.flush_bytes:
+            return self.flush()
+        if self.flush_after is not None and time.monotonic() - self._first_at >= self.flush_after:
+            return self.flush()
+        return None
+
+    def deadline(self) -> float | None:
+        """Monotonic time by which the buffer must be flushed, if it holds tokens."""
+        if not self._parts or self.flush_after is None:
+            return None
+        return self._first_at + self.flush_after
+
+    def flush(self) -> bytes | None:
+        """Frame and clear the buffered tokens, if any."""
+        if not self._parts:
+            return None
+        frame = token_frame("".join(self._parts))
+        self._parts.clear()
+        self._size = 0
+        self._first_at = None
+        return frame
+
+
+async def metered(
+    frames: AsyncIterator[bytes],
+    agent_id: str,
+    endpoint: str = "stream",
+    cancel_reason: Callable[[], str | None] | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    Pass frames through, counting them by type and timing the stream.
+
+    Runs are consumed by a background task, so a stream ends early by being
+    cancelled; cancel_reason tells a run abandoned by its client ("disconnect")
+    apart from one cancelled on request or at shutdown.
+    """
+    start = time.perf_counter()
+    counts = {"token": 0, "message": 0, "error": 0, "trace": 0}
+    status = "error"
+    try:
+        async for frame in frames:
+            if frame.startswith(TOKEN_PREFIX):
+                counts["token"] += 1
+            elif frame.startswith(MESSAGE_PREFIX):
+                counts["message"] += 1
+            elif frame.startswith(ERROR_PREFIX):
+                counts["error"] += 1
+            elif frame.startswith(TRACE_PREFIX):
+                counts["trace"] += 1
+            elif frame == DONE_FRAME:
+                status = "ok"
+            yield frame
+    except asyncio.CancelledError:
+        reason = cancel_reason() if cancel_reason is not None else None
+        status = "disconnected" if reason == "disconnect" else "cancelled"
+        raise
+    finally:
+        for kind, count in counts.items():
+            if count:
+                SSE_FRAMES.inc(agent_id, kind, amount=count)
+        REQUESTS.inc(agent_id, endpoint, status)
+        REQUEST_DURATION.observe(time.perf_counter() - start, agent_id, endpoint)
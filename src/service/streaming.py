@@ -0,0 +1,74 @@
+"""
+Streaming backends for message_generator.
+
+Both yield the same normalized items so /stream does not depend on the backend:
+("messages", list of messages written to the graph state by a node) and
+("token", chunk content streamed by a chat model).
+"""
+from collections.abc import AsyncGenerator
+from typing import Any, Literal
+
+from langchain_core.messages import AIMessageChunk, AnyMessage
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.types import Command
+
+StreamItem = tuple[Literal["messages"], list[AnyMessage]] | tuple[Literal["token"], Any]
+
+
+def _update_messages(output: Any) -> list[AnyMessage]:
+    if isinstance(output, Command):
+        return output.update.get("messages", [])
+    if isinstance(output, dict):
+        return output.get("messages", [])
+    return []
+
+
+async def astream_events_backend(
+    agent: CompiledStateGraph, kwargs: dict[str, Any]
+) -> AsyncGenerator[StreamItem, None]:
+    """
+    Stream from astream_events(version="v2").
+
+    Receives callback events from every runnable in the graph and filters them down
+    to node outputs and chat model tokens.
+    """
+    async for event in agent.astream_events(**kwargs, version="v2"):
+        if not event:
+            continue
+        if (
+            event["event"] == "on_chain_end"
+            # 'on_chain_end' gets called a bunch of times in a graph execution
+            # Thif filters out everything except for "graph node finished"
+            and any(t.startswith("graph:step:") for t in event.get("tags", []))
+        ):
+            if new_messages := _update_messages(event["data"]["output"]):
+                yield "messages", new_messages
+        elif event["event"] == "on_chat_model_stream":
+            yield "token", event["data"]["chunk"].content
+
+
+async def astream_updates_backend(
+    agent: CompiledStateGraph, kwargs: dict[str, Any]
+) -> AsyncGenerator[StreamItem, None]:
+    """
+    Stream from astream(stream_mode=["messages", "updates"]).
+
+    LangGraph only emits node updates and chat model messages, so there is no
+    per-runnable callback fan-out to filter.
+    """
+    async for mode, chunk in agent.astream(**kwargs, stream_mode=["messages", "updates"]):
+        if mode == "updates":
+            for output in chunk.values():
+                if new_messages := _update_messages(output):
+                    yield "messages", new_messages
+        elif mode == "messages":
+            message, _ = chunk
+            # Complete messages (e.g. tool results) also come through as node updates
+            if isinstance(message, AIMessageChunk):
+                yield "token", message.content
+
+
+STREAM_BACKENDS = {
+    "events": astream_events_backend,
+    "updates": astream_updates_backend,
+}
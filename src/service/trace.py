@@ -0,0 +1,183 @@
+"""
+Per-run callbacks: execution traces, recorded when a run sets
+agent_config={"trace": True}, and token usage counts.
+"""
+import time
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from core.rate_limit import estimate_prompt_tokens, rate_limit_wait
+from schema import RunTrace, TraceModelCall, TraceStep, TraceToolCall
+
+
+def _step_tag(tags: list[str] | None) -> int | None:
+    for tag in tags or []:
+        if tag.startswith("graph:step:"):
+            return int(tag[len("graph:step:"):])
+    return None
+
+
+class RunTracer(BaseCallbackHandler):
+    """Callback handler that builds a RunTrace from the callback events of one run."""
+
+    # Record timestamps inline instead of on the executor
+    run_inline = True
+    ignore_retriever = True
+    ignore_custom_event = True
+
+    def __init__(self, run_id: UUID | str | None = None, queue_wait: float = 0.0) -> None:
+        self.start = time.perf_counter()
+        self.trace = RunTrace(
+            run_id=str(run_id) if run_id else None, queue_ms=round(queue_wait * 1000, 1)
+        )
+        self._steps: dict[UUID, TraceStep] = {}
+        self._models: dict[UUID, TraceModelCall] = {}
+        self._tools: dict[UUID, TraceToolCall] = {}
+
+    def _ms(self, since: float | None = None) -> float:
+        return round((time.perf_counter() - self.start) * 1000 - (since or 0.0), 1)
+
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any],
+        inputs: Any,
+        *,
+        run_id: UUID,
+        tags: list[str] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        step = _step_tag(tags)
+        if step is not None:
+            self._steps[run_id] = TraceStep(step=step, node=kwargs.get("name") or "", start_ms=self._ms())
+            self.trace.steps.append(self._steps[run_id])
+
+    def _end_step(self, run_id: UUID) -> None:
+        if step := self._steps.pop(run_id, None):
+            step.duration_ms = self._ms(step.start_ms)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_step(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_step(run_id)
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: Any,
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        metadata = metadata or {}
+        call = TraceModelCall(
+            model=str(metadata.get("ls_model_name") or metadata.get("model") or "unknown"),
+            step=metadata.get("langgraph_step"),
+            start_ms=self._ms(),
+        )
+        self._models[run_id] = call
+        self.trace.model_calls.append(call)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        call = self._models.get(run_id)
+        if call is not None and call.ttft_ms is None:
+            call.ttft_ms = self._ms(call.start_ms)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        call = self._models.pop(run_id, None)
+        if call is None:
+            return
+        call.duration_ms = self._ms(call.start_ms)
+        call.queue_ms = round(rate_limit_wait(run_id) * 1000, 1)
+        call.status = "ok"
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    call.prompt_tokens = usage.get("input_tokens")
+                    call.completion_tokens = usage.get("output_tokens")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        if call := self._models.pop(run_id, None):
+            call.duration_ms = self._ms(call.start_ms)
+            call.queue_ms = round(rate_limit_wait(run_id) * 1000, 1)
+            call.status = "error"
+
+    def on_tool_start(
+        self,
+        serialized: dict[str, Any],
+        input_str: str,
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        call = TraceToolCall(
+            name=serialized.get("name") or kwargs.get("name") or "unknown",
+            step=(metadata or {}).get("langgraph_step"),
+            start_ms=self._ms(),
+        )
+        self._tools[run_id] = call
+        self.trace.tool_calls.append(call)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        if call := self._tools.pop(run_id, None):
+            call.duration_ms = self._ms(call.start_ms)
+            call.status = "ok"
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        if call := self._tools.pop(run_id, None):
+            call.duration_ms = self._ms(call.start_ms)
+            call.status = "error"
+
+    def finish(self) -> RunTrace:
+        """Close the trace; calls still open (e.g. cancelled or timed out) count as errors."""
+        self.trace.duration_ms = self._ms()
+        for call in [*self._models.values(), *self._tools.values()]:
+            call.duration_ms = self._ms(call.start_ms)
+            call.status = "error"
+        self._models.clear()
+        self._tools.clear()
+        return self.trace
+
+
+class TokenCounter(BaseCallbackHandler):
+    """
+    Counts the model tokens a run has used: the provider's reported usage, or an
+    estimate from the prompt and output size when a model does not report it.
+    """
+
+    run_inline = True
+    ignore_chain = True
+    ignore_agent = True
+    ignore_retriever = True
+    ignore_custom_event = True
+
+    def __init__(self) -> None:
+        self.tokens = 0
+        self._prompts: dict[UUID, int] = {}
+
+    def on_chat_model_start(
+        self, serialized: dict[str, Any], messages: Any, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._prompts[run_id] = sum(estimate_prompt_tokens(m) for m in messages)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        prompt = self._prompts.pop(run_id, 0)
+        completion = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    self.tokens += usage["total_tokens"]
+                    return
+                completion += len(generation.text) // 4
+        self.tokens += prompt + completion
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        # The prompt of a failed or cancelled call was most likely sent already
+        self.tokens += self._prompts.pop(run_id, 0)
@@ -1,7 +1,13 @@
+import asyncio
+from collections.abc import AsyncGenerator, AsyncIterable, Callable, Sequence
+import time
+from typing import TypeVar
 from fastapi import Request
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
 from schema import ChatMessage
 
+T = TypeVar("T")
+
 def get_client_ip(request: Request) -> str:
     """Get the client IP address from the request headers."""
     forwarded_for = request.headers.get("X-Forwarded-For")
@@ -37,6 +43,8 @@ def langchain_to_chat_message(message: BaseMessage) -> ChatMessage:
                 content=convert_message_content_to_string(message.content),
                 tool_call_id=message.tool_call_id
             )
+            if message.response_metadata:
+                tool_message.response_metadata = message.response_metadata
             return tool_message
         # TODO: Add custom message types [https://github.com/JoshuaC215/agent-service-toolkit/blob/5db28a3dd1dcc15758a020848c061b0e01fbc67c/src/service/utils.py#L53]
         case _:
@@ -63,3 +71,73 @@ def convert_message_content_to_string(content: str | list[str | dict]) -> str:
         if content_item["type"] == "text":
             text.append(content_item["content"])
     return "".join(text)
+
+
+def history_page(
+    messages: Sequence[BaseMessage],
+    limit: int | None = None,
+    before: int | None = None,
+    after: int | None = None,
+) -> tuple[int, int]:
+    """
+    Select a page of messages by cursor and return its [start, end) slice bounds.
+    
+    With `after`, the page holds the earliest messages following that index;
+    otherwise the latest messages preceding `before` (the end of the thread by
+    default). Pages are widened so tool results are never split from the AI
+    message that called them.
+    """
+    total = len(messages)
+    if after is not None:
+        start = min(after + 1, total)
+        end = total if limit is None else min(start + limit, total)
+    else:
+        end = total if before is None else min(before, total)
+        start = 0 if limit is None else max(end - limit, 0)
+    while 0 < start < total and isinstance(messages[start], ToolMessage):
+        start -= 1
+    while start < end < total and isinstance(messages[end], ToolMessage):
+        end += 1
+    return start, end
+
+def shorten_tool_content(message: ChatMessage, mode: str, max_chars: int) -> ChatMessage:
+    """Truncate or drop the body of a tool ChatMessage, recording the original length."""
+    if message.type != "tool" or mode == "full":
+        return message
+    length = len(message.content)
+    if mode == "none":
+        message.content = ""
+    elif length > max_chars:
+        message.content = message.content[:max_chars] + "…"
+    else:
+        return message
+    message.custom_data["original_length"] = length
+    return message
+
+async def aiter_with_deadline(
+    items: AsyncIterable[T], deadline: Callable[[], float | None]
+) -> AsyncGenerator[T | None, None]:
+    """
+    Yield items, plus None whenever the monotonic time returned by deadline()
+    passes before the next item arrives. The pending item is not cancelled by a
+    deadline, so nothing is lost.
+    """
+    iterator = aiter(items)
+    next_item = asyncio.ensure_future(anext(iterator))
+    try:
+        while True:
+            timeout = deadline()
+            if timeout is not None:
+                timeout = max(timeout - time.monotonic(), 0)
+            done, _ = await asyncio.wait({next_item}, timeout=timeout)
+            if not done:
+                yield None
+                continue
+            try:
+                item = next_item.result()
+            except StopAsyncIteration:
+                return
+            yield item
+            next_item = asyncio.ensure_future(anext(iterator))
+    finally:
+        next_item.cancel()
@@ -8,11 +8,13 @@ import urllib
 from client import AgentClient, AgentClientError
 from streamlit.runtime.scriptrunner import get_script_run_ctx
 
-from schema import ChatHistory
+from schema import ChatHistory, RunTrace
 from schema.schema import ChatMessage
 
 APP_TITLE = "LangGraph Agents"
 APP_ICON = "🧰"
+# Messages loaded per history page when resuming a thread
+HISTORY_PAGE_SIZE = 50
 
 async def main() -> None:
     st.set_page_config(
@@ -39,16 +41,23 @@ async def main() -> None:
     
     if "thread_id" not in st.session_state:
         thread_id = st.query_params.get("thread_id")
+        history_start = 0
         if not thread_id:
             thread_id = get_script_run_ctx().session_id
             messages = []
         else:
             try:
-                messages: ChatHistory = agent_client.get_history(thread_id=thread_id).messages
+                # Load the most recent turns first, earlier pages are loaded on demand
+                history: ChatHistory = agent_client.get_history(
+                    thread_id=thread_id, limit=HISTORY_PAGE_SIZE, tool_content="truncate"
+                )
+                messages = history.messages
+                history_start = history.start
             except AgentClientError:
                 st.error("No message history found for this Thread ID.")
                 messages = []
         st.session_state.messages = messages
+        st.session_state.history_start = history_start
         st.session_state.thread_id = thread_id
         
     # Config options
@@ -67,12 +76,16 @@ async def main() -> None:
                 index=agent_idx
             )
             use_streaming = st.toggle("Stream results", value=True)
+            trace_runs = st.toggle("Trace runs", value=False)
         
         @st.dialog("Architecture")
         def architecture_dialog() -> None:
-            st.image(
-                os.path.join(os.getcwd(),"media/graph.png"),
-            )
+            try:
+                graph = agent_client.get_graph("png")
+            except AgentClientError:
+                # Service cannot render offline (no Graphviz), use the bundled image
+                graph = os.path.join(os.getcwd(),"media/graph.png")
+            st.image(graph)
             "[View full size on Github]()"
             st.caption(
                 "App hosted by Soumadip locally."
@@ -105,6 +118,20 @@ async def main() -> None:
     # Draw existing messages
     messages: list[ChatMessage] = st.session_state.messages
     
+    if st.session_state.history_start > 0 and st.button("Load earlier messages"):
+        try:
+            history: ChatHistory = agent_client.get_history(
+                thread_id=st.session_state.thread_id,
+                limit=HISTORY_PAGE_SIZE,
+                before=st.session_state.history_start,
+                tool_content="truncate",
+            )
+            messages[:0] = history.messages
+            st.session_state.history_start = history.start
+            st.rerun()
+        except AgentClientError as e:
+            st.error(f"Error loading earlier messages: {e}")
+    
     if len(messages) == 0:
         WELCOME = "Hello! I'm an AI powered research assistant with web search, created by *SOUMADIP SAHA*. Ask me anything!"
         with st.chat_message("ai"):
@@ -116,25 +143,32 @@ async def main() -> None:
             yield m
     
     await draw_messages(amessage_iter())
+    if trace := st.session_state.get("last_trace"):
+        draw_trace(trace)
 
     # Generate new message if the user provided new input
     if user_input := st.chat_input():
         messages.append(ChatMessage(type="human", content=user_input))
         st.chat_message("human").write(user_input)
+        agent_config = {"trace": True} if trace_runs else None
+        st.session_state.last_trace = None
         try:
             if use_streaming:
                 stream = agent_client.astream(
                     message=user_input,
                     model=model,
-                    thread_id=st.session_state.thread_id
+                    thread_id=st.session_state.thread_id,
+                    agent_config=agent_config
                 )
                 await draw_messages(stream, is_new=True)
             else:
                 response = await agent_client.ainvoke(
                     message=user_input,
                     model=model,
-                    thread_id=st.session_state.thread_id
+                    thread_id=st.session_state.thread_id,
+                    agent_config=agent_config
                 )
+                st.session_state.last_trace = RunTrace.from_message(response)
                 messages.append(response)
                 st.chat_message("ai").write(response.content)
             st.rerun()  # Clear state containers
@@ -142,8 +176,22 @@ async def main() -> None:
             st.error(f"Error generating response: {e}")
             st.stop()
 
+def draw_trace(trace: RunTrace) -> None:
+    """Draw the timeline of the last run in a collapsible panel."""
+    with st.expander(f":material/timer: Run trace ({trace.duration_ms or 0:.0f} ms)"):
+        st.caption(f"Admission queue: {trace.queue_ms:.0f} ms")
+        if trace.steps:
+            st.markdown("**Graph steps**")
+            st.dataframe([s.model_dump() for s in trace.steps], hide_index=True)
+        if trace.model_calls:
+            st.markdown("**Model calls**")
+            st.dataframe([c.model_dump() for c in trace.model_calls], hide_index=True)
+        if trace.tool_calls:
+            st.markdown("**Tool calls**")
+            st.dataframe([c.model_dump() for c in trace.tool_calls], hide_index=True)
+
 async def draw_messages(
-    messages_agen: AsyncGenerator[ChatMessage | str, None],
+    messages_agen: AsyncGenerator[ChatMessage | str | RunTrace, None],
     is_new: bool = False
 ) -> None:
     """
@@ -187,6 +235,10 @@ async def draw_messages(
             streaming_content += msg
             streaming_placeholder.markdown(streaming_content)   # Change if needed to st.write
             continue
+        # The run's trace is the last event of a traced stream
+        if isinstance(msg, RunTrace):
+            st.session_state.last_trace = msg
+            continue
         if not isinstance(msg, ChatMessage):
             st.error(f"Unexpected message type: {type(msg)}")
             st.write(msg)
@@ -0,0 +1,5 @@
+import os
+
+# core.settings requires the API keys to be set; tests never call the providers
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("TAVILY_API_KEY", "test")
@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+from fastapi import Request
+
+from core import settings
+from service.admission import AdmissionController, AdmissionRejected, client_key
+
+
+def _request(peer: str, forwarded_for: str | None = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded_for.encode())] if forwarded_for else []
+    return Request({"type": "http", "headers": headers, "client": (peer, 1234)})
+
+
+def test_spoofed_forwarded_for_does_not_create_a_new_queue():
+    async def main():
+        controller = AdmissionController(max_in_flight=1, max_queue=8, max_queue_per_client=1)
+        slot = await controller.acquire("ip:other")
+        queued = asyncio.create_task(controller.acquire(client_key(_request("10.0.0.5", "1.1.1.1"))))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire(client_key(_request("10.0.0.5", "2.2.2.2")))
+        assert rejected.value.status_code == 429
+        slot.release()
+        (await queued).release()
+
+    asyncio.run(main())
+
+
+def test_forwarded_for_is_used_behind_a_trusted_proxy(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_TRUSTED_PROXIES", ["10.0.0.1"])
+    assert client_key(_request("10.0.0.1", "6.6.6.6, 1.1.1.1")) == "ip:1.1.1.1"
+    assert client_key(_request("10.0.0.5", "1.1.1.1")) == "ip:10.0.0.5"
@@ -0,0 +1,45 @@
+import json
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from agents.context import ContextBudget, _message_tokens
+
+
+def _turn(error: str, results: list[dict]) -> list:
+    calls = [
+        {"name": "lookup", "args": {}, "id": "call-1"},
+        {"name": "search", "args": {}, "id": "call-2"},
+    ]
+    return [
+        HumanMessage(content="what is the weather in paris"),
+        AIMessage(content="", tool_calls=calls),
+        ToolMessage(content=error, tool_call_id="call-1"),
+        ToolMessage(content=json.dumps(results), tool_call_id="call-2"),
+    ]
+
+
+def _results(count: int) -> list[dict]:
+    return [
+        {
+            "url": f"https://example.com/{i}",
+            "title": f"Result {i}",
+            "content": " ".join(f"Source {i} reports the weather in Paris for hour {h}." for h in range(40)),
+        }
+        for i in range(count)
+    ]
+
+
+def test_budget_counts_plain_text_tool_output():
+    budget = ContextBudget(max_tokens=1500)
+    fitted = budget(_turn("Error: lookup failed " * 200, _results(10)))
+    assert sum(_message_tokens(m) for m in fitted) <= 1500
+    # The plain-text output is kept whole, the search results are trimmed
+    assert fitted[2].content == "Error: lookup failed " * 200
+    assert len(json.loads(fitted[3].content)) < 10
+
+
+def test_budget_cuts_plain_text_tool_output_that_does_not_fit():
+    budget = ContextBudget(max_tokens=500)
+    fitted = budget(_turn("Error: lookup failed " * 400, _results(10)))
+    assert sum(_message_tokens(m) for m in fitted) <= 500
+    assert fitted[2].content.startswith("Error: lookup failed")
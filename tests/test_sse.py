@@ -0,0 +1,35 @@
+import asyncio
+
+from core.metrics import REQUESTS
+from service.runs import RunRegistry
+from service.sse import DONE_FRAME, metered
+
+
+async def _cancel_run(reason: str) -> None:
+    registry = RunRegistry(max_frames=16, retention=0.0)
+    started = asyncio.Event()
+
+    async def body():
+        yield b"data: first\n\n"
+        started.set()
+        await asyncio.Event().wait()
+        yield DONE_FRAME
+
+    events = registry.start(
+        "run", metered(body(), "test-agent", "stream", lambda: events.cancel_reason)
+    )
+    await started.wait()
+    registry.cancel("run", reason)
+    await events.wait(1.0)
+
+
+def test_metered_labels_cancelled_runs():
+    before = REQUESTS.values.get(("test-agent", "stream", "cancelled"), 0.0)
+    asyncio.run(_cancel_run("request"))
+    assert REQUESTS.values[("test-agent", "stream", "cancelled")] == before + 1
+
+
+def test_metered_labels_abandoned_runs_disconnected():
+    before = REQUESTS.values.get(("test-agent", "stream", "disconnected"), 0.0)
+    asyncio.run(_cancel_run("disconnect"))
+    assert REQUESTS.values[("test-agent", "stream", "disconnected")] == before + 1